@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import warnings
+import subprocess
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import PredictorModelConfig, PredictorModel, FEATURE_COLUMNS
+from src.projects.hietaniemi_gym.model.model_predict.linear_predictor import LinearPredictorModel, LINEAR_MODEL_FILE_NAME
+
+STARTUP_CODE = """
+import time, warnings
+warnings.simplefilter('ignore')
+start = time.perf_counter()
+from src.projects.hietaniemi_gym.model.model_predict.{module} import {cls}
+class Config:
+    model_path = {model_path!r}
+model = {cls}(Config())
+print(time.perf_counter() - start)
+"""
+
+
+def bench_startup(module: str, cls: str, model_path: str) -> float:
+    """
+    Measures import plus model load time in a fresh interpreter.
+    """
+    code = STARTUP_CODE.format(module=module, cls=cls, model_path=model_path)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return float(output)
+
+
+def bench_predict(predict, features, repeats: int = 200) -> float:
+    """
+    Returns the best predict time in seconds over repeats calls.
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(features)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    warnings.simplefilter('ignore')
+    model_path = os.getenv('MODEL_PATH')
+    linear_model_path = os.path.join(os.path.dirname(model_path), LINEAR_MODEL_FILE_NAME)
+
+    sklearn_model = PredictorModel(PredictorModelConfig(model_path=model_path))
+    linear_model = LinearPredictorModel(PredictorModelConfig(model_path=linear_model_path))
+
+    print(f"startup sklearn: {bench_startup('model_predictor', 'PredictorModel', model_path):.4f}s")
+    print(f"startup numpy:   {bench_startup('linear_predictor', 'LinearPredictorModel', linear_model_path):.4f}s")
+
+    rng = np.random.default_rng(0)
+    for batch_size in [1, 64, 4096]:
+        features_array = rng.normal(size=(batch_size, len(FEATURE_COLUMNS)))
+        features_df = pd.DataFrame(features_array, columns=FEATURE_COLUMNS)
+        np.testing.assert_allclose(linear_model.predict(features_array), sklearn_model.predict(features_df), rtol=1e-12, atol=1e-9)
+        print(f"batch {batch_size:>5}: sklearn {bench_predict(sklearn_model.predict, features_df) * 1e6:9.1f}us"
+              f"  numpy DataFrame {bench_predict(linear_model.predict, features_df) * 1e6:9.1f}us"
+              f"  numpy array {bench_predict(linear_model.predict, features_array) * 1e6:9.1f}us")
@@ -0,0 +1,57 @@
+import os
+import time
+import argparse
+import pandas as pd
+from dotenv import load_dotenv
+from src.projects.hietaniemi_gym.data.data_processing.data_loader import (
+    weather_timestamps,
+    _weather_timestamps_str
+)
+
+
+def bench_weather_timestamps(weather_data_path: str, scales=(1, 10, 100), repeats: int = 3) -> pd.DataFrame:
+    """
+    Times the numeric and the string based weather timestamp construction on the
+    weather file repeated scale times, and checks that both give identical results.
+
+    Returns:
+    pd.DataFrame: One row per scale with the best time of each path and the speedup.
+    """
+    weather_df = pd.read_csv(weather_data_path)
+    weather_df['Hour'] = weather_df['Hour'] + ':00'
+
+    results = []
+    for scale in scales:
+        scaled_df = pd.concat([weather_df] * scale, ignore_index=True)
+        timings = {}
+        outputs = {}
+        for name, build in [('string', _weather_timestamps_str), ('numeric', weather_timestamps)]:
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                outputs[name] = build(scaled_df)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        pd.testing.assert_series_equal(outputs['numeric'], outputs['string'], check_exact=True)
+        results.append({
+            'rows': len(scaled_df),
+            'string_s': timings['string'],
+            'numeric_s': timings['numeric'],
+            'speedup': timings['string'] / timings['numeric'],
+        })
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    parser = argparse.ArgumentParser(description="Benchmark weather timestamp construction.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    weather_data_path = os.getenv('WEATHER_DATA_PATH')
+    print(bench_weather_timestamps(weather_data_path, args.scales, args.repeats).to_string(index=False))
@@ -0,0 +1,79 @@
+import os
+import sys
+import argparse
+import tempfile
+import pandas as pd
+from dotenv import load_dotenv
+from src.projects.hietaniemi_gym.pipelines.feature_pipeline import feature_pipeline
+from src.projects.hietaniemi_gym.utils.memory_report import MemoryBudgetConfig, StageMemoryReport
+
+
+def scale_source_files(gym_data_path: str, weather_data_path: str, scale: int, output_dir: str) -> tuple:
+    """
+    Writes gym and weather files with scale back-to-back copies of the originals.
+
+    Every copy is shifted by a whole number of weeks past the end of the previous one,
+    so timestamps stay unique and weekdays unchanged.
+
+    Returns:
+    tuple: The paths of the scaled gym and weather files.
+    """
+    gym_df = pd.read_csv(gym_data_path)
+    gym_times = pd.to_datetime(gym_df['time'])
+    weather_df = pd.read_csv(weather_data_path)
+    weather_times = pd.to_datetime(weather_df[['Year', 'Month', 'Day']]) + pd.to_timedelta(weather_df['Hour'] + ':00')
+
+    start = min(gym_times.min(), weather_times.min().tz_localize('UTC'))
+    end = max(gym_times.max(), weather_times.max().tz_localize('UTC'))
+    shift = pd.Timedelta(weeks=(end - start) // pd.Timedelta(weeks=1) + 1)
+
+    gym_copies = []
+    weather_copies = []
+    for copy_index in range(scale):
+        gym_copy = gym_df.copy()
+        gym_copy['time'] = (gym_times + copy_index * shift).dt.strftime('%Y-%m-%d %H:%M:%S+00:00')
+        gym_copies.append(gym_copy)
+
+        times = weather_times + copy_index * shift
+        weather_copy = weather_df.copy()
+        weather_copy['Year'] = times.dt.year
+        weather_copy['Month'] = times.dt.month
+        weather_copy['Day'] = times.dt.day
+        weather_copy['Hour'] = times.dt.strftime('%H:%M')
+        weather_copies.append(weather_copy)
+
+    scaled_gym_path = os.path.join(output_dir, f'gym_x{scale}.csv')
+    scaled_weather_path = os.path.join(output_dir, f'weather_x{scale}.csv')
+    pd.concat(gym_copies, ignore_index=True).to_csv(scaled_gym_path, index=False)
+    pd.concat(weather_copies, ignore_index=True).to_csv(scaled_weather_path, index=False)
+    return scaled_gym_path, scaled_weather_path
+
+
+def bench_memory_budget(gym_data_path: str, weather_data_path: str, scale: int = 10, budget_mb=None, chunksize=None) -> StageMemoryReport:
+    """
+    Runs the feature pipeline on scale times the source data and records the peak memory of every stage.
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        scaled_gym_path, scaled_weather_path = scale_source_files(gym_data_path, weather_data_path, scale, output_dir)
+        memory_report = StageMemoryReport(MemoryBudgetConfig(max_peak_rss_mb=budget_mb))
+        merged_data = feature_pipeline(scaled_gym_path, scaled_weather_path, chunksize, memory_report=memory_report)
+        print(f"{scale}x data: {len(merged_data)} merged rows")
+    return memory_report
+
+
+if __name__ == '__main__':
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    parser = argparse.ArgumentParser(description="Report the peak memory per feature pipeline stage on scaled data.")
+    parser.add_argument('--scale', type=int, default=10)
+    parser.add_argument('--budget-mb', type=float, default=None)
+    parser.add_argument('--chunksize', type=int, default=None)
+    args = parser.parse_args()
+
+    memory_report = bench_memory_budget(os.getenv('GYM_DATA_PATH'), os.getenv('WEATHER_DATA_PATH'),
+                                        args.scale, args.budget_mb, args.chunksize)
+    print(memory_report.format())
+    sys.exit(0 if memory_report.within_budget else 1)
@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from dotenv import load_dotenv
+from benchmarks.hietaniemi_gym.synthetic_data import generate_dataset, device_columns
+
+# BASELINE_PATH: The stored results new runs are compared against.
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+PIPELINES = ('predict_pipeline', 'data_analysis_pipeline')
+
+# Stages faster or smaller than this are too noisy to flag as regressions.
+MIN_REGRESSION_SECONDS = 0.05
+MIN_REGRESSION_MB = 20
+
+# COMPARED_SETTINGS: The run settings a comparison with the baseline is only meaningful for
+# if they match. Parallel stages depend on the number of usable CPUs.
+COMPARED_SETTINGS = ('device_count', 'seed', 'python', 'machine', 'cpu_count', 'usable_cpus', 'numpy', 'pandas')
+
+
+def run_pipeline(pipeline: str, gym_data_path: str, weather_data_path: str, model_path: str,
+                 columns: List[str], work_dir: str) -> List[dict]:
+    """
+    Runs one pipeline in work_dir, so its artifacts and logs stay out of the repository,
+    and returns the time and peak memory of its stages.
+    """
+    os.chdir(work_dir)
+    from src.projects.hietaniemi_gym.utils.memory_report import StageMemoryReport
+    memory_report = StageMemoryReport()
+    start = time.perf_counter()
+    if pipeline == 'predict_pipeline':
+        from src.projects.hietaniemi_gym.pipelines.predict_pipeline import predict_pipeline
+        predict_pipeline(gym_data_path, weather_data_path, model_path, use_cache=False,
+                         memory_report=memory_report, device_columns=columns)
+    else:
+        from src.projects.hietaniemi_gym.pipelines.data_analysis_pipeline import data_analysis_pipeline
+        data_analysis_pipeline(gym_data_path, weather_data_path, use_cache=False,
+                               memory_report=memory_report, device_columns=columns)
+    total = time.perf_counter() - start
+    stages = [{'stage': record['stage'], 'seconds': record['seconds'], 'peak_rss_mb': record['peak_rss_mb']}
+              for record in memory_report.stages]
+    return stages + [{'stage': 'total', 'seconds': total, 'peak_rss_mb': memory_report.peak_rss_mb}]
+
+
+def bench_pipelines(scales, device_count: int = 8, seed: int = 0, pipelines=PIPELINES, repeats: int = 3,
+                    data_dir: Optional[str] = None, model_path: Optional[str] = None) -> dict:
+    """
+    Times and memory-profiles every stage of the pipelines on synthetic data of each scale.
+
+    Every run starts in a fresh interpreter so that earlier runs do not inflate its memory.
+    Each stage reports the best time and memory of repeats runs. Generated data is kept
+    in data_dir and reused by later runs.
+
+    Returns:
+    dict: The run settings and one result per pipeline and scale.
+    """
+    data_dir = data_dir or os.path.join(tempfile.gettempdir(), 'hietaniemi_gym_bench_data')
+    model_path = os.path.abspath(model_path or os.getenv('MODEL_PATH'))
+    columns = device_columns(device_count)
+    results = []
+    for scale in scales:
+        gym_data_path, weather_data_path = generate_dataset(data_dir, scale, device_count, seed)
+        for pipeline in pipelines:
+            runs = []
+            for _ in range(repeats):
+                with tempfile.TemporaryDirectory() as work_dir:
+                    context = multiprocessing.get_context('spawn')
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        runs.append(executor.submit(run_pipeline, pipeline, os.path.abspath(gym_data_path),
+                                                    os.path.abspath(weather_data_path), model_path, columns, work_dir).result())
+            stages = [
+                {'stage': records[0]['stage'],
+                 'seconds': min(record['seconds'] for record in records),
+                 'peak_rss_mb': min(record['peak_rss_mb'] for record in records)}
+                for records in zip(*runs)
+            ]
+            results.append({'pipeline': pipeline, 'scale': scale, 'stages': stages})
+            total = stages[-1]
+            print(f"{pipeline} x{scale:g}: {total['seconds']:.2f} s, peak {total['peak_rss_mb']:.0f} MB")
+    return {'settings': run_settings(device_count, seed, repeats), 'results': results}
+
+
+def run_settings(device_count: int, seed: int, repeats: int) -> dict:
+    """
+    Describes the data, the machine and the library versions of a run.
+    """
+    import numpy
+    import pandas
+    usable_cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    return {
+        'device_count': device_count, 'seed': seed, 'repeats': repeats, 'python': platform.python_version(),
+        'machine': platform.machine(), 'processor': platform.processor() or None, 'system': platform.platform(),
+        'cpu_count': os.cpu_count(), 'usable_cpus': usable_cpus, 'numpy': numpy.__version__, 'pandas': pandas.__version__,
+    }
+
+
+def baseline_mismatches(current: dict, baseline: dict) -> List[str]:
+    """
+    Returns a description of every difference that makes a comparison with the baseline
+    unreliable: run settings in COMPARED_SETTINGS that differ, and stages the baseline
+    has no entry for, which compare_to_baseline cannot check.
+    """
+    mismatches = []
+    for name in COMPARED_SETTINGS:
+        current_value, baseline_value = current['settings'].get(name), baseline.get('settings', {}).get(name)
+        if current_value != baseline_value:
+            mismatches.append(f"setting {name}: baseline {baseline_value}, current {current_value}")
+    baseline_stages = {
+        (result['pipeline'], result['scale'], stage['stage'])
+        for result in baseline['results'] for stage in result['stages']
+    }
+    for result in current['results']:
+        for stage in result['stages']:
+            if (result['pipeline'], result['scale'], stage['stage']) not in baseline_stages:
+                mismatches.append(f"{result['pipeline']} x{result['scale']:g} {stage['stage']}: not in the baseline")
+    return mismatches
+
+
+def compare_to_baseline(current: dict, baseline: dict, threshold: float = 0.25) -> List[str]:
+    """
+    Returns a description of every stage that got slower or larger than its baseline by more than threshold.
+
+    Stages below MIN_REGRESSION_SECONDS or MIN_REGRESSION_MB are ignored for that measure.
+    """
+    baseline_stages = {
+        (result['pipeline'], result['scale'], stage['stage']): stage
+        for result in baseline['results'] for stage in result['stages']
+    }
+    regressions = []
+    for result in current['results']:
+        for stage in result['stages']:
+            reference = baseline_stages.get((result['pipeline'], result['scale'], stage['stage']))
+            if reference is None:
+                continue
+            for measure, floor in [('seconds', MIN_REGRESSION_SECONDS), ('peak_rss_mb', MIN_REGRESSION_MB)]:
+                if stage[measure] > max(reference[measure], floor) * (1 + threshold):
+                    regressions.append(f"{result['pipeline']} x{result['scale']:g} {stage['stage']}: "
+                                       f"{measure} {reference[measure]:.3f} -> {stage[measure]:.3f}")
+    return regressions
+
+
+if __name__ == '__main__':
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    parser = argparse.ArgumentParser(description="Benchmark the pipelines on synthetic data and compare with a baseline.")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10])
+    parser.add_argument('--devices', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=list(PIPELINES))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--data-dir', default=None)
+    parser.add_argument('--output', default='bench_pipelines.json')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=0.25)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    current = bench_pipelines(args.scales, args.devices, args.seed, args.pipelines, args.repeats, args.data_dir)
+    with open(args.output, 'w') as file:
+        json.dump(current, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(current, file, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        for mismatch in baseline_mismatches(current, baseline):
+            print(f"WARNING {mismatch}")
+        regressions = compare_to_baseline(current, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regressions above {args.threshold:.0%} against {args.baseline}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,126 @@
+import os
+import argparse
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+
+# BASE_GYM_ROWS: The number of rows of the bundled gym CSV, which is scale 1.
+BASE_GYM_ROWS = 55102
+
+# Rows are generated and written in blocks of this many 10-minute gym rows. Each block
+# draws from its own seeded generator, so the data does not depend on memory limits.
+_BLOCK_ROWS = 600_000
+_ROWS_PER_HOUR = 6
+_START = pd.Timestamp('2020-04-24', tz='UTC')
+_HOUR_STRINGS = np.array([f'{hour:02d}:00' for hour in range(24)], dtype=object)
+
+
+def device_columns(device_count: int) -> List[str]:
+    """
+    Returns the device column names, numbered from 19 like the bundled gym data.
+    """
+    return [str(19 + device) for device in range(device_count)]
+
+
+def generate_gym_data(path: str, rows: int, device_count: int = 8, seed: int = 0) -> str:
+    """
+    Writes a gym CSV in the schema of notebooks/helsinki-gym/hietaniemi-gym-data.csv.
+
+    The rows are 10 minutes apart from 2020-04-24 on. Device usage is an integer between
+    2 and 10 with a daily and a weekly cycle. The output only depends on rows,
+    device_count and seed.
+
+    Returns:
+    str: path.
+    """
+    columns = device_columns(device_count)
+    with open(path, 'w') as file:
+        file.write(','.join(['time'] + columns) + '\n')
+        for block, start in enumerate(range(0, rows, _BLOCK_ROWS)):
+            rng = np.random.default_rng([seed, block, 0])
+            steps = np.arange(start, min(start + _BLOCK_ROWS, rows))
+            times = _START + pd.to_timedelta(steps * 10, unit='min')
+            hour = times.hour.to_numpy()
+            weekday = times.weekday.to_numpy()
+            # Busy evenings, quiet nights and somewhat busier weekends
+            activity = np.clip(np.sin((hour - 6) / 24 * 2 * np.pi), 0, None) * np.where(weekday >= 5, 3.0, 2.0)
+            usage = 2 + rng.poisson(activity[:, None], size=(len(steps), device_count))
+            block_df = pd.DataFrame(np.minimum(usage, 10), columns=columns)
+            block_df.insert(0, 'time', times)
+            block_df.to_csv(file, header=False, index=False)
+    return path
+
+
+def generate_weather_data(path: str, hours: int, seed: int = 0) -> str:
+    """
+    Writes an hourly weather CSV in the schema of notebooks/helsinki-gym/kaisaniemi-weather-data.csv.
+
+    Temperature follows a yearly and a daily cycle, snow lies on cold days and about
+    one hour in ten has precipitation. About one percent of the measurements are missing.
+
+    Returns:
+    str: path.
+    """
+    with open(path, 'w') as file:
+        file.write('Year,Month,Day,Hour,Timezone,Precipitation (mm),Snow depth (cm),Temperature (degC)\n')
+        block_hours = _BLOCK_ROWS // _ROWS_PER_HOUR
+        for block, start in enumerate(range(0, hours, block_hours)):
+            rng = np.random.default_rng([seed, block, 1])
+            steps = np.arange(start, min(start + block_hours, hours))
+            times = _START + pd.to_timedelta(steps, unit='h')
+            day_of_year = times.dayofyear.to_numpy()
+            hour = times.hour.to_numpy()
+            temperature = (6 - 12 * np.cos((day_of_year - 20) / 365 * 2 * np.pi)
+                           - 3 * np.cos(hour / 24 * 2 * np.pi) + rng.normal(0, 2, len(steps)))
+            precipitation = np.where(rng.random(len(steps)) < 0.1, rng.exponential(0.7, len(steps)), 0)
+            snow_depth = np.clip(-3 * temperature + rng.normal(0, 2, len(steps)), 0, None)
+            block_df = pd.DataFrame({
+                'Year': times.year,
+                'Month': times.month,
+                'Day': times.day,
+                'Hour': _HOUR_STRINGS[hour],
+                'Timezone': 'UTC',
+                'Precipitation (mm)': _with_missing(rng, precipitation.round(1), 0.01),
+                'Snow depth (cm)': _with_missing(rng, snow_depth.round(), 0.005),
+                'Temperature (degC)': _with_missing(rng, temperature.round(1), 0.0015),
+            })
+            block_df.to_csv(file, header=False, index=False)
+    return path
+
+
+def _with_missing(rng: np.random.Generator, values: np.ndarray, fraction: float) -> np.ndarray:
+    return np.where(rng.random(len(values)) < fraction, np.nan, values)
+
+
+def generate_dataset(output_dir: str, scale: float = 1, device_count: int = 8, seed: int = 0) -> Tuple[str, str]:
+    """
+    Writes a gym and a matching weather CSV with scale times the rows of the bundled gym data.
+
+    Files that already exist for the same scale, device count and seed are reused.
+
+    Returns:
+    Tuple[str, str]: The paths of the gym and the weather CSV.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rows = int(BASE_GYM_ROWS * scale)
+    name = f'x{scale:g}_d{device_count}_s{seed}'
+    gym_path = os.path.join(output_dir, f'gym_{name}.csv')
+    weather_path = os.path.join(output_dir, f'weather_{name}.csv')
+    if not os.path.exists(gym_path):
+        generate_gym_data(gym_path + '.tmp', rows, device_count, seed)
+        os.replace(gym_path + '.tmp', gym_path)
+    if not os.path.exists(weather_path):
+        generate_weather_data(weather_path + '.tmp', -(-rows // _ROWS_PER_HOUR), seed)
+        os.replace(weather_path + '.tmp', weather_path)
+    return gym_path, weather_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic gym and weather CSVs.")
+    parser.add_argument('output_dir')
+    parser.add_argument('--scale', type=float, default=1)
+    parser.add_argument('--devices', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(*generate_dataset(args.output_dir, args.scale, args.devices, args.seed), sep='\n')
@@ -1,25 +1,230 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import Dict, Optional
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# The background writer of the asynchronous mode and the current log file
+_listener: Optional[logging.handlers.QueueListener] = None
+_log_file_path: Optional[str] = None
+
+
+@dataclass
+class LoggingConfig():
+    """
+    level: The level of every module without an entry in module_levels.
+    module_levels: Levels per logger name, or per module file name for records logged through
+        the root logger, e.g. {'model_predictor': logging.WARNING}. A dotted logger name
+        also applies to the loggers below it.
+    asynchronous: Hand records to a background thread through a queue instead of writing
+        them in the logging call.
+    json_format: Write one JSON object per record instead of LOG_FORMAT lines.
+    rate_limit: The maximum number of records with the same message template per
+        rate_limit_seconds, or None for no limit. Warnings and errors are never limited.
+    """
+    level: int = logging.INFO
+    module_levels: Dict[str, int] = field(default_factory=dict)
+    asynchronous: bool = False
+    json_format: bool = False
+    rate_limit: Optional[int] = None
+    rate_limit_seconds: float = 1.0
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON object with its time, level, logger, module and message.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        if hasattr(record, 'suppressed'):
+            entry['suppressed'] = record.suppressed
+        return json.dumps(entry)
+
+
+class ModuleLevelFilter(logging.Filter):
+    """
+    Drops records below the level of their logger or, for records of the root logger,
+    of the module that logged them.
+    """
+    def __init__(self, default_level: int, module_levels: Dict[str, int]):
+        super().__init__()
+        self.default_level = default_level
+        self.module_levels = module_levels
+        self._levels: Dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.module)
+        level = self._levels.get(key)
+        if level is None:
+            level = self._levels[key] = self._level_for(record.name if record.name != 'root' else record.module)
+        return record.levelno >= level
+
+    def _level_for(self, name: str) -> int:
+        while name:
+            if name in self.module_levels:
+                return self.module_levels[name]
+            name = name.rpartition('.')[0]
+        return self.default_level
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Passes at most rate records per window of seconds for each message template below
+    WARNING. The number of dropped records is attached to the next passed record of the
+    template as record.suppressed and appended to its message.
+    """
+    def __init__(self, rate: int, seconds: float = 1.0):
+        super().__init__()
+        self.rate = rate
+        self.seconds = seconds
+        self._windows: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            # [window start, records passed in the window, records dropped]
+            window = self._windows.setdefault(key, [now, 0, 0])
+            if now - window[0] >= self.seconds:
+                window[0] = now
+                window[1] = 0
+            if window[1] >= self.rate:
+                window[2] += 1
+                return False
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+def setup_logging(log_dir="logs", log_file_name=None, config: Optional[LoggingConfig] = None):
+    """
+    Configures the root logger to write to a log file, unless it is configured already.
+
+    In the asynchronous mode the logging call only puts the record on an unbounded
+    in-memory queue, and a background thread formats and writes it, so the latency of a
+    call does not depend on the disk. The filters run in the calling thread, so dropped
+    records never reach the queue. Queued records are written when the process exits or
+    shutdown_logging is called.
+
+    Forked child processes write synchronously to the same file.
+
+    Parameters:
+    log_dir (str): The directory of the log file.
+    log_file_name (str): The log file name. Defaults to one with the current date and time.
+    config (LoggingConfig): Levels, format, rate limit and mode. Defaults to synchronous
+        LOG_FORMAT lines at INFO.
+    """
+    global _listener, _log_file_path
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    config = config or LoggingConfig()
 
-def setup_logging(log_dir="logs", log_file_name=None):
     # Create the directory for logs if it doesn't exist
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
-    
+
     # If log_file_name is None, generate it with the current date and time
     if log_file_name is None:
         log_file_name = datetime.now().strftime("log_%Y-%m-%d_%H-%M-%S.log")
-    
+
     # Full path for the log file
     log_file_path = os.path.join(log_dir, log_file_name)
-    
-    # Set up logging to file
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file_path)
-        ]
-    )
 
+    file_handler = logging.FileHandler(log_file_path)
+    file_handler.setFormatter(JsonFormatter() if config.json_format else logging.Formatter(LOG_FORMAT))
+
+    filters = []
+    if config.module_levels:
+        filters.append(ModuleLevelFilter(config.level, config.module_levels))
+    if config.rate_limit is not None:
+        filters.append(RateLimitFilter(config.rate_limit, config.rate_limit_seconds))
+
+    if config.asynchronous:
+        handler = _QueueHandler(queue.SimpleQueue())
+        _listener = logging.handlers.QueueListener(handler.queue, file_handler)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_write_synchronously)
+    else:
+        handler = file_handler
+    for log_filter in filters:
+        handler.addFilter(log_filter)
+
+    root.setLevel(min([config.level, *config.module_levels.values()]))
+    root.addHandler(handler)
+    _log_file_path = os.path.abspath(log_file_path)
+
+
+def shutdown_logging() -> None:
+    """
+    Writes all queued records and stops the background writer of the asynchronous mode.
+    Later records are written synchronously.
+    """
+    listener = _listener
+    if listener is not None:
+        # Switch over first, so that no record is queued after the writer stopped
+        _write_synchronously()
+        listener.stop()
+
+
+def get_log_file_path() -> Optional[str]:
+    """
+    Returns the path of the log file set up by setup_logging, or None.
+    """
+    return _log_file_path
+
+
+def _write_synchronously() -> None:
+    """
+    Replaces the queue handler with the file handler it writes to. Also runs in forked
+    children, which do not inherit the writer thread.
+    """
+    global _listener
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, _QueueHandler):
+            root.removeHandler(handler)
+            for file_handler in _listener.handlers:
+                for log_filter in handler.filters:
+                    file_handler.addFilter(log_filter)
+                root.addHandler(file_handler)
+    _listener = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve the message and exception here, the writer thread formats the record
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
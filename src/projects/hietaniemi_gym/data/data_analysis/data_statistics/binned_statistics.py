@@ -0,0 +1,153 @@
+import pandas as pd
+import numpy as np
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, NamedTuple
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
+
+
+class BinSpec(NamedTuple):
+    x_col: str
+    y_col: str
+    num_bins: int
+
+
+@dataclass
+class BinnedStats():
+    """
+    Count, sum and sum of squared deviations from the bin mean of y per x bin, from
+    which the mean and std follow.
+
+    Bins are right-closed like pd.cut, except that the first bin also includes its left
+    edge, so every finite x between the lowest and the highest edge falls into a bin.
+    Rows where x or y is NaN are not counted.
+    """
+    edges: np.ndarray
+    count: np.ndarray
+    sum: np.ndarray
+    m2: np.ndarray
+
+    @property
+    def centers(self) -> np.ndarray:
+        return (self.edges[:-1] + self.edges[1:]) / 2
+
+    @property
+    def width(self) -> np.ndarray:
+        return np.diff(self.edges)
+
+    @property
+    def mean(self) -> np.ndarray:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.sum / self.count, np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        """
+        Sample standard deviation (ddof=1), NaN for bins with fewer than two rows, as in pandas.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'center': self.centers,
+            'count': self.count,
+            'sum': self.sum,
+            'm2': self.m2,
+            'mean': self.mean,
+            'std': self.std,
+        }, index=pd.IntervalIndex.from_breaks(self.edges, closed='right'))
+
+
+def bin_edges(values: pd.Series, num_bins: int) -> np.ndarray:
+    """
+    Returns num_bins + 1 evenly spaced edges from the minimum to the maximum of values.
+
+    np.arange(min, max, width) stops before max and loses the top bin, linspace keeps it.
+    """
+    if num_bins < 1:
+        raise ValueError(f"num_bins must be positive, got {num_bins}")
+    return np.linspace(values.min(), values.max(), num_bins + 1)
+
+
+def bin_indices(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Returns the bin of every value, or -1 for NaN and for values outside the edges.
+    """
+    indices = np.searchsorted(edges, values, side='left') - 1
+    indices[values == edges[0]] = 0
+    indices[(indices >= len(edges) - 1) | np.isnan(values)] = -1
+    return indices
+
+
+@instrument()
+def compute_binned_statistics(df: pd.DataFrame, specs: Iterable[BinSpec]) -> Dict[BinSpec, BinnedStats]:
+    """
+    Computes the binned statistics of several (x column, y column, bins) combinations.
+
+    The bin of every row is computed once per x column and number of bins and shared by
+    all y columns binned on it. Each statistic is then a single np.bincount pass. The
+    spread is summed as squared deviations from the bin means, a second pass that does
+    not lose precision to cancellation when y has a large offset.
+
+    Parameters:
+    df (pd.DataFrame): The data.
+    specs (Iterable[BinSpec]): The combinations to compute.
+
+    Returns:
+    Dict[BinSpec, BinnedStats]: The statistics of every combination.
+    """
+    try:
+        results = {}
+        binnings = {}
+        for spec in dict.fromkeys(specs):
+            binning_key = (spec.x_col, spec.num_bins)
+            if binning_key not in binnings:
+                x = df[spec.x_col].to_numpy(dtype=np.float64)
+                edges = bin_edges(df[spec.x_col], spec.num_bins)
+                binnings[binning_key] = (edges, bin_indices(x, edges))
+            edges, indices = binnings[binning_key]
+
+            y = df[spec.y_col].to_numpy(dtype=np.float64)
+            valid = (indices >= 0) & ~np.isnan(y)
+            valid_indices = indices[valid]
+            y = y[valid]
+            count = np.bincount(valid_indices, minlength=spec.num_bins)
+            total = np.bincount(valid_indices, weights=y, minlength=spec.num_bins)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                bin_mean = np.where(count > 0, total / count, 0)
+            deviation = y - bin_mean[valid_indices]
+            results[spec] = BinnedStats(
+                edges=edges,
+                count=count,
+                sum=total,
+                m2=np.bincount(valid_indices, weights=deviation * deviation, minlength=spec.num_bins),
+            )
+        logging.info(f"Binned statistics computed for {len(results)} combinations.")
+        return results
+    except Exception as e:
+        logging.error(f"Error computing binned statistics: {e}")
+        raise
+
+
+class BinnedStatistics:
+    """
+    Memoized binned statistics of one dataset.
+
+    Create one per dataset and share it between the binned charts and any ad-hoc
+    analysis; each combination is computed once. Pass all known combinations to compute
+    up front so they are binned together.
+    """
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._results: Dict[BinSpec, BinnedStats] = {}
+
+    def compute(self, specs: Iterable[BinSpec]) -> List[BinnedStats]:
+        specs = [BinSpec(*spec) for spec in specs]
+        missing = [spec for spec in specs if spec not in self._results]
+        if missing:
+            self._results.update(compute_binned_statistics(self.df, missing))
+        return [self._results[spec] for spec in specs]
+
+    def get(self, x_col: str, y_col: str, num_bins: int) -> BinnedStats:
+        return self.compute([BinSpec(x_col, y_col, num_bins)])[0]
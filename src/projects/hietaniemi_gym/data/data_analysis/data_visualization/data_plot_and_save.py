@@ -1,14 +1,19 @@
+import matplotlib
 import matplotlib.pyplot as plt
 import pandas as pd
 import logging
 import numpy as np
-from typing import Callable, List
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
 from src.projects.hietaniemi_gym.data.data_consts import DEVICE_COLUMNS
-import copy
+from src.projects.hietaniemi_gym.data.data_analysis.data_statistics.binned_statistics import BinnedStats, BinnedStatistics
 import os
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
 
 
 
+@instrument()
 def plot_total_device_usage(df: pd.DataFrame, device_columns: List[str] = DEVICE_COLUMNS, dir: str = '.', img_name: str = 'total_device_usage.png') -> None:
     """
     Plot the total usage of each device at the gym and save the figure.
@@ -27,7 +32,10 @@ def plot_total_device_usage(df: pd.DataFrame, device_columns: List[str] = DEVICE
     except Exception as e:
         logging.error(f"Failed to save device usage plot: {e}")
         raise
+    finally:
+        plt.close()
 
+@instrument()
 def plot_mean_usage_per_hour(dataframe: pd.DataFrame,  time_col:str, device_columns: List[str]=DEVICE_COLUMNS, dir: str = '.', img_name: str = 'mean_usage_per_hour.png') -> None:
     """
     Plots the mean usage per hour for given device columns and saves the figure.
@@ -44,30 +52,61 @@ def plot_mean_usage_per_hour(dataframe: pd.DataFrame,  time_col:str, device_colu
         plt.savefig(os.path.join(dir, img_name))
     except Exception as e:
         print(f"An error occurred while saving plot: {e}")
+    finally:
+        plt.close()
 
+def mean_usage_by_day_type(
+    dataframe: pd.DataFrame,
+    categorize_day: Callable[[pd.Timestamp], str],
+    device_columns: List[str]=DEVICE_COLUMNS,
+    weekend_col: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Computes the mean usage of every device on weekdays and on weekends.
+
+    The day type is read from the 0/1 flag column weekend_col if given, otherwise
+    categorize_day is mapped over the index.
+
+    Returns:
+    pd.DataFrame: The mean usage per device, indexed by 'weekday' and 'weekend'.
+    """
+    # Group by the day type directly instead of adding it as a column to a copy of the frame
+    if weekend_col is not None:
+        day_type = np.where(dataframe[weekend_col].to_numpy() == 1, 'weekend', 'weekday')
+    else:
+        day_type = dataframe.index.map(categorize_day)
+    return dataframe.groupby(day_type)[device_columns].mean().reindex(['weekday', 'weekend'])
+
+@instrument()
 def plot_device_usage_weekday_weekend_comparison(
     dataframe: pd.DataFrame,
     categorize_day: Callable[[pd.Timestamp], str],
     device_columns: List[str]=DEVICE_COLUMNS,
     dir: str = '.',
-    img_name: str = 'weekday_weekend_comparison.png'
+    img_name: str = 'weekday_weekend_comparison.png',
+    weekend_col: Optional[str] = None
 ) -> None:
     """
     Plots a comparison of device usage on weekdays vs weekends and saves the figure.
+    If weekend_col names a 0/1 weekend flag column, such as the 'is_weekend' calendar
+    feature, it is used instead of mapping categorize_day over the index.
     """
-    dataframe_copy = copy.deepcopy(dataframe)
-    dataframe_copy['day_type'] = dataframe_copy.index.map(categorize_day)
-    weekdays_data = dataframe_copy[dataframe_copy['day_type'] == 'weekday'][device_columns].mean()
-    weekends_data = dataframe_copy[dataframe_copy['day_type'] == 'weekend'][device_columns].mean()
-    aggregated_data = pd.DataFrame({'Weekdays': weekdays_data, 'Weekends': weekends_data})
-    aggregated_data.plot(kind='bar', figsize=(5, 4))
-    plt.title('Device Usage Comparison: Weekdays vs Weekends')
-    plt.xlabel('Device')
-    plt.ylabel('Average Usage')
-    plt.xticks(rotation=0)
-    plt.tight_layout()
-    plt.savefig(os.path.join(dir, img_name))
+    try:
+        mean_usage = mean_usage_by_day_type(dataframe, categorize_day, device_columns, weekend_col)
+        weekdays_data = mean_usage.loc['weekday']
+        weekends_data = mean_usage.loc['weekend']
+        aggregated_data = pd.DataFrame({'Weekdays': weekdays_data, 'Weekends': weekends_data})
+        aggregated_data.plot(kind='bar', figsize=(5, 4))
+        plt.title('Device Usage Comparison: Weekdays vs Weekends')
+        plt.xlabel('Device')
+        plt.ylabel('Average Usage')
+        plt.xticks(rotation=0)
+        plt.tight_layout()
+        plt.savefig(os.path.join(dir, img_name))
+    finally:
+        plt.close()
 
+@instrument()
 def plot_gym_usage_vs_temperature(df: pd.DataFrame, temperature_col: str, gym_usage_col: str, dir: str = '.', img_name: str = 'gym_usage_vs_temperature.png') -> None:
     """
     Creates a scatter plot of gym usage against temperature and saves the figure.
@@ -85,22 +124,21 @@ def plot_gym_usage_vs_temperature(df: pd.DataFrame, temperature_col: str, gym_us
     except Exception as e:
         logging.error(f"Failed to save gym usage vs. temperature plot: {e}")
         raise
+    finally:
+        plt.close()
 
-def plot_mean_gym_usage_vs_temperature(df: pd.DataFrame, temperature_col: str, gym_usage_col: str, num_bins: int, dir: str = '.', img_name: str = 'mean_gym_usage_vs_temperature.png') -> None:
+@instrument()
+def plot_mean_gym_usage_vs_temperature(df: pd.DataFrame, temperature_col: str, gym_usage_col: str, num_bins: int, dir: str = '.', img_name: str = 'mean_gym_usage_vs_temperature.png', binned_stats: Optional[BinnedStats] = None) -> None:
     """
     Creates a plot of mean gym usage against binned temperature values with error bars and saves the figure.
+    The binned statistics are computed from df unless precomputed ones are passed as binned_stats.
     """
     try:
-        
-        min_temperature = df[temperature_col].min()
-        max_temperature = df[temperature_col].max()
-        bin_width = (max_temperature - min_temperature) / num_bins
-        temperature_bins = pd.cut(df[temperature_col], bins=np.arange(min_temperature, max_temperature, bin_width))
-
-        mean_usage_per_temp = df.groupby(temperature_bins)[gym_usage_col].mean()
-        std_usage_per_temp = df.groupby(temperature_bins)[gym_usage_col].std()
-
-        bin_centers = [(bin.left + bin.right) / 2 for bin in mean_usage_per_temp.index.categories]
+        if binned_stats is None:
+            binned_stats = BinnedStatistics(df).get(temperature_col, gym_usage_col, num_bins)
+        mean_usage_per_temp = binned_stats.mean
+        std_usage_per_temp = binned_stats.std
+        bin_centers = binned_stats.centers
 
         plt.figure(figsize=(5, 4))
         plt.errorbar(bin_centers, mean_usage_per_temp, yerr=std_usage_per_temp, fmt='o', ecolor='g', capthick=2)
@@ -114,19 +152,21 @@ def plot_mean_gym_usage_vs_temperature(df: pd.DataFrame, temperature_col: str, g
     except Exception as e:
         logging.error(f"Failed to save mean gym usage vs. temperature plot: {e}")
         raise
+    finally:
+        plt.close()
 
-def plot_sample_count_vs_temperature(df: pd.DataFrame, temperature_col: str, gym_usage_col: str, num_bins: int, dir: str = '.', img_name: str = 'sample_count_vs_temperature.png') -> None:
+@instrument()
+def plot_sample_count_vs_temperature(df: pd.DataFrame, temperature_col: str, gym_usage_col: str, num_bins: int, dir: str = '.', img_name: str = 'sample_count_vs_temperature.png', binned_stats: Optional[BinnedStats] = None) -> None:
     """
     Creates a bar plot of the number of samples per temperature bin and saves the figure.
+    The binned statistics are computed from df unless precomputed ones are passed as binned_stats.
     """
     try:
-        min_temperature = df[temperature_col].min()
-        max_temperature = df[temperature_col].max()
-        bin_width = (max_temperature - min_temperature) / num_bins
-        temperature_bins = pd.cut(df[temperature_col], bins=np.arange(min_temperature, max_temperature, bin_width))
-        
-        count_per_temp = df.groupby(temperature_bins)[gym_usage_col].count()
-        bin_centers = [(bin.left + bin.right) / 2 for bin in count_per_temp.index.categories]
+        if binned_stats is None:
+            binned_stats = BinnedStatistics(df).get(temperature_col, gym_usage_col, num_bins)
+        count_per_temp = binned_stats.count
+        bin_centers = binned_stats.centers
+        bin_width = binned_stats.width
 
         plt.figure(figsize=(5, 4))
         plt.bar(bin_centers, count_per_temp, width=bin_width * 0.9, alpha=0.5, color='blue')
@@ -140,7 +180,10 @@ def plot_sample_count_vs_temperature(df: pd.DataFrame, temperature_col: str, gym
     except Exception as e:
         logging.error(f"Failed to save sample count vs. temperature plot: {e}")
         raise
+    finally:
+        plt.close()
 
+@instrument()
 def plot_gym_usage_vs_precipitation(df: pd.DataFrame, precipitation_col: str, gym_usage_col: str, dir: str = '.', img_name: str = 'gym_usage_vs_precipitation.png') -> None:
     """
     Creates a scatter plot to visualize the relationship between gym usage and precipitation and saves the figure.
@@ -161,21 +204,21 @@ def plot_gym_usage_vs_precipitation(df: pd.DataFrame, precipitation_col: str, gy
     except Exception as e:
         logging.error(f"Failed to save gym usage vs. precipitation plot: {e}")
         raise
+    finally:
+        plt.close()
 
-def plot_mean_gym_usage_vs_precipitation(df: pd.DataFrame, precipitation_col: str, gym_usage_col: str, num_bins: int, dir: str = '.', img_name: str = 'mean_usage_vs_precipitation.png') -> None:
+@instrument()
+def plot_mean_gym_usage_vs_precipitation(df: pd.DataFrame, precipitation_col: str, gym_usage_col: str, num_bins: int, dir: str = '.', img_name: str = 'mean_usage_vs_precipitation.png', binned_stats: Optional[BinnedStats] = None) -> None:
     """
     Creates a plot of mean gym usage against precipitation values with error bars and saves the figure.
+    The binned statistics are computed from df unless precomputed ones are passed as binned_stats.
     """
     try:
-        min_precipitation = df[precipitation_col].min()
-        max_precipitation = df[precipitation_col].max()       
-        bin_width = (max_precipitation - min_precipitation) / num_bins
-        precipitation_bins = pd.cut(df[precipitation_col], bins=np.arange(min_precipitation, max_precipitation, bin_width))
-
-        mean_usage = df.groupby(precipitation_bins)[gym_usage_col].mean()
-        std_usage = df.groupby(precipitation_bins)[gym_usage_col].std()
-
-        bin_centers = [(bin.left + bin.right) / 2 for bin in mean_usage.index.categories]
+        if binned_stats is None:
+            binned_stats = BinnedStatistics(df).get(precipitation_col, gym_usage_col, num_bins)
+        mean_usage = binned_stats.mean
+        std_usage = binned_stats.std
+        bin_centers = binned_stats.centers
 
         plt.figure(figsize=(5, 4))
         plt.errorbar(bin_centers, mean_usage, yerr=std_usage, fmt='o', ecolor='g', capthick=2, capsize=5)
@@ -188,4 +231,64 @@ def plot_mean_gym_usage_vs_precipitation(df: pd.DataFrame, precipitation_col: st
         logging.info("Mean gym usage vs. precipitation plot saved successfully.")
     except Exception as e:
         logging.error(f"Failed to save mean gym usage vs. precipitation plot: {e}")
-        raise
\ No newline at end of file
+        raise
+    finally:
+        plt.close()
+
+
+@dataclass
+class PlotJob():
+    plot_function: Callable
+    columns: List[str]
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+
+
+@instrument()
+def render_plots(df: pd.DataFrame, jobs: List[PlotJob], parallel: bool = True, max_workers: Optional[int] = None) -> None:
+    """
+    Renders independent charts, each from only the columns it needs.
+
+    In parallel mode every chart is rendered in a worker process on the headless Agg
+    backend, so the whole set takes about as long as the slowest chart. Figures are
+    closed after each chart. Failures are logged per chart and the first one is raised
+    once all charts have finished.
+
+    Parameters:
+    df (pd.DataFrame): The data to plot.
+    jobs (List[PlotJob]): The charts to render, called as plot_function(df[columns], *args, **kwargs).
+    parallel (bool): Whether to render the charts in a process pool.
+    max_workers (int): The number of worker processes. Defaults to one per chart, up to the CPU count.
+
+    Returns:
+    None: This function does not return anything.
+    """
+    if not parallel or not jobs:
+        for job in jobs:
+            _render_plot(job, df[job.columns])
+        return
+
+    errors = []
+    max_workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_use_headless_backend) as executor:
+        futures = [(job, executor.submit(_render_plot, job, df[job.columns])) for job in jobs]
+        for job, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"Failed to render {job.plot_function.__name__}: {e}")
+                errors.append(e)
+    if errors:
+        raise errors[0]
+    logging.info(f"Rendered {len(jobs)} plots in parallel.")
+
+
+def _use_headless_backend() -> None:
+    matplotlib.use('Agg', force=True)
+
+
+def _render_plot(job: PlotJob, df: pd.DataFrame) -> None:
+    try:
+        job.plot_function(df, *job.args, **job.kwargs)
+    finally:
+        plt.close('all')
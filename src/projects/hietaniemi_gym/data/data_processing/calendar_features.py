@@ -0,0 +1,169 @@
+import datetime
+import logging
+from typing import Iterable, List
+import numpy as np
+import pandas as pd
+from src.projects.hietaniemi_gym.data.data_consts import TIME_COL_NAME
+from src.projects.hietaniemi_gym.data.data_processing.sorted_join import epoch_nanoseconds
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
+
+# CALENDAR_FEATURES: The calendar columns add_calendar_features can derive from a time
+# column, with their dtypes.
+CALENDAR_FEATURES = {
+    'hour': np.int8,
+    'weekday': np.int8,
+    'is_weekend': np.int8,
+    'month': np.int8,
+    'day_of_year': np.int16,
+    'is_holiday': np.int8,
+}
+
+_NS_PER_HOUR = 3_600_000_000_000
+
+# A lookup table covering the whole time range is used unless the range has more than
+# this many hours per row, in which case it only covers the distinct hours.
+_MAX_TABLE_HOURS_PER_ROW = 4
+
+
+def finnish_holidays(years: Iterable[int]) -> List[datetime.date]:
+    """
+    Returns the Finnish public holidays of the given years, together with Midsummer Eve
+    and Christmas Eve, which are de facto days off.
+
+    Parameters:
+    years (Iterable[int]): The years to list the holidays of.
+
+    Returns:
+    List[datetime.date]: The holidays in chronological order.
+    """
+    holidays = []
+    for year in years:
+        easter = _easter_sunday(year)
+        # Midsummer Day is the Saturday between 20 and 26 June, All Saints' Day the Saturday between 31 October and 6 November
+        midsummer_day = datetime.date(year, 6, 20) + datetime.timedelta(days=(5 - datetime.date(year, 6, 20).weekday()) % 7)
+        all_saints_day = datetime.date(year, 10, 31) + datetime.timedelta(days=(5 - datetime.date(year, 10, 31).weekday()) % 7)
+        holidays += [
+            datetime.date(year, 1, 1),  # New Year's Day
+            datetime.date(year, 1, 6),  # Epiphany
+            easter - datetime.timedelta(days=2),  # Good Friday
+            easter,  # Easter Sunday
+            easter + datetime.timedelta(days=1),  # Easter Monday
+            datetime.date(year, 5, 1),  # May Day
+            easter + datetime.timedelta(days=39),  # Ascension Day
+            easter + datetime.timedelta(days=49),  # Whit Sunday
+            midsummer_day - datetime.timedelta(days=1),  # Midsummer Eve
+            midsummer_day,
+            all_saints_day,
+            datetime.date(year, 12, 6),  # Independence Day
+            datetime.date(year, 12, 24),  # Christmas Eve
+            datetime.date(year, 12, 25),  # Christmas Day
+            datetime.date(year, 12, 26),  # Boxing Day
+        ]
+    return sorted(holidays)
+
+
+def _easter_sunday(year: int) -> datetime.date:
+    """
+    Computes the date of Easter Sunday with the anonymous Gregorian algorithm.
+    """
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+def epoch_hours(times: pd.Series) -> np.ndarray:
+    """
+    Parses timestamps once into int64 hours since the Unix epoch, UTC.
+
+    Strings and naive timestamps are taken as UTC, as pd.to_datetime(..., utc=True) does.
+    """
+    return epoch_nanoseconds(times) // _NS_PER_HOUR
+
+
+def calendar_lookup_table(hours: np.ndarray, features: List[str], tz: str = 'UTC') -> pd.DataFrame:
+    """
+    Computes the calendar features of every given epoch hour in the time zone tz.
+
+    Parameters:
+    hours (np.ndarray): Epoch hours, as returned by epoch_hours.
+    features (List[str]): The features to compute, see CALENDAR_FEATURES.
+    tz (str): The time zone in which hours, days and holidays are counted.
+
+    Returns:
+    pd.DataFrame: One row per entry of hours with one column per feature.
+    """
+    local_times = pd.DatetimeIndex(hours * _NS_PER_HOUR, tz='UTC').tz_convert(tz)
+    table = {}
+    for feature in features:
+        if feature == 'hour':
+            values = local_times.hour
+        elif feature == 'weekday':
+            values = local_times.weekday
+        elif feature == 'is_weekend':
+            values = local_times.weekday >= 5
+        elif feature == 'month':
+            values = local_times.month
+        elif feature == 'day_of_year':
+            values = local_times.dayofyear
+        elif feature == 'is_holiday':
+            holidays = finnish_holidays(range(local_times.year.min(), local_times.year.max() + 1))
+            values = local_times.normalize().tz_localize(None).isin(pd.DatetimeIndex(holidays))
+        else:
+            raise ValueError(f"Unknown calendar feature {feature!r}, expected one of {list(CALENDAR_FEATURES)}")
+        table[feature] = np.asarray(values).astype(CALENDAR_FEATURES[feature])
+    return pd.DataFrame(table)
+
+
+@instrument()
+def add_calendar_features(dataframe: pd.DataFrame, time_col: str = TIME_COL_NAME, features: Iterable[str] = ('weekday', 'hour'),
+                          tz: str = 'UTC') -> pd.DataFrame:
+    """
+    Adds calendar feature columns derived from the time column in one vectorized pass.
+
+    The timestamps are parsed once into epoch hours. The features are computed for each
+    hour of the covered range in a small lookup table and gathered from it per row, so
+    every additional feature costs one table column and one gather. The columns are added
+    to dataframe in place, which is also returned.
+
+    Parameters:
+    dataframe (pd.DataFrame): The dataframe containing the gym data.
+    time_col (str): The column name in dataframe that contains time data.
+    features (Iterable[str]): The features to add, see CALENDAR_FEATURES. 'is_holiday'
+        flags Finnish public holidays.
+    tz (str): The time zone in which hours, days and holidays are counted. Defaults to UTC.
+
+    Returns:
+    pd.DataFrame: The DataFrame with the calendar features added.
+    """
+    try:
+        features = list(features)
+        hours = epoch_hours(dataframe[time_col])
+        if len(hours) == 0:
+            for feature in features:
+                dataframe[feature] = np.array([], dtype=CALENDAR_FEATURES[feature])
+            return dataframe
+
+        first_hour = hours.min()
+        table_hours = hours.max() - first_hour + 1
+        if table_hours <= _MAX_TABLE_HOURS_PER_ROW * len(hours):
+            table = calendar_lookup_table(np.arange(first_hour, first_hour + table_hours), features, tz)
+            positions = hours - first_hour
+        else:
+            distinct_hours, positions = np.unique(hours, return_inverse=True)
+            table = calendar_lookup_table(distinct_hours, features, tz)
+
+        for feature in features:
+            dataframe[feature] = table[feature].to_numpy()[positions]
+        logging.info(f"Calendar features {features} added successfully.")
+        return dataframe
+    except Exception as e:
+        logging.error(f"Error adding calendar features: {e}")
+        raise
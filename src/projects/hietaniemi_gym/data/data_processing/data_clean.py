@@ -1,26 +1,35 @@
 import logging
 import pandas as pd
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
+from src.projects.hietaniemi_gym.data.data_processing.data_quality import nan_runs
 
 def max_na_series(column: pd.Series) -> int:
     """
     Calculates the maximum number of consecutive NaN values in a Series.
     """
     try:
-        na_mask = column.isna()
-        cumsum_mask = (~na_mask).cumsum()
-        na_groups = na_mask.groupby(cumsum_mask).sum()
-        return na_groups.max()
+        return int(nan_runs(column.isna().to_numpy())[1][0])
     except Exception as e:
         logging.error(f"Error calculating max NA series: {e}")
         raise
 
-def data_clean_na(df: pd.DataFrame) -> pd.DataFrame:
+@instrument()
+def data_clean_na(df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
     """
     Cleans the combined DataFrame by dropping rows with NaN values.
+    Reads df without modifying it and returns a new DataFrame with the original index.
+
+    Pipelines that own df pass copy=False: df itself is then returned if it has no NaN
+    values, so the common case does not copy any rows, and the caller must not use df
+    afterwards. Otherwise the remaining rows are copied out of df, as dropna does.
     """
     try:
         logging.info("Cleaning the combined DataFrame.")
-        df.dropna(inplace=True)
+        has_na = df.isna().any(axis=1).to_numpy()
+        if not has_na.any():
+            df = df if not copy else df.copy()
+        else:
+            df = df[~has_na]
         logging.info("Data cleaned successfully.")
         return df
     except Exception as e:
@@ -1,20 +1,58 @@
 
+import io
+import os
 import pandas as pd
+import numpy as np
 import logging
+from typing import Callable, Optional, Tuple
+from src.projects.hietaniemi_gym.data.data_consts import TIME_COL_NAME
+from src.projects.hietaniemi_gym.data.data_processing.data_schema import (
+    COUNTER_FALLBACK_DTYPE,
+    WEATHER_PARSE_DTYPES,
+    gym_csv_dtypes,
+    narrow_integer_columns,
+    read_gym_csv,
+    read_weather_csv
+)
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
+from src.projects.hietaniemi_gym.utils.time_series_store import (
+    TimeRange,
+    get_store_path,
+    is_store_current,
+    load_time_series_store,
+    select_time_range
+)
 
+# GYM_DATA_CHUNKSIZE: Default number of raw 10-minute rows read per chunk when
+# the gym data is streamed and aggregated to hourly frequency on the fly.
+GYM_DATA_CHUNKSIZE = 100_000
 
-def load_gym_data(file_path: str) -> pd.DataFrame:
+
+@instrument()
+def load_gym_data(file_path: str, store_dir: Optional[str] = None, time_range: Optional[TimeRange] = None) -> pd.DataFrame:
     """
     Load gym data from a CSV file into a pandas DataFrame.
 
+    The time column is parsed into UTC timestamps and the device counters are read with
+    compact dtypes, see data_schema.read_gym_csv.
+
+    With a store_dir the data is memory-mapped from the time-series store ingested from
+    the file instead, see pipelines.ingest_pipeline, and comes back sorted by time.
+    Errors reading the store are raised, see _load_from_store.
+
     Parameters:
     file_path (str): The file path to the CSV file.
+    store_dir (str): The directory of the time-series stores to read from.
+    time_range (TimeRange): The half-open [start, end) range of rows to load. With a
+        store only the partitions in range are read. Defaults to all rows.
 
     Returns:
     pd.DataFrame: The loaded gym data as a DataFrame.
     """
+    if store_dir is not None:
+        return _load_from_store(file_path, store_dir, time_range)
     try:
-        gym_data_df = pd.read_csv(file_path)
+        gym_data_df = select_time_range(read_gym_csv(file_path), TIME_COL_NAME, time_range)
         logging.info(f"Data loaded successfully from {file_path}")
         return gym_data_df
     except FileNotFoundError:
@@ -23,21 +61,267 @@ def load_gym_data(file_path: str) -> pd.DataFrame:
         logging.error(f"An error occurred while loading the data: {e}")
 
 
-def load_weather_data(file_path: str) -> pd.DataFrame:
+@instrument()
+def load_gym_data_hourly(file_path: str, chunksize: int = GYM_DATA_CHUNKSIZE, time_col: str = TIME_COL_NAME) -> pd.DataFrame:
+    """
+    Stream gym data from a CSV file in bounded chunks and aggregate it to hourly frequency.
+
+    Each chunk is cleaned of NaN rows and folded straight into hourly sums, so peak
+    memory depends on the number of hours rather than the number of raw rows. The hour
+    at the end of a chunk is carried over to the next one, so hours spanning a chunk
+    boundary are summed correctly. The result is identical to running load_gym_data,
+    data_clean_na and aggregate_hourly_usage one after another, including the dtypes.
+
+    Parameters:
+    file_path (str): The file path to the CSV file.
+    chunksize (int): The number of raw rows read per chunk.
+    time_col (str): The name of the column that contains time data.
+
+    Returns:
+    pd.DataFrame: The gym data aggregated to hourly frequency.
+    """
+    try:
+        logging.info(f"Streaming gym data from {file_path} in chunks of {chunksize} rows")
+        try:
+            hourly_parts, carry = _aggregate_chunks(pd.read_csv(file_path, chunksize=chunksize, dtype=gym_csv_dtypes(time_col)), time_col)
+        except (ValueError, OverflowError) as e:
+            logging.warning(f"Reading gym counters as {np.dtype(COUNTER_FALLBACK_DTYPE)}: {e}")
+            reader = pd.read_csv(file_path, chunksize=chunksize, dtype=gym_csv_dtypes(time_col, COUNTER_FALLBACK_DTYPE))
+            hourly_parts, carry = _aggregate_chunks(reader, time_col)
+
+        if carry is None:
+            raise ValueError(f"No valid rows found in {file_path}")
+        hourly_parts.append(carry)
+
+        gym_hourly_df = pd.concat(hourly_parts)
+        if not gym_hourly_df.index.is_unique or not gym_hourly_df.index.is_monotonic_increasing:
+            # Unsorted input can revisit an hour seen in an earlier chunk
+            gym_hourly_df = gym_hourly_df.groupby(level=0).sum()
+
+        # Fill hours without any samples with zeros, as resample does
+        full_index = pd.date_range(gym_hourly_df.index[0], gym_hourly_df.index[-1], freq='h')
+        gym_hourly_df = gym_hourly_df.reindex(full_index, fill_value=0)
+        narrow_integer_columns(gym_hourly_df)
+        gym_hourly_df.index.name = time_col
+        gym_hourly_df.reset_index(inplace=True)
+
+        logging.info("Gym data streamed and aggregated to hourly frequency successfully.")
+        return gym_hourly_df
+    except FileNotFoundError:
+        logging.error(f"The file was not found at the specified path: {file_path}")
+        raise
+    except Exception as e:
+        logging.error(f"Error streaming gym data: {e}")
+        raise
+
+
+def _aggregate_chunks(reader, time_col: str):
+    """
+    Folds the chunks of a gym CSV reader into hourly sums.
+
+    Returns the completed hours as a list of frames and the last hour, which may continue
+    in a later chunk, or None if there were no valid rows.
+    """
+    hourly_parts = []
+    carry = None
+    for chunk in reader:
+        chunk = chunk.dropna()
+        if chunk.empty:
+            continue
+        hours = pd.to_datetime(chunk[time_col], utc=True).dt.floor('h')
+        chunk_hourly = chunk.drop(columns=time_col).groupby(hours).sum()
+
+        if carry is not None:
+            chunk_hourly = pd.concat([carry, chunk_hourly]).groupby(level=0).sum()
+        # The last hour may continue in the next chunk, keep it open
+        carry = chunk_hourly.iloc[-1:]
+        hourly_parts.append(chunk_hourly.iloc[:-1])
+    return hourly_parts, carry
+
+
+@instrument()
+def load_weather_data(file_path: str, store_dir: Optional[str] = None, time_range: Optional[TimeRange] = None) -> pd.DataFrame:
     """
-    Loads the weather data from a CSV file and preprocesses it.
+    Loads the weather data from a CSV file with compact dtypes and preprocesses it.
+
+    With a store_dir the preprocessed data is memory-mapped from the time-series store
+    ingested from the file instead, see load_gym_data. A time_range selects the rows of
+    a half-open [start, end) range.
     """
     try:
+        if store_dir is not None:
+            return _load_from_store(file_path, store_dir, time_range)
         logging.info(f"Loading weather data from {file_path}")
-        weather_df = pd.read_csv(file_path)
-        weather_df['Hour']  = weather_df['Hour'] + ':00'
-        weather_df['time'] = pd.to_datetime(weather_df['Year'].astype(str) + '-' +
-                                    weather_df['Month'].astype(str).str.zfill(2) + '-' +
-                                    weather_df['Day'].astype(str).str.zfill(2) + ' ' +
-                                    weather_df['Hour'])
-        weather_df['time'] = weather_df['time'].dt.tz_localize('UTC')
+        weather_df = select_time_range(preprocess_weather_data(read_weather_csv(file_path)), 'time', time_range)
         logging.info("Weather data loaded and preprocessed successfully.")
         return weather_df
     except Exception as e:
         logging.error(f"Error loading weather data: {e}")
         raise
+
+
+def _load_from_store(file_path: str, store_dir: str, time_range: Optional[TimeRange]) -> pd.DataFrame:
+    """
+    Loads the rows of a time range from the store ingested from file_path.
+
+    Raises:
+    FileNotFoundError: If file_path was not ingested into store_dir.
+    ValueError: If file_path changed since it was ingested, so the store is stale.
+    """
+    store_path = get_store_path(file_path, store_dir)
+    if os.path.isdir(store_path) and os.path.exists(file_path) and not is_store_current(store_path, file_path):
+        message = f"{file_path} changed since it was ingested into {store_path}, rerun the ingest pipeline"
+        logging.error(message)
+        raise ValueError(message)
+    logging.info(f"Loading data from the time-series store {store_path}")
+    return load_time_series_store(store_path, time_range)
+
+
+@instrument()
+def preprocess_weather_data(weather_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the UTC 'time' column to raw weather data read from CSV and drops the columns it
+    is computed from, together with 'Timezone'. Modifies weather_df in place.
+    """
+    weather_df['Hour']  = weather_df['Hour'] + ':00'
+    weather_df['time'] = weather_timestamps(weather_df)
+    parse_columns = [column for column in [*WEATHER_PARSE_DTYPES, 'Timezone'] if column in weather_df.columns]
+    weather_df.drop(columns=parse_columns, inplace=True)
+    return weather_df
+
+
+@instrument()
+def load_csv_tail(file_path: str, offset: int = 0, read: Callable = pd.read_csv) -> Tuple[pd.DataFrame, np.ndarray, int]:
+    """
+    Load the rows of a CSV file that start at or after a byte offset.
+
+    Only complete lines are read, so a row that is still being written is left for the
+    next call. The header line is always taken from the start of the file.
+
+    Parameters:
+    file_path (str): The file path to the CSV file.
+    offset (int): The byte offset of the first row to read. Offsets inside the header
+        start at the first data row.
+    read (Callable): Parses the CSV bytes, e.g. data_schema.read_gym_csv. Defaults to pd.read_csv.
+
+    Returns:
+    Tuple[pd.DataFrame, np.ndarray, int]: The rows read, the byte offset at which each
+        of them starts, and the byte offset just after the last complete line.
+    """
+    try:
+        with open(file_path, 'rb') as file:
+            header = file.readline()
+            start = max(offset, len(header))
+            file.seek(start)
+            data = file.read()
+        data = data[:data.rfind(b'\n') + 1]
+
+        # Every row starts at the file offset right after the previous newline
+        newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n'))
+        row_offsets = start + np.concatenate([[0], newlines[:-1] + 1]) if len(newlines) else np.empty(0, dtype=np.int64)
+
+        tail_df = read(io.BytesIO(header + data))
+        if len(tail_df) != len(row_offsets):
+            raise ValueError(f"Found {len(row_offsets)} lines but parsed {len(tail_df)} rows in {file_path}")
+        logging.info(f"Loaded {len(tail_df)} rows from {file_path} starting at byte {start}")
+        return tail_df, row_offsets, start + len(data)
+    except FileNotFoundError:
+        logging.error(f"The file was not found at the specified path: {file_path}")
+        raise
+    except Exception as e:
+        logging.error(f"Error loading rows from {file_path}: {e}")
+        raise
+
+
+def weather_timestamps(weather_df: pd.DataFrame) -> pd.Series:
+    """
+    Computes the UTC timestamps of weather rows from their Year, Month, Day and Hour columns.
+
+    Well-formed rows are converted numerically, without building and re-parsing date
+    strings. Rows that do not pass validation are handed to the string parser, which
+    also raises the usual errors for rows that cannot be parsed at all.
+
+    Parameters:
+    weather_df (pd.DataFrame): The weather data with an 'HH:MM:SS' formatted Hour column.
+
+    Returns:
+    pd.Series: The timestamps as a datetime64[ns, UTC] Series aligned with weather_df.
+    """
+    nanoseconds, valid = _weather_timestamps_numeric(weather_df)
+    timestamps = pd.Series(pd.DatetimeIndex(nanoseconds.view('datetime64[ns]')).tz_localize('UTC'), index=weather_df.index)
+    if not valid.all():
+        logging.warning(f"Parsing {(~valid).sum()} malformed weather timestamps as strings.")
+        timestamps[~valid] = _weather_timestamps_str(weather_df[~valid])
+    return timestamps
+
+
+def _weather_timestamps_str(weather_df: pd.DataFrame) -> pd.Series:
+    """
+    Parses weather timestamps by concatenating and parsing date strings.
+    """
+    time = pd.to_datetime(weather_df['Year'].astype(str) + '-' +
+                          weather_df['Month'].astype(str).str.zfill(2) + '-' +
+                          weather_df['Day'].astype(str).str.zfill(2) + ' ' +
+                          weather_df['Hour'])
+    return time.dt.tz_localize('UTC')
+
+
+def _weather_timestamps_numeric(weather_df: pd.DataFrame):
+    """
+    Converts weather rows to epoch nanoseconds with integer arithmetic.
+
+    Returns the int64 nanoseconds and a mask of the rows that were well formed.
+    """
+    n_rows = len(weather_df)
+    valid = np.ones(n_rows, dtype=bool)
+    date_parts = []
+    for column in ['Year', 'Month', 'Day']:
+        values = weather_df[column].to_numpy()
+        if not np.issubdtype(values.dtype, np.integer):
+            values = pd.to_numeric(weather_df[column], errors='coerce').to_numpy(dtype=float)
+            integral = np.isfinite(values) & (values == np.round(values))
+            valid &= integral
+            values = np.where(integral, values, 1)
+        date_parts.append(values.astype(np.int64))
+    year, month, day = date_parts
+
+    # The Hour column is expected as 'HH:MM:SS'. It holds few distinct values, so only
+    # those are decoded, reading their digits as code points
+    hour_codes, hour_values = pd.factorize(weather_df['Hour'])
+    hour_text = np.asarray(hour_values, dtype=str)
+    width = hour_text.dtype.itemsize // 4
+    if width < 8:
+        return np.zeros(n_rows, dtype=np.int64), np.zeros(n_rows, dtype=bool)
+    codes = hour_text.view(np.uint32).reshape(len(hour_text), width).astype(np.int64) - ord('0')
+    digits = codes[:, [0, 1, 3, 4, 6, 7]]
+    hour_valid = ((digits >= 0) & (digits <= 9)).all(axis=1)
+    hour_valid &= (codes[:, 2] == ord(':') - ord('0')) & (codes[:, 5] == ord(':') - ord('0'))
+    hour_valid &= (codes[:, 8:] == -ord('0')).all(axis=1)
+    hour, minute, second = (digits[:, 0::2] * 10 + digits[:, 1::2]).T
+    hour_valid &= (hour <= 23) & (minute <= 59) & (second <= 59)
+    seconds_of_day = hour * 3600 + minute * 60 + second
+
+    # Missing hours are coded as -1 by factorize
+    valid &= hour_codes >= 0
+    hour_codes = np.maximum(hour_codes, 0)
+    valid &= hour_valid[hour_codes]
+    seconds_of_day = seconds_of_day[hour_codes]
+
+    # Range checks, including the length of the month in leap years
+    is_leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_index = np.clip(month, 1, 12) - 1
+    days_in_month = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])[month_index] + ((month_index == 1) & is_leap)
+    valid &= (year >= 1678) & (year <= 2261) & (month >= 1) & (month <= 12)
+    valid &= (day >= 1) & (day <= days_in_month)
+
+    # Days since 1970-01-01 from the proleptic Gregorian calendar date
+    shifted_year = year - (month <= 2)
+    era = np.floor_divide(shifted_year, 400)
+    year_of_era = shifted_year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+
+    seconds = days * 86400 + seconds_of_day
+    nanoseconds = np.where(valid, seconds, 0) * 1_000_000_000
+    return nanoseconds, valid
@@ -1,19 +1,20 @@
 import pandas as pd
 import logging
+from src.projects.hietaniemi_gym.data.data_processing.sorted_join import sorted_join
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
 
-def merge_datasets(weather_df: pd.DataFrame, gym_data_df: pd.DataFrame) -> pd.DataFrame:
+@instrument()
+def merge_datasets(weather_df: pd.DataFrame, gym_data_df: pd.DataFrame, how: str = 'inner', tolerance=None, interval=None) -> pd.DataFrame:
     """
-    Merges weather and gym data DataFrames on their datetime indices.
+    Merges weather and gym data DataFrames on their 'time' columns.
+    Reads both DataFrames without modifying them; the merged rows are a new DataFrame
+    with 'time' as its first column. how, tolerance and interval select the join, see
+    sorted_join; the default inner join keeps the weather hours that have gym data.
     """
     try:
         logging.info("Merging weather and gym datasets.")
-        weather_df.set_index('time', inplace=True)
-        gym_data_df.set_index('time', inplace=True)
-
-        combined_df = pd.merge(weather_df, gym_data_df, left_index=True, right_index=True, how='inner')
-
-        combined_df.reset_index(inplace=True)
-        logging.info("Datasets merged successfully.")
+        combined_df, report = sorted_join(weather_df, gym_data_df, 'time', how, tolerance, interval)
+        logging.info(f"Datasets merged successfully: {report.left_dropped} weather and {report.right_dropped} gym rows dropped.")
         return combined_df
     except Exception as e:
         logging.error(f"Error merging datasets: {e}")
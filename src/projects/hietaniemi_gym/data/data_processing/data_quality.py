@@ -0,0 +1,196 @@
+import os
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.projects.hietaniemi_gym.data.data_consts import TIME_COL_NAME
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
+from src.projects.hietaniemi_gym.utils.stage_cache import hash_file, path_id
+
+# DATA_QUALITY_VERSION: Version of the profiler, bumped whenever the report changes so
+# cached reports are recomputed.
+DATA_QUALITY_VERSION = 1
+
+
+@dataclass
+class DataQualityRules():
+    """
+    cadence: The expected time between consecutive rows. Longer steps are gaps.
+    min_time, max_time: Timestamps outside [min_time, max_time) are out of range.
+    non_negative: The columns whose negative values are issues, or None for all numeric
+        columns. Negative values are counted in every numeric column either way.
+    """
+    cadence: str = '10min'
+    min_time: str = '2000-01-01T00:00:00+00:00'
+    max_time: str = '2100-01-01T00:00:00+00:00'
+    non_negative: Optional[List[str]] = None
+
+
+# The gym data is sampled every 10 minutes, the weather data every hour. Temperatures
+# are negative in winter and the snow depth is -1 on days without snow cover.
+GYM_QUALITY_RULES = DataQualityRules(cadence='10min')
+WEATHER_QUALITY_RULES = DataQualityRules(cadence='1h', non_negative=['Precipitation (mm)'])
+
+
+@dataclass
+class DataQualityReport():
+    """
+    The data quality of one table. Times are ISO strings and None for a table without
+    valid timestamps. columns maps each column to its nan_count, longest_nan_run and,
+    for numeric columns, negative_count.
+    """
+    rows: int
+    rules: dict
+    min_time: Optional[str] = None
+    max_time: Optional[str] = None
+    invalid_times: int = 0
+    out_of_range_times: int = 0
+    duplicate_times: int = 0
+    gaps: int = 0
+    missing_slots: int = 0
+    longest_gap_seconds: float = 0.0
+    columns: Dict[str, dict] = field(default_factory=dict)
+
+    def issues(self) -> List[str]:
+        """
+        Describes every violated rule.
+        """
+        issues = []
+        for name in ['invalid_times', 'out_of_range_times', 'duplicate_times']:
+            if getattr(self, name):
+                issues.append(f"{getattr(self, name)} {name.replace('_', ' ')}")
+        if self.gaps:
+            issues.append(f"{self.gaps} gaps in the {self.rules['cadence']} cadence with {self.missing_slots} missing rows, "
+                          f"the longest {pd.Timedelta(seconds=self.longest_gap_seconds)}")
+        for column, quality in self.columns.items():
+            if quality['nan_count']:
+                issues.append(f"{quality['nan_count']} missing values in {column}, at most {quality['longest_nan_run']} in a row")
+            non_negative = self.rules['non_negative']
+            if quality.get('negative_count') and (non_negative is None or column in non_negative):
+                issues.append(f"{quality['negative_count']} negative values in {column}")
+        return issues
+
+
+def nan_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Counts the True values of each column of a boolean mask and finds their longest run.
+
+    All columns are run-length encoded at once: they are laid out one after another with
+    a False value between them, and the runs are read from the edges of one np.diff.
+
+    Parameters:
+    mask (np.ndarray): A 1D mask or a 2D mask with one column per series.
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray]: The number of True values and the length of the
+        longest run of True values per column.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if mask.ndim == 1:
+        mask = mask[:, None]
+    rows, columns = mask.shape
+    padded = np.zeros((columns, rows + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask.T
+    edges = np.diff(padded.ravel())
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    longest = np.zeros(columns, dtype=np.int64)
+    np.maximum.at(longest, starts // (rows + 2), ends - starts)
+    return mask.sum(axis=0), longest
+
+
+@instrument()
+def profile_data_quality(df: pd.DataFrame, time_col: str = TIME_COL_NAME, rules: Optional[DataQualityRules] = None) -> DataQualityReport:
+    """
+    Profiles a table in one vectorized pass over its columns.
+
+    Counts missing values and their longest runs in every column, negative values in
+    every numeric column and, in the time column, unparseable, out-of-range and duplicate
+    timestamps and gaps in the expected cadence.
+
+    Parameters:
+    df (pd.DataFrame): The table to profile. It is not modified.
+    time_col (str): The column with the timestamps of the rows.
+    rules (DataQualityRules): The expected cadence and time range. Defaults to GYM_QUALITY_RULES.
+
+    Returns:
+    DataQualityReport: The quality of the table.
+    """
+    rules = rules or GYM_QUALITY_RULES
+    report = DataQualityReport(rows=len(df), rules=asdict(rules))
+
+    nan_counts, longest_runs = nan_runs(df.isna().to_numpy())
+    numeric = df.select_dtypes(include='number')
+    negative_counts = dict(zip(numeric.columns, (numeric.to_numpy() < 0).sum(axis=0)))
+    for column, nan_count, longest_run in zip(df.columns, nan_counts, longest_runs):
+        report.columns[str(column)] = {'nan_count': int(nan_count), 'longest_nan_run': int(longest_run)}
+        if column in negative_counts:
+            report.columns[str(column)]['negative_count'] = int(negative_counts[column])
+
+    if time_col in df.columns:
+        keys = pd.DatetimeIndex(pd.to_datetime(df[time_col], utc=True, errors='coerce')).as_unit('ns').asi8
+        valid = keys != np.iinfo(np.int64).min
+        keys = keys[valid]
+        report.invalid_times = int(len(valid) - len(keys))
+        report.out_of_range_times = int(np.count_nonzero(
+            (keys < pd.Timestamp(rules.min_time).value) | (keys >= pd.Timestamp(rules.max_time).value)))
+        if len(keys):
+            if not (keys[1:] >= keys[:-1]).all():
+                keys = np.sort(keys)
+            report.min_time = pd.Timestamp(keys[0], tz='UTC').isoformat()
+            report.max_time = pd.Timestamp(keys[-1], tz='UTC').isoformat()
+            steps = np.diff(keys)
+            cadence = pd.Timedelta(rules.cadence).value
+            gap_steps = steps[steps > cadence]
+            report.duplicate_times = int(np.count_nonzero(steps == 0))
+            report.gaps = len(gap_steps)
+            report.missing_slots = int((-(-gap_steps // cadence) - 1).sum())
+            report.longest_gap_seconds = float(gap_steps.max() / 1e9) if len(gap_steps) else 0.0
+    return report
+
+
+def data_quality_report(file_path: str, report_dir: str, df: Optional[pd.DataFrame] = None, time_col: str = TIME_COL_NAME,
+                        rules: Optional[DataQualityRules] = None, load: Optional[Callable[[str], pd.DataFrame]] = None) -> DataQualityReport:
+    """
+    Returns the data quality report of a source file, cached in report_dir.
+
+    The report is stored as '<file name>-<path id>.quality.json' together with the hash of
+    the file, the rules and DATA_QUALITY_VERSION, and reused while none of them changed.
+    The path id keeps the reports of sources with the same file name apart, see
+    stage_cache.path_id. On a miss df is profiled, or the file loaded with load if no df
+    is given.
+
+    Parameters:
+    file_path (str): The source file.
+    report_dir (str): The directory of the cached report, usually the dataset directory.
+    df (pd.DataFrame): The loaded content of the file, if already at hand.
+    time_col (str): The column with the timestamps of the rows.
+    rules (DataQualityRules): The expected cadence and time range. Defaults to GYM_QUALITY_RULES.
+    load (Callable[[str], pd.DataFrame]): Loads the file if df is not given. Defaults to pd.read_csv.
+
+    Returns:
+    DataQualityReport: The quality of the file.
+    """
+    rules = rules or GYM_QUALITY_RULES
+    report_path = os.path.join(report_dir, f'{os.path.basename(file_path)}-{path_id(file_path)}.quality.json')
+    key = {'source_hash': hash_file(file_path), 'version': DATA_QUALITY_VERSION, 'time_col': time_col, 'rules': asdict(rules)}
+    if os.path.isfile(report_path):
+        with open(report_path) as file:
+            cached = json.load(file)
+        if cached['key'] == key:
+            logging.info(f"Data quality report of {file_path} loaded from {report_path}")
+            return DataQualityReport(**cached['report'])
+
+    if df is None:
+        df = (load or pd.read_csv)(file_path)
+    report = profile_data_quality(df, time_col, rules)
+    for issue in report.issues():
+        logging.warning(f"Data quality of {file_path}: {issue}")
+    os.makedirs(report_dir, exist_ok=True)
+    with open(report_path + '.tmp', 'w') as file:
+        json.dump({'key': key, 'report': asdict(report)}, file, indent=2)
+    os.replace(report_path + '.tmp', report_path)
+    logging.info(f"Data quality report of {file_path} written to {report_path}")
+    return report
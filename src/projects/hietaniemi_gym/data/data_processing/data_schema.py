@@ -0,0 +1,138 @@
+import logging
+from collections import defaultdict
+from typing import Iterable, Optional
+import numpy as np
+import pandas as pd
+from src.projects.hietaniemi_gym.data.data_consts import TIME_COL_NAME
+
+# COUNTER_PARSE_DTYPE: The dtype the device minute counters are parsed with. The CSV
+# parser wraps values that do not fit a requested int8, int16 or int32 dtype around
+# silently, only int64 raises on overflow. So counters are parsed as int64 and narrowed
+# right afterwards, see narrow_integer_columns; the wide parse buffer is transient. A
+# 10-minute counter is 0-10 and narrowed to uint8.
+COUNTER_PARSE_DTYPE = np.int64
+
+# COUNTER_FALLBACK_DTYPE: The dtype of counters with missing or fractional values, which
+# have no integer representation, or values beyond the int64 range.
+COUNTER_FALLBACK_DTYPE = np.float32
+
+# WEATHER_VALUE_DTYPES: The measured weather columns. Their precision is 0.1 at best.
+WEATHER_VALUE_DTYPES = {
+    'Precipitation (mm)': np.float32,
+    'Snow depth (cm)': np.float32,
+    'Temperature (degC)': np.float32,
+}
+
+# WEATHER_PARSE_DTYPES: The weather columns that are only read to compute the time column.
+# They are dropped once it is computed. 'Timezone' is always UTC and not read at all.
+WEATHER_PARSE_DTYPES = {'Year': np.int16, 'Month': np.int8, 'Day': np.int8, 'Hour': str}
+
+_UNSIGNED_DTYPES = [np.dtype(dtype) for dtype in (np.uint8, np.uint16, np.uint32, np.uint64)]
+_SIGNED_DTYPES = [np.dtype(dtype) for dtype in (np.int8, np.int16, np.int32, np.int64)]
+
+
+def gym_csv_dtypes(time_col: str = TIME_COL_NAME, counter_dtype=COUNTER_PARSE_DTYPE) -> defaultdict:
+    """
+    Returns the read_csv dtypes of gym data: the time column as text and any other column,
+    whatever devices the file has, as counter_dtype.
+    """
+    return defaultdict(lambda: counter_dtype, {time_col: str})
+
+
+def weather_csv_options() -> dict:
+    """
+    Returns the read_csv usecols and dtypes of raw weather data.
+    """
+    dtypes = {**WEATHER_PARSE_DTYPES, **WEATHER_VALUE_DTYPES}
+    return {'usecols': list(dtypes), 'dtype': dtypes}
+
+
+def read_gym_csv(source, time_col: str = TIME_COL_NAME) -> pd.DataFrame:
+    """
+    Reads gym data with compact dtypes, see compact_gym_frame.
+
+    Counters are parsed as COUNTER_PARSE_DTYPE, or as COUNTER_FALLBACK_DTYPE if the file
+    has missing, fractional or out of range counter values.
+
+    Parameters:
+    source: A file path or a seekable file object holding CSV data.
+    time_col (str): The name of the column that contains time data.
+
+    Returns:
+    pd.DataFrame: The gym data.
+    """
+    try:
+        gym_df = pd.read_csv(source, dtype=gym_csv_dtypes(time_col))
+    except (ValueError, OverflowError) as e:
+        logging.warning(f"Reading gym counters as {np.dtype(COUNTER_FALLBACK_DTYPE)}: {e}")
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        gym_df = pd.read_csv(source, dtype=gym_csv_dtypes(time_col, COUNTER_FALLBACK_DTYPE))
+    return compact_gym_frame(gym_df, time_col)
+
+
+def read_weather_csv(source) -> pd.DataFrame:
+    """
+    Reads the columns of raw weather data that preprocess_weather_data needs, with compact
+    dtypes. Date parts with missing values are left for pandas to infer.
+
+    Parameters:
+    source: A file path or a seekable file object holding CSV data.
+
+    Returns:
+    pd.DataFrame: The raw weather data.
+    """
+    options = weather_csv_options()
+    try:
+        return pd.read_csv(source, **options)
+    except ValueError as e:
+        logging.warning(f"Reading weather date parts with inferred dtypes: {e}")
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return pd.read_csv(source, usecols=options['usecols'], dtype=WEATHER_VALUE_DTYPES)
+
+
+def compact_gym_frame(gym_df: pd.DataFrame, time_col: str = TIME_COL_NAME) -> pd.DataFrame:
+    """
+    Parses the time column into UTC timestamps, stored as int64 epoch nanoseconds, and
+    narrows the integer counters, see narrow_integer_columns. Modifies gym_df in place,
+    which is also returned.
+    """
+    gym_df[time_col] = pd.to_datetime(gym_df[time_col], utc=True)
+    return narrow_integer_columns(gym_df, [column for column in gym_df.columns if column != time_col])
+
+
+def compact_integer_dtype(values: np.ndarray) -> np.dtype:
+    """
+    Returns the smallest integer dtype that holds all values, unsigned if none is negative.
+    """
+    if len(values) == 0:
+        return _UNSIGNED_DTYPES[0]
+    low, high = values.min(), values.max()
+    if low >= 0:
+        return next(dtype for dtype in _UNSIGNED_DTYPES if high <= np.iinfo(dtype).max)
+    return next(dtype for dtype in _SIGNED_DTYPES if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max)
+
+
+def narrow_integer_columns(df: pd.DataFrame, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Casts integer columns to the smallest integer dtype that holds their values.
+
+    Aggregations such as sum compute in 64 bits, so their results cannot overflow before
+    they are narrowed, and a column is only as wide as its largest value requires. Other
+    columns are left as they are. Modifies df in place, which is also returned.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame to narrow.
+    columns (Iterable[str]): The columns to narrow. Defaults to all columns.
+
+    Returns:
+    pd.DataFrame: The DataFrame with narrowed integer columns.
+    """
+    for column in df.columns if columns is None else columns:
+        values = df[column].to_numpy()
+        if values.dtype.kind in 'iu':
+            dtype = compact_integer_dtype(values)
+            if dtype != values.dtype:
+                df[column] = values.astype(dtype)
+    return df
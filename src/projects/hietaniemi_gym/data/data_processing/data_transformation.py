@@ -1,31 +1,42 @@
 import pandas as pd
 import logging
-import copy
 from src.projects.hietaniemi_gym.data.data_consts import DEVICE_COLUMNS, TIME_COL_NAME
+from src.projects.hietaniemi_gym.data.data_processing.calendar_features import add_calendar_features
+from src.projects.hietaniemi_gym.data.data_processing.data_schema import narrow_integer_columns
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
 
-def aggregate_hourly_usage(dataframe: pd.DataFrame, time_col: str = TIME_COL_NAME) -> pd.DataFrame:
+@instrument()
+def aggregate_hourly_usage(dataframe: pd.DataFrame, time_col: str = TIME_COL_NAME, copy: bool = True) -> pd.DataFrame:
     """
     Aggregate the time series data to hourly frequency.
 
+    dataframe is not modified. Pipelines that own their frame pass copy=False: the time
+    column is then converted and set as the index of dataframe in place, which saves a
+    shallow copy, and dataframe must not be used afterwards, even if the aggregation fails.
+    Integer sums are computed in 64 bits and narrowed to the smallest dtype that holds them.
+
     Parameters:
     dataframe (pd.DataFrame): The input DataFrame with a time column.
     time_col (str): The name of the column in dataframe that contains time data.
+    copy (bool): Whether to leave dataframe unmodified.
 
     Returns:
     pd.DataFrame: The DataFrame aggregated to hourly frequency.
     """
     try:
-        # create copy 
-        dataframe_hourly = copy.deepcopy(dataframe)
+        if copy:
+            # A shallow copy shares the column data, the steps below only replace the
+            # time column and the index of the copy
+            dataframe = dataframe.copy(deep=False)
 
         # Convert time column to datetime if not already
-        dataframe_hourly[time_col] = pd.to_datetime(dataframe_hourly[time_col])
+        dataframe[time_col] = pd.to_datetime(dataframe[time_col])
 
         # Set the time column as the DataFrame index
-        dataframe_hourly.set_index(time_col, inplace=True)
+        dataframe.set_index(time_col, inplace=True)
 
         # Resample and aggregate data to hourly frequency
-        dataframe_hourly = dataframe_hourly.resample('H').sum()
+        dataframe_hourly = narrow_integer_columns(dataframe.resample('h').sum())
 
         # Reset index to move 'time' back to a column
         dataframe_hourly.reset_index(inplace=True)
@@ -37,9 +48,12 @@ def aggregate_hourly_usage(dataframe: pd.DataFrame, time_col: str = TIME_COL_NAM
         raise
 
 
+@instrument()
 def add_weekday_feature(dataframe: pd.DataFrame, time_col: str = TIME_COL_NAME) -> pd.DataFrame:
     """
     Adds a 'weekday' column to the DataFrame representing the day of the week as a number.
+    The column is added to dataframe in place, which is also returned. To add several
+    calendar features, call add_calendar_features once instead.
 
     Parameters:
     dataframe (pd.DataFrame): The dataframe containing the gym data.
@@ -48,13 +62,15 @@ def add_weekday_feature(dataframe: pd.DataFrame, time_col: str = TIME_COL_NAME)
     Returns:
     pd.DataFrame: The DataFrame with the new 'weekday' feature added.
     """
-    dataframe['weekday'] = pd.to_datetime(dataframe[time_col], utc=True).dt.weekday
-    return dataframe
+    return add_calendar_features(dataframe, time_col, ['weekday'])
 
 
+@instrument()
 def add_hour_feature(dataframe: pd.DataFrame, time_col: str = TIME_COL_NAME) -> pd.DataFrame:
     """
     Adds an 'hour' column to the DataFrame representing the hour of the day.
+    The column is added to dataframe in place, which is also returned. To add several
+    calendar features, call add_calendar_features once instead.
 
     Parameters:
     dataframe (pd.DataFrame): The dataframe containing the gym data.
@@ -63,12 +79,14 @@ def add_hour_feature(dataframe: pd.DataFrame, time_col: str = TIME_COL_NAME) ->
     Returns:
     pd.DataFrame: The DataFrame with the new 'hour' feature added.
     """
-    dataframe['hour'] = pd.to_datetime(dataframe[time_col], utc=True).dt.hour
-    return dataframe
+    return add_calendar_features(dataframe, time_col, ['hour'])
 
+@instrument()
 def add_sum_minutes_feature(dataframe: pd.DataFrame, device_columns: list = DEVICE_COLUMNS) -> pd.DataFrame:
     """
     Adds a 'sum_minutes' column to the DataFrame which is the sum of all specified device columns.
+    The column is added to dataframe in place, which is also returned. Integer sums are
+    narrowed to the smallest dtype that holds them.
 
     Parameters:
     dataframe (pd.DataFrame): The dataframe containing the gym data.
@@ -78,5 +96,5 @@ def add_sum_minutes_feature(dataframe: pd.DataFrame, device_columns: list = DEVI
     pd.DataFrame: The DataFrame with the new 'sum_minutes' feature added.
     """
     dataframe['sum_minutes'] = dataframe[device_columns].sum(axis=1)
-    return dataframe
+    return narrow_integer_columns(dataframe, ['sum_minutes'])
 
@@ -0,0 +1,146 @@
+import logging
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.projects.hietaniemi_gym.data.data_consts import TIME_COL_NAME
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
+
+# JOIN_TYPES: The joins supported by sorted_join.
+JOIN_TYPES = ('inner', 'asof', 'interval')
+
+
+@dataclass
+class JoinReport():
+    how: str
+    left_rows: int
+    right_rows: int
+    matched_rows: int
+    left_dropped: int
+    right_dropped: int
+
+
+def epoch_nanoseconds(times: pd.Series) -> np.ndarray:
+    """
+    Converts timestamps to int64 nanoseconds since the Unix epoch, UTC.
+
+    Strings and naive timestamps are taken as UTC, as pd.to_datetime(..., utc=True) does.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times, utc=True)
+    nanoseconds = pd.DatetimeIndex(times).as_unit('ns').asi8
+    if (nanoseconds == np.iinfo(np.int64).min).any():
+        raise ValueError("Missing timestamps have no epoch key")
+    return nanoseconds
+
+
+@instrument()
+def sorted_join(left: pd.DataFrame, right: pd.DataFrame, on: str = TIME_COL_NAME, how: str = 'inner',
+                tolerance: Optional[pd.Timedelta] = None, interval: Optional[pd.Timedelta] = None,
+                suffixes: Tuple[str, str] = ('_x', '_y')) -> Tuple[pd.DataFrame, JoinReport]:
+    """
+    Joins two DataFrames on a time column through binary search on sorted int64 epoch keys.
+
+    Every left row is matched to at most one right row:
+    - 'inner': the right row with the same key.
+    - 'asof': the last right row at or before the key, at most tolerance earlier if given.
+    - 'interval': the right row whose interval [key, key + interval) contains the key,
+      e.g. interval=pd.Timedelta(hours=1) puts 10-minute rows into their hourly row.
+
+    Unmatched left rows are dropped. The right keys must be unique; they are sorted if they
+    are not already. Matching is one vectorized np.searchsorted of the left keys into the
+    right keys, so the cost is O((n + m) log m) time and O(n + m) memory, without hash
+    tables. Neither input is modified.
+
+    Parameters:
+    left (pd.DataFrame): The left rows, whose order is kept.
+    right (pd.DataFrame): The right rows.
+    on (str): The time column of both frames. It is kept from the left frame only.
+    how (str): One of JOIN_TYPES.
+    tolerance (pd.Timedelta): The maximum distance of an as-of match.
+    interval (pd.Timedelta): The length of the right intervals, required for 'interval'.
+    suffixes (Tuple[str, str]): Appended to other columns that appear in both frames.
+
+    Returns:
+    Tuple[pd.DataFrame, JoinReport]: The joined rows, with on as the first column followed
+        by the other left and right columns, and the row counts of the join.
+    """
+    try:
+        if how not in JOIN_TYPES:
+            raise ValueError(f"Unknown join type {how!r}, expected one of {JOIN_TYPES}")
+        if how == 'interval' and interval is None:
+            raise ValueError("An interval join needs the interval length")
+
+        left_keys = epoch_nanoseconds(left[on])
+        right_keys = epoch_nanoseconds(right[on])
+        right_order = None
+        if len(right_keys) > 1 and not (right_keys[1:] >= right_keys[:-1]).all():
+            right_order = np.argsort(right_keys, kind='stable')
+            right_keys = right_keys[right_order]
+        if len(right_keys) > 1 and not (right_keys[1:] > right_keys[:-1]).all():
+            raise ValueError(f"The right join keys in column {on!r} are not unique")
+
+        left_positions, right_positions = _match(left_keys, right_keys, how, tolerance, interval)
+        if right_order is not None:
+            right_positions = right_order[right_positions]
+
+        joined = _take_columns(left, right, on, left_positions, right_positions, suffixes)
+        right_matched = np.zeros(len(right), dtype=bool)
+        right_matched[right_positions] = True
+        report = JoinReport(
+            how=how,
+            left_rows=len(left),
+            right_rows=len(right),
+            matched_rows=len(left_positions),
+            left_dropped=len(left) - len(left_positions),
+            right_dropped=len(right) - int(right_matched.sum()),
+        )
+        logging.info(f"Sorted {how} join matched {report.matched_rows} rows, dropped "
+                     f"{report.left_dropped} left and {report.right_dropped} right rows.")
+        return joined, report
+    except Exception as e:
+        logging.error(f"Error joining datasets: {e}")
+        raise
+
+
+def _match(left_keys: np.ndarray, right_keys: np.ndarray, how: str, tolerance: Optional[pd.Timedelta],
+           interval: Optional[pd.Timedelta]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the positions of the matched left rows and of their rows in the sorted right keys.
+    """
+    if len(right_keys) == 0:
+        empty = np.array([], dtype=np.intp)
+        return empty, empty
+
+    if how == 'inner':
+        positions = np.minimum(np.searchsorted(right_keys, left_keys), len(right_keys) - 1)
+        matched = right_keys[positions] == left_keys
+    else:
+        # The last right key at or before each left key
+        positions = np.searchsorted(right_keys, left_keys, side='right') - 1
+        matched = positions >= 0
+        positions = np.maximum(positions, 0)
+        distance = left_keys - right_keys[positions]
+        if how == 'asof' and tolerance is not None:
+            matched &= distance <= pd.Timedelta(tolerance).value
+        elif how == 'interval':
+            matched &= distance < pd.Timedelta(interval).value
+
+    left_positions = np.flatnonzero(matched)
+    return left_positions, positions[left_positions]
+
+
+def _take_columns(left: pd.DataFrame, right: pd.DataFrame, on: str, left_positions: np.ndarray,
+                  right_positions: np.ndarray, suffixes: Tuple[str, str]) -> pd.DataFrame:
+    left_columns = [column for column in left.columns if column != on]
+    right_columns = [column for column in right.columns if column != on]
+    overlap = set(left_columns) & set(right_columns)
+
+    columns = {on: left[on].take(left_positions).reset_index(drop=True)}
+    for column in left_columns:
+        name = column + suffixes[0] if column in overlap else column
+        columns[name] = left[column].take(left_positions).reset_index(drop=True)
+    for column in right_columns:
+        name = column + suffixes[1] if column in overlap else column
+        columns[name] = right[column].take(right_positions).reset_index(drop=True)
+    return pd.DataFrame(columns)
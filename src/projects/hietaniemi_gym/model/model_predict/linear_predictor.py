@@ -0,0 +1,114 @@
+import logging
+from dataclasses import dataclass
+from typing import List
+import numpy as np
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
+
+# Only NumPy is imported at module level, so that loading and scoring a linear model
+# does not pull in pandas, joblib or scikit-learn.
+
+# LINEAR_MODEL_FILE_NAME: The default file name of an exported linear model, written
+# next to the pickled model it was exported from.
+LINEAR_MODEL_FILE_NAME = 'linear_model.npz'
+
+
+def export_linear_model(model, output_path: str, feature_names=None) -> None:
+    """
+    Exports the coefficients of a fitted linear model to an .npz file.
+
+    Parameters:
+    model: A fitted scikit-learn style linear model with coef_ and intercept_.
+    output_path (str): The path of the .npz file to write.
+    feature_names (list): The input columns in model order. Defaults to the model's
+        feature_names_in_.
+
+    Returns:
+    None: This function does not return anything.
+    """
+    try:
+        if feature_names is None:
+            feature_names = model.feature_names_in_
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        intercept = np.asarray(model.intercept_, dtype=np.float64)
+        if coef.shape[-1] != len(feature_names):
+            raise ValueError(f"Model has {coef.shape[-1]} coefficients but {len(feature_names)} feature names")
+        np.savez(output_path, coef=coef, intercept=intercept, feature_names=np.asarray(feature_names, dtype=str))
+        logging.info(f"Linear model exported to {output_path}")
+    except Exception as e:
+        logging.error(f"Error exporting linear model: {e}")
+        raise
+
+
+@dataclass(frozen=True)
+class LinearCoefficients():
+    """
+    The coefficients of a linear model loaded from an export_linear_model artifact.
+    """
+    coef: np.ndarray
+    intercept: np.ndarray
+    feature_names: List[str]
+
+
+class LinearPredictorModel:
+    """
+    NumPy-only predictor for linear models exported with export_linear_model.
+
+    It has the same interface as PredictorModel but computes the prediction as a dot
+    product, without loading scikit-learn. predict also accepts a raw 2-D float array
+    with the columns in the model's feature_names order.
+    """
+    def __init__(self, config):
+        self.model_path = config.model_path
+        self.model = self._load_model()
+
+    @instrument()
+    def _load_model(self):
+        try:
+            with np.load(self.model_path) as artifact:
+                model = LinearCoefficients(artifact['coef'], artifact['intercept'], [str(name) for name in artifact['feature_names']])
+            logging.info("Linear model loaded successfully.")
+            return model
+        except Exception as e:
+            logging.error(f"Error loading linear model: {e}")
+            raise
+
+    @instrument()
+    def predict(self, input_features):
+        try:
+            if hasattr(input_features, 'columns'):
+                input_features = input_features[self.model.feature_names].to_numpy(dtype=np.float64)
+            prediction = np.asarray(input_features, dtype=np.float64) @ self.model.coef.T + self.model.intercept
+            logging.info("Prediction made successfully.")
+            return prediction
+        except Exception as e:
+            logging.error(f"Error making prediction: {e}")
+            raise
+
+    @instrument()
+    def extract_features(self, df):
+        """
+        Extracts the model features from a DataFrame, as PredictorModel.extract_features does.
+        """
+        from src.projects.hietaniemi_gym.model.model_predict.model_predictor import extract_features
+        return extract_features(df)
+
+
+if __name__=='__main__':
+    import os
+    import argparse
+    from dotenv import load_dotenv
+    from src.projects.hietaniemi_gym.model.model_predict.model_predictor import PredictorModelConfig, PredictorModel
+
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    parser = argparse.ArgumentParser(description="Export a pickled linear model to a NumPy coefficient artifact.")
+    parser.add_argument('--model-path', default=os.getenv('MODEL_PATH'))
+    parser.add_argument('--output-path', default=None)
+    args = parser.parse_args()
+
+    output_path = args.output_path or os.path.join(os.path.dirname(args.model_path), LINEAR_MODEL_FILE_NAME)
+    model = PredictorModel(PredictorModelConfig(model_path=args.model_path)).model
+    export_linear_model(model, output_path)
@@ -1,14 +1,31 @@
 import logging
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+from typing import Dict, Optional
 import numpy as np
+import pandas as pd
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
 
+# METRIC_NAMES: The metrics reported by calculate_metrics and MetricsAccumulator, in order.
+METRIC_NAMES = [
+    "Mean True Values",
+    "Mean Predicted Values",
+    "Mean Squared Error (MSE)",
+    "Root Mean Squared Error (RMSE)",
+    "Mean Absolute Error (MAE)",
+    "R^2 Score",
+]
+
+
+@instrument()
 def calculate_metrics(y_true, y_pred):
     """
     Calculate common regression metrics between true values and predictions.
 
+    The metrics are computed with a single MetricsAccumulator update. Use the accumulator
+    directly to score data in chunks or shards, or to get per-segment metrics.
+
     Parameters:
-    - y_true (array-like): Ground truth (correct) target values with shape (n_samples,) or (n_samples, n_outputs).
-    - y_pred (array-like): Estimated target values with shape (n_samples,) or (n_samples, n_outputs).
+    - y_true (array-like): Ground truth (correct) target values with shape (n_samples,).
+    - y_pred (array-like): Estimated target values with shape (n_samples,).
 
     Returns:
     - dict: Dictionary containing MSE, RMSE, MAE, and R^2 score.
@@ -16,22 +33,8 @@ def calculate_metrics(y_true, y_pred):
     try:
         if not isinstance(y_true, np.ndarray) or not isinstance(y_pred, np.ndarray):
             raise ValueError("y_true and y_pred must be numpy arrays.")
-        
-        true_mean = np.mean(y_true)
-        predict_mean = np.mean(y_pred)
-        mse = mean_squared_error(y_true, y_pred)
-        rmse = np.sqrt(mse)
-        mae = mean_absolute_error(y_true, y_pred)
-        r2 = r2_score(y_true, y_pred)
-
-        metrics = {
-            "Mean True Values":true_mean,
-            "Mean Predicted Values":predict_mean,
-            "Mean Squared Error (MSE)": mse,
-            "Root Mean Squared Error (RMSE)": rmse,
-            "Mean Absolute Error (MAE)": mae,
-            "R^2 Score": r2
-        }
+
+        metrics = MetricsAccumulator().update(y_true, y_pred).metrics()
 
         for metric, value in metrics.items():
             logging.info(f"{metric}: {value}")
@@ -40,3 +43,141 @@ def calculate_metrics(y_true, y_pred):
     except Exception as e:
         logging.error(f"Failed to calculate metrics: {e}")
         return {}
+
+
+class MetricsAccumulator:
+    """
+    Online accumulator of regression metrics that is updated chunk by chunk.
+
+    Every update folds one chunk into running counts, means, sums of squared deviations
+    and error sums, combined with the pairwise update of Chan et al., the parallel form of
+    Welford's algorithm. So the true and predicted values never have to be kept in
+    memory, and accumulators of separate shards or processes can be merged into the same
+    state as one accumulator that saw all chunks, up to floating point rounding.
+
+    Updates can also pass integer segment codes, such as the hour, the weekday or a
+    device index, under a segment name. Their metrics are kept per code in the same
+    pass, with bincount over the codes instead of a loop over the groups.
+    """
+    def __init__(self):
+        self._total = _GroupMoments()
+        self._segments: Dict[str, _GroupMoments] = {}
+
+    @property
+    def count(self) -> int:
+        return int(self._total.count.sum())
+
+    def update(self, y_true, y_pred, segments: Optional[Dict[str, np.ndarray]] = None) -> 'MetricsAccumulator':
+        """
+        Folds a chunk of true values and predictions into the metrics.
+
+        Parameters:
+        y_true (array-like): Ground truth target values with shape (n_samples,).
+        y_pred (array-like): Predicted values with shape (n_samples,).
+        segments (dict): Non-negative integer codes with shape (n_samples,) by segment name.
+
+        Returns:
+        MetricsAccumulator: The accumulator itself.
+
+        Raises:
+        ValueError: If the arrays do not have matching shapes or the codes are not valid.
+        """
+        y_true = np.asarray(y_true, dtype=np.float64)
+        y_pred = np.asarray(y_pred, dtype=np.float64)
+        if y_true.ndim != 1 or y_true.shape != y_pred.shape:
+            raise ValueError(f"y_true and y_pred must be 1-D arrays of the same length, got {y_true.shape} and {y_pred.shape}")
+
+        self._total.update(np.zeros(len(y_true), dtype=np.intp), y_true, y_pred)
+        for name, codes in (segments or {}).items():
+            codes = np.asarray(codes)
+            if codes.shape != y_true.shape or (len(codes) and (codes.dtype.kind not in 'iu' or codes.min() < 0)):
+                raise ValueError(f"Segment {name} must have one non-negative integer code per sample")
+            self._segments.setdefault(name, _GroupMoments()).update(codes.astype(np.intp, copy=False), y_true, y_pred)
+        return self
+
+    def merge(self, other: 'MetricsAccumulator') -> 'MetricsAccumulator':
+        """
+        Merges the state of another accumulator, e.g. one from another process, into this one.
+
+        Returns:
+        MetricsAccumulator: The accumulator itself.
+        """
+        self._total.merge(other._total)
+        for name, moments in other._segments.items():
+            self._segments.setdefault(name, _GroupMoments()).merge(moments)
+        return self
+
+    def metrics(self) -> dict:
+        """
+        Returns the metrics of all samples seen, with the keys of calculate_metrics.
+        """
+        return {name: float(values[0]) for name, values in self._total.metrics().items()}
+
+    def segment_metrics(self, name: str) -> pd.DataFrame:
+        """
+        Returns the metrics of a segment with one row per code seen and a 'count' column.
+
+        Raises:
+        KeyError: If no update passed codes for the segment.
+        """
+        moments = self._segments[name]
+        seen = moments.count > 0
+        df = pd.DataFrame({'count': moments.count.astype(np.int64), **moments.metrics()})
+        df.index.name = name
+        return df[seen]
+
+
+class _GroupMoments:
+    """
+    Running moments of true values, predictions and errors for every group code.
+    """
+    FIELDS = ('count', 'mean_true', 'm2_true', 'mean_pred', 'sum_squared_error', 'sum_absolute_error')
+
+    def __init__(self, size: int = 0):
+        for field in self.FIELDS:
+            setattr(self, field, np.zeros(size, dtype=np.float64))
+
+    def update(self, codes: np.ndarray, y_true: np.ndarray, y_pred: np.ndarray) -> None:
+        size = max(len(self.count), int(codes.max()) + 1 if len(codes) else 0)
+        chunk = _GroupMoments()
+        chunk.count = np.bincount(codes, minlength=size).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            chunk.mean_true = np.where(chunk.count > 0, np.bincount(codes, y_true, size) / chunk.count, 0)
+            chunk.mean_pred = np.where(chunk.count > 0, np.bincount(codes, y_pred, size) / chunk.count, 0)
+        # Deviations from the chunk mean keep the sum of squares accurate for large offsets
+        deviation = y_true - chunk.mean_true[codes]
+        chunk.m2_true = np.bincount(codes, deviation * deviation, size)
+        error = y_pred - y_true
+        chunk.sum_squared_error = np.bincount(codes, error * error, size)
+        chunk.sum_absolute_error = np.bincount(codes, np.abs(error), size)
+        self.merge(chunk)
+
+    def merge(self, other: '_GroupMoments') -> None:
+        size = max(len(self.count), len(other.count))
+        a, b = self._resized(size), other._resized(size)
+        count = a['count'] + b['count']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(count > 0, b['count'] / count, 0)
+        delta = b['mean_true'] - a['mean_true']
+        self.count = count
+        self.mean_true = a['mean_true'] + delta * weight
+        self.m2_true = a['m2_true'] + b['m2_true'] + delta * delta * a['count'] * weight
+        self.mean_pred = a['mean_pred'] + (b['mean_pred'] - a['mean_pred']) * weight
+        self.sum_squared_error = a['sum_squared_error'] + b['sum_squared_error']
+        self.sum_absolute_error = a['sum_absolute_error'] + b['sum_absolute_error']
+
+    def metrics(self) -> dict:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            seen = self.count > 0
+            mean_true = np.where(seen, self.mean_true, np.nan)
+            mse = self.sum_squared_error / self.count
+            mae = self.sum_absolute_error / self.count
+            r2 = 1 - self.sum_squared_error / self.m2_true
+        # As in scikit-learn, constant true values score 1 if predicted exactly and 0 otherwise
+        constant = seen & (self.m2_true == 0)
+        r2 = np.where(constant, np.where(self.sum_squared_error == 0, 1.0, 0.0), r2)
+        values = [mean_true, np.where(seen, self.mean_pred, np.nan), mse, np.sqrt(mse), mae, r2]
+        return dict(zip(METRIC_NAMES, values))
+
+    def _resized(self, size: int) -> dict:
+        return {field: np.pad(getattr(self, field), (0, size - len(self.count))) for field in self.FIELDS}
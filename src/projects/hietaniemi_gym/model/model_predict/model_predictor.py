@@ -2,6 +2,53 @@ import joblib
 import logging
 from dataclasses import dataclass
 import pandas as pd
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
+
+# FEATURE_COLUMNS: The model input columns, in the order the model was trained on.
+FEATURE_COLUMNS = ['weekday', 'hour', 'Precipitation (mm)', 'Snow depth (cm)', 'Temperature (degC)']
+
+
+def extract_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Extracts specified features from a DataFrame, converting data types as necessary.
+    The conversions are applied to the returned features only, so the compact dtypes of
+    df are kept.
+
+    Parameters:
+    df (pd.DataFrame): The input DataFrame containing the raw data.
+
+    Returns:
+    pd.DataFrame: A DataFrame containing the extracted features, or None if an error occurs.
+    """
+    try:
+        # Ensure the necessary columns are present
+        required_columns = FEATURE_COLUMNS
+        if not all(column in df for column in required_columns):
+            missing_columns = [column for column in required_columns if column not in df]
+            logging.error(f"Missing required columns: {missing_columns}")
+            return None
+
+        # Extract the features for the model prediction and convert data types with
+        # exception handling for unexpected formats
+        expected_format_list = [
+            ('weekday', int),
+            ('hour', int),
+            ('Precipitation (mm)', float), 
+            ('Snow depth (cm)', float), 
+            ('Temperature (degC)', float)
+        ]
+        features_df = df[required_columns]
+        try:
+            features_df = features_df.astype(dict(expected_format_list))
+        except ValueError:
+            logging.error(f"Cannot convert the columns to {expected_format_list}. Check data format.")
+            return None
+
+        return features_df
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {e}")
+        return None
+
 
 @dataclass
 class PredictorModelConfig():
@@ -13,6 +60,7 @@ class PredictorModel:
         self.model_path = config.model_path
         self.model = self._load_model()
 
+    @instrument()
     def _load_model(self):
         try:
             model = joblib.load(self.model_path)
@@ -22,6 +70,7 @@ class PredictorModel:
             logging.error(f"Error loading model: {e}")
             raise
 
+    @instrument()
     def predict(self, input_features):
         try:
             prediction = self.model.predict(input_features)
@@ -31,45 +80,9 @@ class PredictorModel:
             logging.error(f"Error making prediction: {e}")
             raise
 
+    @instrument()
     def extract_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        Extracts specified features from a DataFrame, converting data types as necessary.
-
-        Parameters:
-        df (pd.DataFrame): The input DataFrame containing the raw data.
-
-        Returns:
-        pd.DataFrame: A DataFrame containing the extracted features, or None if an error occurs.
+        Extracts the model features from a DataFrame, see extract_features.
         """
-        try:
-            # Convert data types with exception handling for unexpected formats
-            expected_format_list = [
-                ('weekday', int),
-                ('hour', int),
-                ('Precipitation (mm)', float), 
-                ('Snow depth (cm)', float), 
-                ('Temperature (degC)', float)
-            ]
-            for column, dtype in expected_format_list:
-                try:
-                    df[column] = df[column].astype(dtype)
-                except KeyError:
-                    logging.warning(f"Column {column} not found in the DataFrame.")
-                except ValueError:
-                    logging.error(f"Cannot convert column {column} to {dtype}. Check data format.")
-                    return None
-
-            # Ensure the necessary columns are present
-            required_columns = ['weekday', 'hour', 'Precipitation (mm)', 'Snow depth (cm)', 'Temperature (degC)']
-            if not all(column in df for column in required_columns):
-                missing_columns = [column for column in required_columns if column not in df]
-                logging.error(f"Missing required columns: {missing_columns}")
-                return None
-
-            # Extract the features for the model prediction
-            features_df = df[required_columns]
-
-            return features_df
-        except Exception as e:
-            logging.error(f"An unexpected error occurred: {e}")
-            return None
+        return extract_features(df)
@@ -0,0 +1,250 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Sequence
+import numpy as np
+import pandas as pd
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import FEATURE_COLUMNS
+from src.projects.hietaniemi_gym.model.model_registry.model_registry import load_predictor
+from src.projects.hietaniemi_gym.utils.stage_cache import hash_file, path_id
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
+
+# SCENARIO_TABLE_VERSION: Version of the table layout, bumped on incompatible changes so
+# that stored tables are rebuilt.
+SCENARIO_TABLE_VERSION = 1
+
+# WEATHER_AXES: The continuous feature columns of the grid, in table axis order.
+WEATHER_AXES = ['Precipitation (mm)', 'Snow depth (cm)', 'Temperature (degC)']
+
+
+@dataclass
+class ScenarioGridConfig():
+    """
+    The scenario grid. weekdays and hours are exact lookups, the weather axes must be
+    increasing and queries between their points are interpolated linearly. The weather
+    data codes missing precipitation and snow as -1, so the grid starts there.
+    """
+    weekdays: Sequence[int] = tuple(range(7))
+    hours: Sequence[int] = tuple(range(24))
+    precipitation: Sequence[float] = (-1, 0, 0.5, 1, 2, 5, 10, 20)
+    snow_depth: Sequence[float] = (-1, 0, 5, 10, 20, 40, 80)
+    temperature: Sequence[float] = tuple(range(-30, 36, 3))
+
+
+@dataclass
+class ScenarioTableConfig():
+    model_path: str
+    grid: ScenarioGridConfig = field(default_factory=ScenarioGridConfig)
+    cache_dir: Optional[str] = "./artifacts/hietaniemi_gym/0.0.1/cache/scenarios"
+
+
+class ScenarioTable:
+    """
+    Precomputed model predictions over a weekday x hour x weather grid.
+
+    The model is evaluated over the whole grid in one batched predict call and the result
+    is kept as a float32 array with one axis per feature, so scenario queries are answered
+    by indexing instead of calling the model. Weather values between grid points are
+    interpolated multilinearly and values outside the grid are clamped to its edges; for
+    a linear model the interpolation is exact inside the grid.
+
+    The table is stored in config.cache_dir keyed by the content of the model artifact
+    and the grid. Every query checks the size and modification time of the artifact and
+    rebuilds the table when its content changed, so a retrained model is never answered
+    from a stale table. Only the current table of a model path and grid is kept, older
+    ones are deleted when it is built or loaded.
+    """
+    def __init__(self, config: ScenarioTableConfig):
+        self.model_path = config.model_path
+        self.grid = config.grid
+        self.cache_dir = config.cache_dir
+        self.axes = [
+            np.asarray(self.grid.weekdays, dtype=np.int64),
+            np.asarray(self.grid.hours, dtype=np.int64),
+            *(np.asarray(values, dtype=np.float64) for values in (self.grid.precipitation, self.grid.snow_depth, self.grid.temperature)),
+        ]
+        for name, axis in zip(FEATURE_COLUMNS, self.axes):
+            if len(axis) == 0 or (np.diff(axis) <= 0).any():
+                raise ValueError(f"The grid axis {name} must be non-empty and strictly increasing")
+        self._lock = threading.Lock()
+        self._model_stat = None
+        self.model_hash = None
+        self.values = None
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """
+        Rebuilds or reloads the table if the model artifact changed since it was built.
+
+        Returns:
+        bool: Whether the table was replaced.
+        """
+        model_stat = _file_stat(self.model_path)
+        if model_stat == self._model_stat:
+            return False
+        with self._lock:
+            if model_stat == self._model_stat:
+                return False
+            model_hash = hash_file(self.model_path)
+            if model_hash != self.model_hash:
+                self.values = self._load_or_build(model_hash)
+                self.model_hash = model_hash
+                self._model_stat = model_stat
+                return True
+            # Touched but unchanged, the table is still valid
+            self._model_stat = model_stat
+            return False
+
+    def key(self, model_hash: str) -> str:
+        """
+        Builds the storage key of the table from the model content and the grid.
+        """
+        payload = {'version': SCENARIO_TABLE_VERSION, 'model': model_hash, 'grid': {name: list(map(float, values)) for name, values in asdict(self.grid).items()}}
+        return hashlib.blake2b(json.dumps(payload, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+    def table_id(self) -> str:
+        """
+        Identifies the tables of the model path and the grid, whatever the model content.
+        """
+        grid = {name: list(map(float, values)) for name, values in asdict(self.grid).items()}
+        payload = {'model_path': path_id(self.model_path), 'grid': grid}
+        return hashlib.blake2b(json.dumps(payload, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+    def lookup(self, weekday, hour, precipitation, snow_depth, temperature) -> np.ndarray:
+        """
+        Returns the expected usage of scenarios, broadcasting the arguments against each other.
+
+        Parameters:
+        weekday: Day of the week 0-6, as in the 'weekday' feature. Must be on the grid.
+        hour: Hour of the day. Must be on the grid.
+        precipitation, snow_depth, temperature: Weather values, interpolated between grid points.
+
+        Returns:
+        np.ndarray: The predictions with the broadcast shape of the arguments.
+
+        Raises:
+        KeyError: If a weekday or hour is not on the grid.
+        """
+        self.refresh()
+        values = self.values
+        weekday, hour, *weather = np.broadcast_arrays(weekday, hour, precipitation, snow_depth, temperature)
+        day_index = _grid_index(self.axes[0], weekday, 'weekday')
+        hour_index = _grid_index(self.axes[1], hour, 'hour')
+
+        result = np.zeros(day_index.shape, dtype=np.float64)
+        corners = [_axis_position(axis, value) for axis, value in zip(self.axes[2:], weather)]
+        # Sum over the corners of the enclosing weather cell, weighted by their distance
+        for corner in np.ndindex(2, 2, 2):
+            index = [day_index, hour_index]
+            weight = np.ones(day_index.shape, dtype=np.float64)
+            for (low, high, fraction), upper in zip(corners, corner):
+                index.append(high if upper else low)
+                weight *= fraction if upper else 1 - fraction
+            result += weight * values[tuple(index)]
+        return result
+
+    def predict(self, weekday: int, hour: int, precipitation: float, snow_depth: float, temperature: float) -> float:
+        """
+        Returns the expected usage of one scenario, see lookup.
+        """
+        return float(self.lookup(weekday, hour, precipitation, snow_depth, temperature))
+
+    def query_range(self, precipitation: float, snow_depth: float, temperature: float,
+                    weekdays: Optional[Sequence[int]] = None, hours: Optional[Sequence[int]] = None) -> pd.DataFrame:
+        """
+        Returns the expected usage of every weekday and hour in a range under one weather scenario.
+
+        Parameters:
+        precipitation, snow_depth, temperature: The weather of the scenario.
+        weekdays (list): The weekdays to return. Defaults to all weekdays on the grid.
+        hours (list): The hours to return. Defaults to all hours on the grid.
+
+        Returns:
+        pd.DataFrame: The predictions with one row per weekday and one column per hour.
+        """
+        weekdays = self.axes[0] if weekdays is None else np.asarray(weekdays)
+        hours = self.axes[1] if hours is None else np.asarray(hours)
+        predictions = self.lookup(weekdays[:, None], hours[None, :], precipitation, snow_depth, temperature)
+        return pd.DataFrame(predictions, index=pd.Index(weekdays, name='weekday'), columns=pd.Index(hours, name='hour'))
+
+    def _load_or_build(self, model_hash: str) -> np.ndarray:
+        table_path = os.path.join(self.cache_dir, f'{self.table_id()}-{self.key(model_hash)}.npy') if self.cache_dir is not None else None
+        if table_path is not None and os.path.isfile(table_path):
+            self._remove_outdated_tables(table_path)
+            logging.info(f"Scenario table loaded from {table_path}")
+            return np.load(table_path, allow_pickle=False)
+
+        values = build_scenario_values(load_predictor(self.model_path), self.axes)
+        if table_path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Written next to its final name and renamed, so readers never see a partial table
+            with open(table_path + '.tmp', 'wb') as file:
+                np.save(file, values, allow_pickle=False)
+            os.replace(table_path + '.tmp', table_path)
+            logging.info(f"Scenario table saved to {table_path}")
+            self._remove_outdated_tables(table_path)
+        return values
+
+    def _remove_outdated_tables(self, table_path: str) -> None:
+        """
+        Deletes the tables of earlier model contents with the same model path and grid.
+        """
+        prefix = f'{self.table_id()}-'
+        for name in os.listdir(self.cache_dir):
+            outdated_path = os.path.join(self.cache_dir, name)
+            if name.startswith(prefix) and name.endswith('.npy') and outdated_path != table_path:
+                try:
+                    os.remove(outdated_path)
+                    logging.info(f"Removed outdated scenario table {outdated_path}")
+                except FileNotFoundError:
+                    # Removed by another process in the meantime
+                    pass
+
+
+@instrument()
+def build_scenario_values(predictor_model, axes) -> np.ndarray:
+    """
+    Evaluates a predictor over the Cartesian product of the grid axes in one batched call.
+
+    Parameters:
+    predictor_model: A PredictorModel or LinearPredictorModel.
+    axes (list): The grid values of every column of FEATURE_COLUMNS, in that order.
+
+    Returns:
+    np.ndarray: The float32 predictions with one axis per feature.
+    """
+    shape = tuple(len(axis) for axis in axes)
+    mesh = np.meshgrid(*axes, indexing='ij')
+    features = pd.DataFrame({column: values.ravel() for column, values in zip(FEATURE_COLUMNS, mesh)})
+    predictions = np.asarray(predictor_model.predict(features), dtype=np.float32).reshape(shape)
+    logging.info(f"Scenario table built over {features.shape[0]} grid points")
+    return predictions
+
+
+def _grid_index(axis: np.ndarray, values: np.ndarray, name: str) -> np.ndarray:
+    index = np.clip(np.searchsorted(axis, values), 0, len(axis) - 1)
+    missing = axis[index] != values
+    if missing.any():
+        raise KeyError(f"{name} {np.unique(values[missing]).tolist()} not on the scenario grid {axis.tolist()}")
+    return index
+
+
+def _axis_position(axis: np.ndarray, values: np.ndarray):
+    """
+    Returns the indices of the grid points around values and the fraction of the way to the upper one.
+    """
+    values = np.clip(np.asarray(values, dtype=np.float64), axis[0], axis[-1])
+    if len(axis) == 1:
+        zeros = np.zeros(values.shape, dtype=np.int64)
+        return zeros, zeros, np.zeros(values.shape)
+    low = np.clip(np.searchsorted(axis, values, side='right') - 1, 0, len(axis) - 2)
+    fraction = (values - axis[low]) / (axis[low + 1] - axis[low])
+    return low, low + 1, fraction
+
+
+def _file_stat(file_path: str):
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
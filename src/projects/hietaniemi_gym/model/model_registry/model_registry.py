@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+import joblib
+import numpy as np
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import PredictorModelConfig, PredictorModel
+from src.projects.hietaniemi_gym.model.model_predict.linear_predictor import LINEAR_MODEL_FILE_NAME, LinearPredictorModel, export_linear_model
+
+# METADATA_FILE_NAME: The name of the metadata file in every model directory.
+METADATA_FILE_NAME = 'metadata.json'
+
+# DEFAULT_MODEL_FILE_NAME: The model file loaded when the metadata does not name one.
+DEFAULT_MODEL_FILE_NAME = 'model.pkl'
+
+
+@dataclass
+class ModelRegistryConfig():
+    base_path: str = "./artifacts/hietaniemi_gym"
+    cache_size: int = 4
+
+
+@dataclass
+class ModelInfo():
+    name: str
+    artifact_version: str
+    path: str
+    model_file: str
+    version: Optional[str] = None
+    features: Optional[List[str]] = None
+    training_start: Optional[str] = None
+    training_end: Optional[str] = None
+    metadata: dict = field(default_factory=dict)
+
+    @property
+    def model_path(self) -> str:
+        return os.path.join(self.path, self.model_file)
+
+
+def read_metadata(model_dir: str) -> dict:
+    """
+    Reads the metadata.json of a model directory. Missing or empty files give an empty dict.
+    """
+    metadata_path = os.path.join(model_dir, METADATA_FILE_NAME)
+    if not os.path.isfile(metadata_path) or os.path.getsize(metadata_path) == 0:
+        return {}
+    with open(metadata_path) as file:
+        return json.load(file)
+
+
+def write_metadata(model_dir: str, metadata: dict) -> None:
+    """
+    Writes the metadata.json of a model directory.
+    """
+    with open(os.path.join(model_dir, METADATA_FILE_NAME), 'w') as file:
+        json.dump(metadata, file, indent=2)
+    logging.info(f"Model metadata written to {model_dir}")
+
+
+def register_model(model, metadata: dict, base_path: str = ModelRegistryConfig.base_path, artifact_version: str = '0.0.1') -> str:
+    """
+    Writes a fitted model into a new model directory <base_path>/<artifact_version>/models/<version>_<name>/.
+
+    The model is saved with joblib as model.pkl next to a metadata.json. The version
+    defaults to the current time, so the new model sorts after the existing ones and the
+    registry resolves it as the latest. Linear models with a single output are also
+    exported as NumPy coefficients for LinearPredictorModel. The directory is written
+    under a temporary name and renamed when complete.
+
+    Parameters:
+    model: A fitted scikit-learn style model.
+    metadata (dict): The metadata of the model. Must have a 'name' and a 'features' list.
+    base_path (str): The root of the artifact tree.
+    artifact_version (str): The artifact version to register the model under.
+
+    Returns:
+    str: The path of the new model directory.
+
+    Raises:
+    FileExistsError: If the model directory already exists.
+    """
+    metadata = {
+        'version': time.strftime('%Y%m%d%H%M%S'),
+        'model_type': _public_type_name(model),
+        'model_file': DEFAULT_MODEL_FILE_NAME,
+        **metadata,
+    }
+    models_dir = os.path.join(base_path, artifact_version, 'models')
+    model_dir = os.path.join(models_dir, f"{metadata['version']}_{metadata['name']}")
+    if os.path.exists(model_dir):
+        raise FileExistsError(f"The model directory {model_dir} already exists")
+
+    # Written outside models/, so scan never lists a partial model
+    tmp_dir = os.path.join(base_path, artifact_version, f".{metadata['version']}_{metadata['name']}.tmp")
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    try:
+        joblib.dump(model, os.path.join(tmp_dir, metadata['model_file']))
+        exports = dict(metadata.get('exports') or {})
+        if np.ndim(getattr(model, 'coef_', None)) == 1 and np.ndim(getattr(model, 'intercept_', None)) == 0:
+            export_linear_model(model, os.path.join(tmp_dir, LINEAR_MODEL_FILE_NAME), metadata['features'])
+            exports['linear_npz'] = LINEAR_MODEL_FILE_NAME
+        metadata['exports'] = exports
+        write_metadata(tmp_dir, metadata)
+        os.makedirs(models_dir, exist_ok=True)
+        os.rename(tmp_dir, model_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    logging.info(f"Registered model {metadata['name']} version {metadata['version']} in {model_dir}")
+    return model_dir
+
+
+def load_predictor(model_path: str):
+    """
+    Loads the predictor of a model file: a LinearPredictorModel for NumPy exports, a
+    PredictorModel otherwise.
+    """
+    predictor_class = LinearPredictorModel if model_path.endswith('.npz') else PredictorModel
+    return predictor_class(PredictorModelConfig(model_path=model_path))
+
+
+class ModelRegistry:
+    """
+    Registry of the models in the artifact tree, laid out as <base_path>/<version>/models/<name>/.
+
+    Scanning only reads the metadata files. Predictors are loaded on first use and kept in
+    a least recently used cache of config.cache_size entries.
+    """
+    def __init__(self, config: ModelRegistryConfig):
+        self.base_path = config.base_path
+        self.cache_size = config.cache_size
+        self._predictors = OrderedDict()
+        self._lock = threading.Lock()
+        self.models = self.scan()
+
+    def scan(self) -> List[ModelInfo]:
+        """
+        Scans the artifact tree and returns the models found, oldest first.
+        """
+        models = []
+        if not os.path.isdir(self.base_path):
+            logging.warning(f"Model registry path {self.base_path} does not exist.")
+            return models
+        for artifact_version in sorted(os.listdir(self.base_path)):
+            models_dir = os.path.join(self.base_path, artifact_version, 'models')
+            if not os.path.isdir(models_dir):
+                continue
+            for name in sorted(os.listdir(models_dir)):
+                model_dir = os.path.join(models_dir, name)
+                if not os.path.isdir(model_dir):
+                    continue
+                try:
+                    metadata = read_metadata(model_dir)
+                except ValueError as e:
+                    logging.warning(f"Skipping model {model_dir} with unreadable metadata: {e}")
+                    continue
+                models.append(ModelInfo(
+                    name=name,
+                    artifact_version=artifact_version,
+                    path=model_dir,
+                    model_file=metadata.get('model_file', DEFAULT_MODEL_FILE_NAME),
+                    version=metadata.get('version'),
+                    features=metadata.get('features'),
+                    training_start=metadata.get('training_start'),
+                    training_end=metadata.get('training_end'),
+                    metadata=metadata,
+                ))
+        models.sort(key=lambda info: (_version_key(info.artifact_version), info.name))
+        logging.info(f"Model registry found {len(models)} models in {self.base_path}")
+        return models
+
+    def resolve(self, name: Optional[str] = None, version: Optional[str] = None) -> ModelInfo:
+        """
+        Returns the latest model matching name and version.
+
+        name matches the model directory or the 'name' in its metadata, version matches the
+        artifact version or the 'version' in its metadata. Without arguments the latest
+        model is returned.
+        """
+        matches = [
+            info for info in self.models
+            if (name is None or name in (info.name, info.metadata.get('name')))
+            and (version is None or version in (info.artifact_version, info.version))
+        ]
+        if not matches:
+            raise KeyError(f"No model found for name={name!r}, version={version!r}")
+        return matches[-1]
+
+    def get_predictor(self, name: Optional[str] = None, version: Optional[str] = None):
+        """
+        Returns the loaded predictor of a model, loading it only if it is not cached.
+        """
+        info = self.resolve(name, version)
+        with self._lock:
+            if info.path in self._predictors:
+                self._predictors.move_to_end(info.path)
+                return self._predictors[info.path]
+
+            predictor = load_predictor(info.model_path)
+            self._predictors[info.path] = predictor
+            if len(self._predictors) > self.cache_size:
+                evicted, _ = self._predictors.popitem(last=False)
+                logging.info(f"Evicted predictor {evicted} from the model cache")
+            logging.info(f"Loaded predictor {info.name} ({info.artifact_version})")
+            return predictor
+
+
+def _public_type_name(model) -> str:
+    """
+    Returns the import path of a model's class without private modules, e.g.
+    'sklearn.linear_model.LinearRegression'.
+    """
+    module = '.'.join(part for part in type(model).__module__.split('.') if not part.startswith('_'))
+    return f'{module}.{type(model).__name__}'
+
+
+def _version_key(version: str):
+    """
+    Sorts versions like '0.0.10' numerically, falling back to text for other names.
+    """
+    return [(0, int(part), '') if part.isdigit() else (1, 0, part) for part in version.split('.')]
@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from src.lib.logging.logger import LoggingConfig, setup_logging
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import (
+    PredictorModelConfig,
+    PredictorModel,
+    FEATURE_COLUMNS
+)
+
+
+@dataclass
+class PredictionServerConfig():
+    model_path: str
+    socket_path: Optional[str] = None
+    host: str = '127.0.0.1'
+    port: int = 8765
+    max_batch_size: int = 256
+    max_latency_ms: float = 5.0
+    stats_window: int = 10000
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions into batched predict calls.
+
+    The first queued row opens a batch, which is closed after max_latency_ms or once
+    max_batch_size rows are waiting, whichever comes first.
+    """
+    def __init__(self, predictor_model, max_batch_size: int, max_latency_ms: float, stats_window: int):
+        self.predictor_model = predictor_model
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.latencies = deque(maxlen=stats_window)
+        self.batch_sizes = deque(maxlen=stats_window)
+        self.request_count = 0
+        self._task = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def predict(self, features: List[float]) -> float:
+        """
+        Queues one feature row and waits for its prediction.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((features, future, time.perf_counter()))
+        return await future
+
+    def stats(self) -> dict:
+        """
+        Returns latency percentiles in milliseconds and batch size statistics.
+        """
+        latencies = np.array(self.latencies) * 1000
+        batch_sizes = np.array(self.batch_sizes)
+        return {
+            'requests': self.request_count,
+            'batches': len(batch_sizes),
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            'batch_size_mean': float(batch_sizes.mean()) if len(batch_sizes) else None,
+            'batch_size_max': int(batch_sizes.max()) if len(batch_sizes) else None,
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            features = pd.DataFrame([row for row, _, _ in batch], columns=FEATURE_COLUMNS)
+            try:
+                # The model runs in a worker thread so the loop keeps accepting requests
+                predictions = await loop.run_in_executor(None, self.predictor_model.predict, features)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            for (_, future, received), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(float(prediction))
+                self.latencies.append(finished - received)
+            self.batch_sizes.append(len(batch))
+            self.request_count += len(batch)
+
+
+class PredictionServer:
+    """
+    Local prediction server that keeps one warm PredictorModel in memory.
+
+    Clients send one JSON object per line: a feature row with the FEATURE_COLUMNS keys is
+    answered with {"prediction": value}, {"command": "stats"} with the batcher statistics.
+    Errors are answered with {"error": message}. The server listens on a Unix socket if
+    socket_path is set, otherwise on host and port.
+    """
+    def __init__(self, config: PredictionServerConfig, predictor_model=None):
+        self.config = config
+        if predictor_model is None:
+            predictor_model = PredictorModel(PredictorModelConfig(model_path=config.model_path))
+        self.predictor_model = predictor_model
+        self.batcher = None
+        self.server = None
+
+    async def start(self) -> None:
+        self.batcher = MicroBatcher(self.predictor_model, self.config.max_batch_size,
+                                    self.config.max_latency_ms, self.config.stats_window)
+        self.batcher.start()
+        if self.config.socket_path is not None:
+            self.server = await asyncio.start_unix_server(self._handle_connection, path=self.config.socket_path)
+            logging.info(f"Prediction server listening on {self.config.socket_path}")
+        else:
+            self.server = await asyncio.start_server(self._handle_connection, self.config.host, self.config.port)
+            logging.info(f"Prediction server listening on {self.config.host}:{self.config.port}")
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.batcher is not None:
+            await self.batcher.stop()
+        logging.info(f"Prediction server stopped: {self.batcher.stats()}")
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Requests on one connection are handled concurrently but answered in order
+        responses: asyncio.Queue = asyncio.Queue()
+        writer_task = asyncio.ensure_future(self._write_responses(responses, writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                responses.put_nowait(asyncio.ensure_future(self._handle_request(line)))
+        except ConnectionError as e:
+            logging.warning(f"Client connection lost: {e}")
+        finally:
+            responses.put_nowait(None)
+            await writer_task
+            writer.close()
+
+    async def _write_responses(self, responses: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        while True:
+            response = await responses.get()
+            if response is None:
+                break
+            try:
+                writer.write(await response)
+                await writer.drain()
+            except ConnectionError as e:
+                logging.warning(f"Could not send response: {e}")
+
+    async def _handle_request(self, line: bytes) -> bytes:
+        try:
+            request = json.loads(line)
+            if request.get('command') == 'stats':
+                response = self.batcher.stats()
+            else:
+                features = [float(request[column]) for column in FEATURE_COLUMNS]
+                response = {'prediction': await self.batcher.predict(features)}
+        except KeyError as e:
+            response = {'error': f"Missing feature {e}"}
+        except Exception as e:
+            response = {'error': str(e)}
+        return (json.dumps(response) + '\n').encode()
+
+
+class PredictionClient:
+    """
+    Minimal asyncio client for PredictionServer, sending one request at a time per call.
+    """
+    def __init__(self, socket_path: Optional[str] = None, host: str = '127.0.0.1', port: int = 8765):
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+
+    async def request(self, payload: dict) -> dict:
+        if self.socket_path is not None:
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write((json.dumps(payload) + '\n').encode())
+            await writer.drain()
+            return json.loads(await reader.readline())
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def predict(self, features: dict) -> float:
+        response = await self.request(features)
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response['prediction']
+
+    async def stats(self) -> dict:
+        return await self.request({'command': 'stats'})
+
+
+if __name__=='__main__':
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    parser = argparse.ArgumentParser(description="Serve gym usage predictions from a warm model.")
+    parser.add_argument('--socket-path', default=None)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-latency-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    # Keep file writes off the request path and cap the per-request messages
+    setup_logging(config=LoggingConfig(asynchronous=True, rate_limit=10))
+    config = PredictionServerConfig(
+        model_path=os.getenv('MODEL_PATH'),
+        socket_path=args.socket_path,
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_latency_ms=args.max_latency_ms,
+    )
+    asyncio.run(PredictionServer(config).serve_forever())
@@ -0,0 +1,165 @@
+import logging
+from typing import Callable, Iterable, Tuple
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression, SGDRegressor
+from sklearn.neural_network import MLPRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
+
+# ChunkSource: Returns a new iterable over (features, target) chunks on every call, so
+# the data can be streamed more than once.
+ChunkSource = Callable[[], Iterable[Tuple[pd.DataFrame, np.ndarray]]]
+
+
+class NormalEquationRegressor:
+    """
+    Ordinary least squares fitted exactly from chunks by accumulating the normal equations.
+
+    partial_fit adds the chunk's X'X and X'y to running sums in float64, so memory does
+    not depend on the number of rows and one pass gives the same coefficients as fitting
+    LinearRegression on all rows at once. The data is shifted by the means of the first
+    chunk before it is accumulated, which keeps the sums well conditioned without
+    changing the solution. Rank-deficient systems get the minimum-norm solution, as
+    with LinearRegression.
+    """
+    def __init__(self, fit_intercept: bool = True):
+        self.fit_intercept = fit_intercept
+        self.n_samples_ = 0
+        self._shift_x = None
+        self._shift_y = 0.0
+        self._xtx = None
+        self._xty = None
+
+    def partial_fit(self, X, y) -> 'NormalEquationRegressor':
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if len(X) == 0:
+            return self
+        if self._xtx is None:
+            self._shift_x = X.mean(axis=0) if self.fit_intercept else np.zeros(X.shape[1])
+            self._shift_y = float(y.mean()) if self.fit_intercept else 0.0
+            size = X.shape[1] + self.fit_intercept
+            self._xtx = np.zeros((size, size))
+            self._xty = np.zeros(size)
+
+        design = X - self._shift_x
+        if self.fit_intercept:
+            design = np.column_stack([design, np.ones(len(X))])
+        self._xtx += design.T @ design
+        self._xty += design.T @ (y - self._shift_y)
+        self.n_samples_ += len(X)
+        self._solve()
+        return self
+
+    def merge(self, other: 'NormalEquationRegressor') -> 'NormalEquationRegressor':
+        """
+        Adds the sums of a regressor fitted on other rows, e.g. another shard.
+        """
+        if other._xtx is None:
+            return self
+        if self._xtx is None:
+            self._shift_x, self._shift_y = other._shift_x, other._shift_y
+            self._xtx, self._xty = np.zeros_like(other._xtx), np.zeros_like(other._xty)
+        # Re-center the other sums on this shift: a shift by d adds d'd-weighted terms
+        delta_x = other._shift_x - self._shift_x
+        delta_y = other._shift_y - self._shift_y
+        if self.fit_intercept:
+            size = len(delta_x)
+            transform = np.eye(size + 1)
+            transform[size, :size] = delta_x
+            offset = other._xty + delta_y * other._xtx[:, size]
+            self._xtx += transform.T @ other._xtx @ transform
+            self._xty += transform.T @ offset
+        else:
+            self._xtx += other._xtx
+            self._xty += other._xty
+        self.n_samples_ += other.n_samples_
+        self._solve()
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+    def to_linear_regression(self, feature_names) -> LinearRegression:
+        """
+        Returns a fitted LinearRegression with the solved coefficients, so the model can be
+        saved and served like any scikit-learn model.
+        """
+        model = LinearRegression(fit_intercept=self.fit_intercept)
+        model.coef_ = self.coef_.copy()
+        model.intercept_ = self.intercept_
+        model.n_features_in_ = len(self.coef_)
+        model.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        return model
+
+    def _solve(self) -> None:
+        solution = np.linalg.lstsq(self._xtx, self._xty, rcond=None)[0]
+        size = len(self._shift_x)
+        self.coef_ = solution[:size]
+        centered_intercept = solution[size] if self.fit_intercept else 0.0
+        self.intercept_ = float(centered_intercept + self._shift_y - self._shift_x @ self.coef_)
+
+
+# INCREMENTAL_ESTIMATORS: The estimators train_incremental can fit from chunks, by name.
+INCREMENTAL_ESTIMATORS = {
+    'linear': NormalEquationRegressor,
+    'sgd': SGDRegressor,
+    'mlp': MLPRegressor,
+}
+
+
+def make_estimator(name: str, params: dict = None):
+    """
+    Creates an unfitted estimator of INCREMENTAL_ESTIMATORS.
+
+    Raises:
+    KeyError: If the name is unknown.
+    """
+    if name not in INCREMENTAL_ESTIMATORS:
+        raise KeyError(f"Unknown estimator {name!r}, expected one of {list(INCREMENTAL_ESTIMATORS)}")
+    return INCREMENTAL_ESTIMATORS[name](**(params or {}))
+
+
+@instrument()
+def train_incremental(estimator, chunks: ChunkSource, epochs: int = 1):
+    """
+    Fits an estimator on streamed chunks without holding more than one chunk in memory.
+
+    A NormalEquationRegressor is solved exactly in one pass and returned as a
+    LinearRegression. Other estimators must support partial_fit; their features are
+    standardized with a StandardScaler fitted in a first pass, then the estimator is
+    updated with every chunk for the given number of epochs. They are returned as a
+    Pipeline of the scaler and the estimator.
+
+    Parameters:
+    estimator: A NormalEquationRegressor or an unfitted estimator with partial_fit.
+    chunks (ChunkSource): Returns the (features, target) chunks to train on.
+    epochs (int): The number of passes over the chunks for partial_fit estimators.
+
+    Returns:
+    A fitted model whose predict takes a features DataFrame.
+    """
+    if isinstance(estimator, NormalEquationRegressor):
+        feature_names = None
+        for features, target in chunks():
+            feature_names = list(features.columns)
+            estimator.partial_fit(features.to_numpy(dtype=np.float64), target)
+        if feature_names is None:
+            raise ValueError("No training data")
+        logging.info(f"Linear model solved from the normal equations of {estimator.n_samples_} rows")
+        return estimator.to_linear_regression(feature_names)
+
+    if not hasattr(estimator, 'partial_fit'):
+        raise TypeError(f"{type(estimator).__name__} does not support partial_fit")
+    scaler = StandardScaler()
+    for features, _ in chunks():
+        scaler.partial_fit(features)
+    if not hasattr(scaler, 'mean_'):
+        raise ValueError("No training data")
+    for epoch in range(epochs):
+        for features, target in chunks():
+            estimator.partial_fit(scaler.transform(features), np.asarray(target, dtype=np.float64))
+        logging.info(f"Epoch {epoch + 1}/{epochs} of {type(estimator).__name__} finished")
+    return Pipeline([('scaler', scaler), ('model', estimator)])
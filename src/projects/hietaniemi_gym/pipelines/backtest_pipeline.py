@@ -0,0 +1,266 @@
+import os
+import json
+import math
+import logging
+import argparse
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sklearn.base import clone
+from src.lib.logging.logger import setup_logging
+from src.projects.hietaniemi_gym.pipelines.feature_pipeline import feature_pipeline
+from src.projects.hietaniemi_gym.utils.stage_cache import StageCache, StageCacheConfig
+from src.projects.hietaniemi_gym.utils.shared_arrays import SharedArrays, attach_shared_arrays
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import PredictorModel, PredictorModelConfig
+from src.projects.hietaniemi_gym.model.model_predict.model_metrics import METRIC_NAMES, MetricsAccumulator
+from src.projects.hietaniemi_gym.model.model_registry.model_registry import ModelRegistryConfig, ModelRegistry
+from src.projects.hietaniemi_gym.data.data_consts import TIME_COL_NAME
+
+# TARGET_COLUMN: The column the models predict.
+TARGET_COLUMN = 'sum_minutes'
+
+# The arrays of the backtest, attached once per worker process by _init_worker.
+_worker_arrays = {}
+
+
+@dataclass
+class BacktestConfig():
+    """
+    Time-series folds of the backtest. Every fold tests on test_window right after its
+    training data and the origin moves by step. Rolling folds train on the train_window
+    before the origin, expanding folds on all data before it; the first origin is one
+    train_window after the start of the data in both cases. Folds with fewer than
+    min_train_rows training rows or without test rows are skipped.
+    """
+    train_window: str = '90D'
+    test_window: str = '1D'
+    step: str = '1D'
+    expanding: bool = False
+    min_train_rows: int = 24 * 7
+
+
+@dataclass
+class Fold():
+    index: int
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+
+
+def make_folds(times: np.ndarray, config: BacktestConfig) -> List[Fold]:
+    """
+    Splits sorted timestamps into rolling or expanding time-series folds.
+
+    Parameters:
+    times (np.ndarray): The sorted datetime64 timestamps of the rows.
+    config (BacktestConfig): The fold windows.
+
+    Returns:
+    List[Fold]: The folds as half-open row ranges, in time order.
+    """
+    times = np.asarray(times, dtype='datetime64[ns]')
+    if len(times) == 0:
+        return []
+    if (np.diff(times.view(np.int64)) < 0).any():
+        raise ValueError("The rows must be sorted by time")
+    train_window, test_window, step = (pd.Timedelta(window).to_timedelta64() for window in (config.train_window, config.test_window, config.step))
+
+    test_starts = np.arange(times[0] + train_window, times[-1] + np.timedelta64(1, 'ns'), step)
+    train_starts = np.full_like(test_starts, times[0]) if config.expanding else test_starts - train_window
+    # All fold boundaries are found with one binary search per boundary array
+    train_start, test_start, test_end = (np.searchsorted(times, bounds, side='left') for bounds in (train_starts, test_starts, test_starts + test_window))
+
+    keep = (test_end > test_start) & (test_start - train_start >= config.min_train_rows)
+    return [
+        Fold(index, int(start), int(end), int(end), int(stop))
+        for index, (start, end, stop) in enumerate(zip(train_start[keep], test_start[keep], test_end[keep]))
+    ]
+
+
+def run_backtest(features: np.ndarray, target: np.ndarray, times: np.ndarray, estimator, config: Optional[BacktestConfig] = None,
+                 max_workers: Optional[int] = None) -> dict:
+    """
+    Fits and scores a clone of estimator on every fold in a process pool.
+
+    The folds are scored in parallel, see score_folds.
+
+    Parameters:
+    features (np.ndarray): The feature matrix of all rows, sorted by time.
+    target (np.ndarray): The target of all rows.
+    times (np.ndarray): The timestamps of all rows.
+    estimator: An unfitted scikit-learn style estimator, cloned for every fold.
+    config (BacktestConfig): The fold windows.
+    max_workers (int): The number of worker processes. Defaults to the number of CPUs,
+        1 scores the folds in this process.
+
+    Returns:
+    dict: 'folds' is a DataFrame with the windows, row counts and metrics of every fold,
+        'pooled' the metrics over the test rows of all folds, 'mean' and 'std' the mean
+        and standard deviation of the fold metrics.
+    """
+    config = config or BacktestConfig()
+    folds = make_folds(times, config)
+    if not folds:
+        raise ValueError(f"No backtest folds fit into {len(times)} rows with {config}")
+    logging.info(f"Backtesting {type(estimator).__name__} on {len(folds)} folds")
+
+    results = score_folds(features, target, [(fold, estimator) for fold in folds], max_workers)
+
+    times = np.asarray(times, dtype='datetime64[ns]')
+    pooled = MetricsAccumulator()
+    rows = []
+    for fold, (accumulator, fold_metrics) in zip(folds, results):
+        pooled.merge(accumulator)
+        rows.append({
+            'fold': fold.index,
+            'train_start': times[fold.train_start],
+            'test_start': times[fold.test_start],
+            'test_end': times[fold.test_end - 1],
+            'train_rows': fold.train_end - fold.train_start,
+            'test_rows': fold.test_end - fold.test_start,
+            **fold_metrics,
+        })
+    fold_df = pd.DataFrame(rows)
+    result = {
+        'folds': fold_df,
+        'pooled': pooled.metrics(),
+        'mean': fold_df[METRIC_NAMES].mean().to_dict(),
+        'std': fold_df[METRIC_NAMES].std().to_dict(),
+    }
+    logging.info(f"Backtest pooled metrics over {pooled.count} test rows: {result['pooled']}")
+    return result
+
+
+def score_folds(features: np.ndarray, target: np.ndarray, tasks: List[Tuple[Fold, object]], max_workers: Optional[int] = None) -> list:
+    """
+    Fits a clone of the estimator of every task on its fold and scores the fold's test rows.
+
+    The feature matrix and the target are published once in shared memory and mapped
+    read-only by the workers of a process pool, so tasks only send row ranges and
+    estimator parameters, however large the data is. Tasks are handed out in batches,
+    as a single fold is usually too small to be worth a round trip.
+
+    Parameters:
+    features (np.ndarray): The feature matrix of all rows.
+    target (np.ndarray): The target of all rows.
+    tasks (list): (fold, estimator) pairs, the estimators are not modified.
+    max_workers (int): The number of worker processes. Defaults to the number of CPUs,
+        1 scores the tasks in this process.
+
+    Returns:
+    list: A (MetricsAccumulator, metrics dict) pair of the test rows of every task, in task order.
+    """
+    arrays = {'features': np.asarray(features, dtype=np.float64), 'target': np.asarray(target, dtype=np.float64)}
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        _worker_arrays.update(arrays)
+        try:
+            return [_score_fold(fold, estimator) for fold, estimator in tasks]
+        finally:
+            _worker_arrays.clear()
+
+    with SharedArrays(arrays) as handles:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(handles,)) as executor:
+            chunksize = max(1, math.ceil(len(tasks) / (max_workers * 4)))
+            folds, estimators = zip(*tasks) if tasks else ((), ())
+            return list(executor.map(_score_fold, folds, estimators, chunksize=chunksize))
+
+
+def _init_worker(handles) -> None:
+    _worker_arrays.update(attach_shared_arrays(handles))
+
+
+def _score_fold(fold: Fold, estimator):
+    """
+    Fits a clone of estimator on the training rows of a fold and scores its test rows.
+    """
+    features, target = _worker_arrays['features'], _worker_arrays['target']
+    model = clone(estimator).fit(features[fold.train_start:fold.train_end], target[fold.train_start:fold.train_end])
+    test = slice(fold.test_start, fold.test_end)
+    accumulator = MetricsAccumulator().update(target[test], model.predict(features[test]))
+    return accumulator, accumulator.metrics()
+
+
+def unfitted_estimator(model):
+    """
+    Returns an unfitted estimator with the parameters of a fitted one, as sklearn.base.clone.
+
+    Models pickled by an older scikit-learn lack the parameters added since, which clone
+    cannot read; they get their defaults instead.
+    """
+    defaults = type(model)().get_params(deep=False)
+    return type(model)(**{key: getattr(model, key, default) for key, default in defaults.items()})
+
+
+def backtest_pipeline(gym_data_path, weather_data_path, model_path=None, model_name=None, model_version=None,
+                      config: Optional[BacktestConfig] = None, max_workers: Optional[int] = None, use_cache=True,
+                      output_dir: Optional[str] = None) -> dict:
+    """
+    Backtests a model type on the hourly merged data with time-series folds.
+
+    The model is resolved as in predict_pipeline and an unfitted clone of it is refit on
+    every fold, see run_backtest. The feature matrix is built once from the merged
+    feature frame. If an output_dir is given, the fold table is written there as
+    folds.csv and the aggregated metrics as summary.json.
+
+    Returns:
+    dict: The backtest result, see run_backtest.
+    """
+    setup_logging()
+    logging.info("Starting backtest pipeline")
+    if model_path is None:
+        model_path = ModelRegistry(ModelRegistryConfig()).resolve(model_name, model_version).model_path
+    if model_path.endswith('.npz'):
+        raise ValueError(f"{model_path} holds exported coefficients only and cannot be refit")
+    predictor_model = PredictorModel(PredictorModelConfig(model_path=model_path))
+
+    cache = StageCache(StageCacheConfig()) if use_cache else None
+    merged_data = feature_pipeline(gym_data_path, weather_data_path, cache=cache)
+    merged_data = merged_data.sort_values(TIME_COL_NAME, kind='stable', ignore_index=True)
+    features = predictor_model.extract_features(merged_data)
+    if features is None:
+        raise ValueError("Could not extract the model features")
+
+    result = run_backtest(
+        features.to_numpy(dtype=np.float64),
+        merged_data[TARGET_COLUMN].to_numpy(dtype=np.float64),
+        merged_data[TIME_COL_NAME].dt.tz_convert('UTC').dt.tz_localize(None).to_numpy(dtype='datetime64[ns]'),
+        unfitted_estimator(predictor_model.model),
+        config,
+        max_workers,
+    )
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        result['folds'].to_csv(os.path.join(output_dir, 'folds.csv'), index=False)
+        summary = {'model_path': model_path, 'config': asdict(config or BacktestConfig()), 'folds': len(result['folds']),
+                   **{key: result[key] for key in ('pooled', 'mean', 'std')}}
+        with open(os.path.join(output_dir, 'summary.json'), 'w') as file:
+            json.dump(summary, file, indent=2)
+        logging.info(f"Backtest results written to {output_dir}")
+    return result
+
+
+if __name__=='__main__':
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    parser = argparse.ArgumentParser(description="Backtest a model with rolling or expanding time-series folds.")
+    parser.add_argument('--model-path', default=os.getenv('MODEL_PATH'))
+    parser.add_argument('--train-window', default=BacktestConfig.train_window)
+    parser.add_argument('--test-window', default=BacktestConfig.test_window)
+    parser.add_argument('--step', default=BacktestConfig.step)
+    parser.add_argument('--expanding', action='store_true')
+    parser.add_argument('--max-workers', type=int, default=None)
+    parser.add_argument('--output-dir', default=None)
+    args = parser.parse_args()
+
+    config = BacktestConfig(args.train_window, args.test_window, args.step, args.expanding)
+    backtest_pipeline(os.getenv('GYM_DATA_PATH'), os.getenv('WEATHER_DATA_PATH'), args.model_path, config=config,
+                      max_workers=args.max_workers, output_dir=args.output_dir)
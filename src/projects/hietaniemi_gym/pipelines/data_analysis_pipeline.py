@@ -2,18 +2,8 @@ import os
 import logging
 from dotenv import load_dotenv 
 from src.lib.logging.logger import setup_logging
-from src.projects.hietaniemi_gym.data.data_processing.data_loader import (
-    load_gym_data, 
-    load_weather_data
-)
-from src.projects.hietaniemi_gym.data.data_processing.data_clean import data_clean_na
-from src.projects.hietaniemi_gym.data.data_processing.data_merge_datasets import merge_datasets
-from src.projects.hietaniemi_gym.data.data_processing.data_transformation import (
-    aggregate_hourly_usage,
-    add_weekday_feature,
-    add_hour_feature,
-    add_sum_minutes_feature,
-)
+from src.projects.hietaniemi_gym.pipelines.feature_pipeline import feature_pipeline, incremental_feature_pipeline
+from src.projects.hietaniemi_gym.utils.stage_cache import StageCache, StageCacheConfig
 from src.projects.hietaniemi_gym.data.data_analysis.data_visualization.data_plot_and_save import (
     plot_total_device_usage,
     plot_mean_usage_per_hour,
@@ -22,78 +12,85 @@ from src.projects.hietaniemi_gym.data.data_analysis.data_visualization.data_plot
     plot_mean_gym_usage_vs_temperature,
     plot_sample_count_vs_temperature,
     plot_gym_usage_vs_precipitation,
-    plot_mean_gym_usage_vs_precipitation
+    plot_mean_gym_usage_vs_precipitation,
+    PlotJob,
+    render_plots
 )
 
-from src.projects.hietaniemi_gym.utils.file_manager import get_data_dir, save_data
-from src.projects.hietaniemi_gym.data.data_consts import DEVICE_COLUMNS, TIME_COL_NAME
+from src.projects.hietaniemi_gym.utils.file_manager import get_data_dir, save_dataframe
+from src.projects.hietaniemi_gym.utils.instrumentation import enable_instrumentation, disable_instrumentation
+from src.projects.hietaniemi_gym.utils.memory_report import MemoryBudgetConfig, StageMemoryReport
+from src.projects.hietaniemi_gym.data.data_consts import DEVICE_COLUMNS
+from src.projects.hietaniemi_gym.data.data_processing.calendar_features import add_calendar_features
+from src.projects.hietaniemi_gym.data.data_analysis.data_statistics.binned_statistics import BinSpec, BinnedStatistics
 
 
-def data_analysis_pipeline(gym_data_path, weather_data_path):
+def data_analysis_pipeline(gym_data_path, weather_data_path, chunksize=None, use_cache=True, incremental=False, parallel_plots=True,
+                           memory_budget_mb=None, memory_report=None, device_columns=DEVICE_COLUMNS, instrumentation=False,
+                           store_dir=None):
     setup_logging()
-    logging.info("Starting data analysis pipeline")
-
-    # Load data
-    logging.info("Loading gym data from {}".format(gym_data_path))
-    gym_data = load_gym_data(gym_data_path)
-    logging.info("Loading weather data from {}".format(weather_data_path))
-    weather_data = load_weather_data(weather_data_path)
-
-    # Clean data
-    logging.info("Cleaning gym data")
-    gym_data_cleaned = data_clean_na(gym_data)
-    logging.info("Cleaning weather data")
-    weather_data_cleaned = data_clean_na(weather_data)
-
-    # Data transformations
-    logging.info("Transforming data: Aggregating to hourly usage")
-    gym_hourly_data = aggregate_hourly_usage(gym_data_cleaned, TIME_COL_NAME)
-
-    # Merge datasets
-    logging.info("Merging datasets")
-    merged_data = merge_datasets(weather_data_cleaned, gym_hourly_data)
-    
-    logging.info("Transforming data: Adding weekday feature")
-    merged_data = add_weekday_feature(merged_data, TIME_COL_NAME)
-    logging.info("Transforming data: Adding hour feature")
-    merged_data = add_hour_feature(merged_data, TIME_COL_NAME)
-    logging.info("Transforming data: Adding sum of minutes feature")
-    merged_data = add_sum_minutes_feature(merged_data, DEVICE_COLUMNS)  
-
-    # save data
-    save_dir = get_data_dir(dir_name='dataset') 
-    save_data(merged_data, save_dir)
-
-    logging.info("Plotting total device usage")
-    save_dir = get_data_dir(dir_name='imgs') 
-    plot_total_device_usage(merged_data, dir=save_dir)
-
-    logging.info("Plotting mean usage per hour")
-    time_col = 'time'
-    plot_mean_usage_per_hour(merged_data, time_col, dir=save_dir)
-
-    logging.info("Plotting device usage weekday vs weekend comparison")
-    plot_device_usage_weekday_weekend_comparison(merged_data, categorize_day, dir=save_dir)
-
-    logging.info("Plotting gym usage vs temperature")
-    temperature_col = 'Temperature (degC)'
-    gym_usage_col = 'sum_minutes'
-    plot_gym_usage_vs_temperature(merged_data, temperature_col, gym_usage_col, dir=save_dir)
-
-    logging.info("Plotting mean gym usage vs temperature")
-    num_bins = 20
-    plot_mean_gym_usage_vs_temperature(merged_data, temperature_col, gym_usage_col, num_bins, dir=save_dir)
-
-    logging.info("Plotting sample count vs temperature")
-    plot_sample_count_vs_temperature(merged_data, temperature_col, gym_usage_col, num_bins, dir=save_dir)
-
-    logging.info("Plotting gym usage vs precipitation")
-    precipitation_col = 'Precipitation (mm)'
-    gym_usage_col = 'sum_minutes'
-    plot_gym_usage_vs_precipitation(merged_data, precipitation_col, gym_usage_col, dir=save_dir)
-
-    logging.info("Plotting mean gym usage vs precipitation")
-    plot_mean_gym_usage_vs_precipitation(merged_data, precipitation_col, gym_usage_col, num_bins, dir=save_dir)
+    if instrumentation:
+        # Per-function metrics are written next to the log file
+        enable_instrumentation()
+    try:
+        logging.info("Starting data analysis pipeline")
+
+        # Time and peak memory of every stage, checked against the optional budget
+        if memory_report is None:
+            memory_report = StageMemoryReport(MemoryBudgetConfig(max_peak_rss_mb=memory_budget_mb))
+
+        save_dir = get_data_dir(dir_name='dataset') 
+        if incremental:
+            # Process only rows appended since the last run and append them to the saved dataset
+            with memory_report.stage('incremental_features'):
+                merged_data = incremental_feature_pipeline(gym_data_path, weather_data_path, save_dir, device_columns=device_columns)
+        else:
+            # Load, clean, aggregate, merge and add features, reusing the cached result if the inputs are unchanged
+            cache = StageCache(StageCacheConfig()) if use_cache else None
+            merged_data = feature_pipeline(gym_data_path, weather_data_path, chunksize, cache, device_columns, memory_report,
+                                           quality_dir=get_data_dir(dir_name='dataset'), store_dir=store_dir)
+
+            # save data
+            with memory_report.stage('save_dataset'):
+                save_dataframe(merged_data, save_dir)
+
+        save_dir = get_data_dir(dir_name='imgs') 
+        time_col = 'time'
+        temperature_col = 'Temperature (degC)'
+        precipitation_col = 'Precipitation (mm)'
+        gym_usage_col = 'sum_minutes'
+        num_bins = 20
+
+        # The weekend flag is read from the calendar lookup table instead of being mapped per row
+        with memory_report.stage('calendar_features'):
+            merged_data = add_calendar_features(merged_data, time_col, ['is_weekend'])
+
+        # All binned charts read from one pass over the data
+        with memory_report.stage('binned_statistics'):
+            binned_statistics = BinnedStatistics(merged_data)
+            temperature_stats, precipitation_stats = binned_statistics.compute([
+                BinSpec(temperature_col, gym_usage_col, num_bins),
+                BinSpec(precipitation_col, gym_usage_col, num_bins),
+            ])
+        plot_jobs = [
+            PlotJob(plot_total_device_usage, device_columns, kwargs={'device_columns': device_columns, 'dir': save_dir}),
+            PlotJob(plot_mean_usage_per_hour, [time_col] + device_columns, (time_col,), {'device_columns': device_columns, 'dir': save_dir}),
+            PlotJob(plot_device_usage_weekday_weekend_comparison, device_columns + ['is_weekend'], (categorize_day,),
+                    {'device_columns': device_columns, 'dir': save_dir, 'weekend_col': 'is_weekend'}),
+            PlotJob(plot_gym_usage_vs_temperature, [temperature_col, gym_usage_col], (temperature_col, gym_usage_col), {'dir': save_dir}),
+            PlotJob(plot_mean_gym_usage_vs_temperature, [], (temperature_col, gym_usage_col, num_bins), {'dir': save_dir, 'binned_stats': temperature_stats}),
+            PlotJob(plot_sample_count_vs_temperature, [], (temperature_col, gym_usage_col, num_bins), {'dir': save_dir, 'binned_stats': temperature_stats}),
+            PlotJob(plot_gym_usage_vs_precipitation, [precipitation_col, gym_usage_col], (precipitation_col, gym_usage_col), {'dir': save_dir}),
+            PlotJob(plot_mean_gym_usage_vs_precipitation, [], (precipitation_col, gym_usage_col, num_bins), {'dir': save_dir, 'binned_stats': precipitation_stats}),
+        ]
+        logging.info("Plotting {} charts{}".format(len(plot_jobs), " in parallel" if parallel_plots else ""))
+        # In parallel mode this only covers the main process, the charts are drawn in workers
+        with memory_report.stage('render_plots'):
+            render_plots(merged_data, plot_jobs, parallel=parallel_plots)
+        memory_report.log()
+    finally:
+        if instrumentation:
+            disable_instrumentation()
 
 
 def categorize_day(day):
@@ -0,0 +1,340 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Iterator, Optional
+import numpy as np
+import pandas as pd
+from src.projects.hietaniemi_gym.data.data_processing.data_loader import (
+    load_gym_data, 
+    load_gym_data_hourly,
+    load_weather_data,
+    load_csv_tail,
+    preprocess_weather_data
+)
+from src.projects.hietaniemi_gym.data.data_processing.data_clean import data_clean_na
+from src.projects.hietaniemi_gym.data.data_processing.data_merge_datasets import merge_datasets
+from src.projects.hietaniemi_gym.data.data_processing.data_transformation import (
+    aggregate_hourly_usage,
+    add_sum_minutes_feature,
+)
+from src.projects.hietaniemi_gym.data.data_processing.calendar_features import add_calendar_features
+from src.projects.hietaniemi_gym.data.data_processing.data_schema import read_gym_csv, read_weather_csv
+from src.projects.hietaniemi_gym.data.data_processing.data_quality import GYM_QUALITY_RULES, WEATHER_QUALITY_RULES, data_quality_report
+from src.projects.hietaniemi_gym.utils.stage_cache import StageCache
+from src.projects.hietaniemi_gym.utils.memory_report import StageMemoryReport
+from src.projects.hietaniemi_gym.utils.file_manager import save_dataframe, append_dataframe, load_dataframe
+from src.projects.hietaniemi_gym.utils.time_series_store import get_store_path, read_store_manifest
+from src.projects.hietaniemi_gym.data.data_consts import DEVICE_COLUMNS, TIME_COL_NAME
+
+# FEATURE_PIPELINE_VERSION: Version of the load/clean/aggregate/merge/feature chain.
+# Bump it whenever the chain changes its output, so cached results are recomputed.
+FEATURE_PIPELINE_VERSION = 3
+
+# WATERMARK_CHECK_BYTES: Number of bytes before a stored offset that are hashed to detect
+# source files that were rewritten instead of appended to.
+WATERMARK_CHECK_BYTES = 4096
+
+
+def feature_pipeline(gym_data_path, weather_data_path, chunksize=None, cache: Optional[StageCache] = None,
+                     device_columns=DEVICE_COLUMNS, memory_report: Optional[StageMemoryReport] = None,
+                     quality_dir: Optional[str] = None, store_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    Builds the merged hourly feature frame shared by the prediction and analysis pipelines.
+
+    If a cache is given, the result is looked up by the content of both input files
+    and the stage version and only recomputed when one of them changed. If a
+    memory_report is given, the peak memory of every stage is recorded in it. If a
+    quality_dir is given, the loaded sources are profiled and their data quality reports
+    cached there, see data_quality_report. Streamed gym data is not profiled. If a
+    store_dir is given, the sources are memory-mapped from the time-series stores
+    ingested there instead of parsing the CSV files, see pipelines.ingest_pipeline; the
+    gym data is still streamed from CSV when a chunksize is given.
+
+    Every frame is owned by exactly one stage at a time: cleaning and aggregation are
+    called with copy=False and take over the frame handed to them, merging returns a new
+    frame and the feature stages modify it in place. Cleaning only copies the rows it
+    keeps if it has to drop any.
+    """
+    if memory_report is None:
+        memory_report = StageMemoryReport()
+    if cache is None:
+        return _build_merged_features(gym_data_path, weather_data_path, chunksize, device_columns, memory_report, quality_dir, store_dir)
+
+    # chunksize and store_dir change how the data is read, not the result, so they are not
+    # part of the key. Stores whose source changed since they were ingested are refused.
+    params = {'time_col': TIME_COL_NAME, 'device_columns': list(device_columns)}
+    return cache.get_or_compute(
+        'merged_features',
+        [gym_data_path, weather_data_path],
+        params,
+        FEATURE_PIPELINE_VERSION,
+        lambda: _build_merged_features(gym_data_path, weather_data_path, chunksize, device_columns, memory_report, quality_dir, store_dir),
+    )
+
+
+def _build_merged_features(gym_data_path, weather_data_path, chunksize=None, device_columns=DEVICE_COLUMNS,
+                           memory_report: Optional[StageMemoryReport] = None, quality_dir: Optional[str] = None,
+                           store_dir: Optional[str] = None) -> pd.DataFrame:
+    if memory_report is None:
+        memory_report = StageMemoryReport()
+
+    # Load data
+    logging.info("Loading weather data from {}".format(weather_data_path))
+    with memory_report.stage('load_weather'):
+        weather_data = load_weather_data(weather_data_path, store_dir)
+    if quality_dir is not None:
+        with memory_report.stage('profile_weather'):
+            data_quality_report(weather_data_path, quality_dir, weather_data, TIME_COL_NAME, WEATHER_QUALITY_RULES)
+
+    # Clean data
+    logging.info("Cleaning weather data")
+    with memory_report.stage('clean_weather'):
+        weather_data_cleaned = data_clean_na(weather_data, copy=False)
+        del weather_data
+
+    if chunksize is None:
+        logging.info("Loading gym data from {}".format(gym_data_path))
+        with memory_report.stage('load_gym'):
+            gym_data = load_gym_data(gym_data_path, store_dir)
+        if quality_dir is not None:
+            with memory_report.stage('profile_gym'):
+                data_quality_report(gym_data_path, quality_dir, gym_data, TIME_COL_NAME, GYM_QUALITY_RULES)
+        logging.info("Cleaning gym data")
+        with memory_report.stage('clean_gym'):
+            gym_data_cleaned = data_clean_na(gym_data, copy=False)
+            del gym_data
+
+        # Data transformations
+        logging.info("Transforming data: Aggregating to hourly usage")
+        with memory_report.stage('aggregate_hourly'):
+            gym_hourly_data = aggregate_hourly_usage(gym_data_cleaned, TIME_COL_NAME, copy=False)
+            del gym_data_cleaned
+    else:
+        logging.info("Streaming gym data from {} and aggregating to hourly usage".format(gym_data_path))
+        with memory_report.stage('stream_gym_hourly'):
+            gym_hourly_data = load_gym_data_hourly(gym_data_path, chunksize, TIME_COL_NAME)
+
+    return _merge_and_add_features(weather_data_cleaned, gym_hourly_data, device_columns, memory_report)
+
+
+def _merge_and_add_features(weather_data_cleaned: pd.DataFrame, gym_hourly_data: pd.DataFrame, device_columns=DEVICE_COLUMNS,
+                            memory_report: Optional[StageMemoryReport] = None) -> pd.DataFrame:
+    if memory_report is None:
+        memory_report = StageMemoryReport()
+
+    # Merge datasets
+    logging.info("Merging datasets")
+    with memory_report.stage('merge'):
+        merged_data = merge_datasets(weather_data_cleaned, gym_hourly_data)
+
+    with memory_report.stage('add_features'):
+        logging.info("Transforming data: Adding weekday and hour features")
+        merged_data = add_calendar_features(merged_data, TIME_COL_NAME, ['weekday', 'hour'])
+        logging.info("Transforming data: Adding sum of minutes feature")
+        merged_data = add_sum_minutes_feature(merged_data, device_columns)
+
+    return merged_data
+
+
+def iter_feature_chunks(gym_data_path, weather_data_path, store_dir, device_columns=DEVICE_COLUMNS, months: int = 1) -> Iterator[pd.DataFrame]:
+    """
+    Yields the merged hourly feature frame in consecutive chunks of months, read from the
+    time-series stores ingested into store_dir, see pipelines.ingest_pipeline.
+
+    Only the raw rows of one chunk are loaded at a time, so memory is bounded by the
+    chunk length rather than the length of the history. Hours without gym samples
+    between two chunks are filled with zeros in the later one, so the concatenated chunks
+    hold the same rows as the result of feature_pipeline.
+
+    Parameters:
+    gym_data_path (str): The gym CSV file the store was ingested from.
+    weather_data_path (str): The weather CSV file the store was ingested from.
+    store_dir (str): The directory of the time-series stores.
+    device_columns (list): The device columns summed into 'sum_minutes'.
+    months (int): The number of calendar months per chunk.
+
+    Yields:
+    pd.DataFrame: The merged features of one chunk, in time order.
+    """
+    partitions = read_store_manifest(get_store_path(gym_data_path, store_dir))['partitions']
+    if not partitions:
+        return
+    first = pd.Timestamp(partitions[0]['first'], tz='UTC')
+    last = pd.Timestamp(partitions[-1]['last'], tz='UTC')
+    bounds = pd.date_range(first.tz_localize(None).to_period('M').to_timestamp(), last.tz_localize(None), freq=f'{months}MS', tz='UTC')
+    bounds = bounds.append(pd.DatetimeIndex([bounds[-1] + pd.DateOffset(months=months)]))
+
+    next_hour = None
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        gym_data = data_clean_na(load_gym_data(gym_data_path, store_dir, (start, end)), copy=False)
+        if gym_data.empty:
+            continue
+        gym_hourly_data = aggregate_hourly_usage(gym_data, TIME_COL_NAME, copy=False)
+        del gym_data
+        if next_hour is not None:
+            # Hours since the previous chunk without any samples are filled with zeros, as resample does
+            hours = pd.date_range(next_hour, gym_hourly_data[TIME_COL_NAME].iloc[-1], freq='h', name=TIME_COL_NAME)
+            gym_hourly_data = gym_hourly_data.set_index(TIME_COL_NAME).reindex(hours, fill_value=0).reset_index()
+        first_hour = gym_hourly_data[TIME_COL_NAME].iloc[0]
+        next_hour = gym_hourly_data[TIME_COL_NAME].iloc[-1] + pd.Timedelta(hours=1)
+
+        weather_data = data_clean_na(load_weather_data(weather_data_path, store_dir, (first_hour, next_hour)), copy=False)
+        yield _merge_and_add_features(weather_data, gym_hourly_data, device_columns)
+
+
+def incremental_feature_pipeline(gym_data_path, weather_data_path, dataset_dir, dataset_name='data',
+                                 device_columns=DEVICE_COLUMNS) -> pd.DataFrame:
+    """
+    Brings the persisted merged feature frame up to date with rows appended to the source files.
+
+    A watermark file next to the dataset records, per source, the byte offset of the first
+    row that is not final yet: rows of the last, possibly partial, gym hour and everything
+    not yet covered by weather data. Only rows from those offsets on are read and
+    processed, the persisted rows from the boundary hour on are replaced and the new rows
+    are appended. The result equals a full run of feature_pipeline. A full rebuild is done
+    if there is no watermark, the stage version changed or a source was rewritten.
+
+    Parameters:
+    gym_data_path (str): The file path to the gym CSV file.
+    weather_data_path (str): The file path to the weather CSV file.
+    dataset_dir (str): The directory that holds the persisted columnar dataset.
+    dataset_name (str): The name of the dataset directory. Defaults to 'data'.
+    device_columns (list): The device columns summed into 'sum_minutes'.
+
+    Returns:
+    pd.DataFrame: The complete, memory-mapped merged feature frame.
+    """
+    watermark_path = os.path.join(dataset_dir, f'{dataset_name}.watermark.json')
+    sources = {'gym': gym_data_path, 'weather': weather_data_path}
+    watermark = _read_watermark(watermark_path, sources, device_columns)
+
+    if watermark is not None and all(
+        os.path.getsize(path) == watermark['sources'][name]['end'] for name, path in sources.items()
+    ):
+        logging.info("Source files unchanged since the last incremental run.")
+        return load_dataframe(dataset_dir, dataset_name)
+
+    offsets = {name: 0 if watermark is None else watermark['sources'][name]['offset'] for name in sources}
+    boundary = None if watermark is None else pd.Timestamp(watermark['boundary'])
+
+    logging.info("Loading new gym rows from {}".format(gym_data_path))
+    gym_data, gym_offsets, gym_end = load_csv_tail(gym_data_path, offsets['gym'], read_gym_csv)
+    gym_times = gym_data[TIME_COL_NAME]
+    logging.info("Loading new weather rows from {}".format(weather_data_path))
+    weather_data, weather_offsets, weather_end = load_csv_tail(weather_data_path, offsets['weather'], read_weather_csv)
+    weather_data = preprocess_weather_data(weather_data)
+    weather_times = weather_data[TIME_COL_NAME]
+
+    logging.info("Cleaning gym data")
+    gym_data_cleaned = data_clean_na(gym_data, copy=False)
+    logging.info("Cleaning weather data")
+    weather_data_cleaned = data_clean_na(weather_data, copy=False)
+    # Read before the aggregation takes ownership of the cleaned rows
+    last_gym_time = _latest(gym_times[gym_data_cleaned.index], watermark, 'gym')
+
+    logging.info("Transforming data: Aggregating to hourly usage")
+    gym_hourly_data = aggregate_hourly_usage(gym_data_cleaned, TIME_COL_NAME, copy=False)
+    if boundary is not None and len(gym_hourly_data):
+        # Hours between the boundary and the first new row have no samples, as in a full run
+        gym_hourly_data = gym_hourly_data.set_index(TIME_COL_NAME)
+        full_index = pd.date_range(boundary, gym_hourly_data.index[-1], freq='h', name=TIME_COL_NAME)
+        gym_hourly_data = gym_hourly_data.reindex(full_index, fill_value=0).reset_index()
+    merged_data = _merge_and_add_features(weather_data_cleaned, gym_hourly_data, device_columns)
+
+    # Per-source watermarks: the last timestamp processed from each file
+    last_times = {
+        'gym': last_gym_time,
+        'weather': _latest(weather_times, watermark, 'weather'),
+    }
+    # Everything from the new boundary on is recomputed by the next run
+    new_boundary = min(last_times['gym'].floor('h'), last_times['weather'] + pd.Timedelta(hours=1))
+
+    if watermark is None:
+        save_dataframe(merged_data, dataset_dir, dataset_name)
+    else:
+        stored_times = load_dataframe(dataset_dir, dataset_name, columns=[TIME_COL_NAME])[TIME_COL_NAME]
+        keep_rows = int(stored_times.searchsorted(boundary))
+        append_dataframe(merged_data, dataset_dir, dataset_name, keep_rows)
+
+    new_offsets = {
+        'gym': _first_offset_at(gym_times, gym_offsets, gym_end, new_boundary),
+        'weather': _first_offset_at(weather_times, weather_offsets, weather_end, new_boundary),
+    }
+    ends = {'gym': gym_end, 'weather': weather_end}
+    _write_watermark(watermark_path, sources, new_boundary, new_offsets, ends, last_times, device_columns)
+    logging.info(f"Merged dataset updated with {len(merged_data)} rows, new boundary is {new_boundary}")
+    return load_dataframe(dataset_dir, dataset_name)
+
+
+def _latest(times: pd.Series, watermark: Optional[dict], name: str) -> pd.Timestamp:
+    """
+    Returns the latest of the new timestamps of a source and its stored watermark.
+    """
+    latest = times.max()
+    if watermark is not None:
+        stored = pd.Timestamp(watermark['sources'][name]['last_time'])
+        latest = stored if pd.isna(latest) else max(latest, stored)
+    if pd.isna(latest):
+        raise ValueError(f"No valid {name} rows to build the merged dataset from")
+    return latest
+
+
+def _first_offset_at(times: pd.Series, row_offsets: np.ndarray, end: int, boundary: pd.Timestamp) -> int:
+    """
+    Returns the byte offset of the first row at or after boundary, or end if there is none.
+    """
+    at_boundary = (times >= boundary).to_numpy()
+    if not at_boundary.any():
+        return end
+    return int(row_offsets[np.argmax(at_boundary)])
+
+
+def _check_hash(file_path: str, offset: int) -> str:
+    """
+    Hashes the bytes right before offset, which must not change while a file is only appended to.
+    """
+    with open(file_path, 'rb') as file:
+        start = max(0, offset - WATERMARK_CHECK_BYTES)
+        file.seek(start)
+        return hashlib.blake2b(file.read(offset - start), digest_size=16).hexdigest()
+
+
+def _read_watermark(watermark_path: str, sources: dict, device_columns) -> Optional[dict]:
+    """
+    Returns the stored watermark, or None if the dataset has to be rebuilt.
+    """
+    if not os.path.isfile(watermark_path):
+        return None
+    with open(watermark_path) as file:
+        watermark = json.load(file)
+    if watermark['version'] != FEATURE_PIPELINE_VERSION or watermark['device_columns'] != list(device_columns):
+        logging.info("Feature pipeline changed, rebuilding the merged dataset.")
+        return None
+    for name, path in sources.items():
+        source = watermark['sources'][name]
+        if os.path.getsize(path) < source['end'] or _check_hash(path, source['offset']) != source['check']:
+            logging.info(f"Source {path} was rewritten, rebuilding the merged dataset.")
+            return None
+    return watermark
+
+
+def _write_watermark(watermark_path: str, sources: dict, boundary: pd.Timestamp, offsets: dict, ends: dict, last_times: dict, device_columns) -> None:
+    watermark = {
+        'version': FEATURE_PIPELINE_VERSION,
+        'device_columns': list(device_columns),
+        'boundary': boundary.isoformat(),
+        'sources': {
+            name: {
+                'path': path,
+                'last_time': last_times[name].isoformat(),
+                'offset': offsets[name],
+                'end': ends[name],
+                'check': _check_hash(path, offsets[name]),
+            }
+            for name, path in sources.items()
+        },
+    }
+    with open(watermark_path + '.tmp', 'w') as file:
+        json.dump(watermark, file, indent=2)
+    os.replace(watermark_path + '.tmp', watermark_path)
@@ -0,0 +1,60 @@
+import os
+import logging
+import argparse
+from typing import Optional
+from dotenv import load_dotenv
+from src.lib.logging.logger import setup_logging
+from src.projects.hietaniemi_gym.data.data_processing.data_loader import load_gym_data, load_weather_data
+from src.projects.hietaniemi_gym.utils.time_series_store import get_store_dir, get_store_path, is_store_current, write_time_series_store
+from src.projects.hietaniemi_gym.data.data_consts import TIME_COL_NAME
+
+
+def ingest_pipeline(gym_data_path, weather_data_path, store_dir: Optional[str] = None, force=False) -> dict:
+    """
+    Converts the raw gym and weather CSV files into memory-mapped time-series stores.
+
+    The CSV files are parsed once, the gym data as read by load_gym_data and the weather
+    data after preprocessing, and written to monthly partitions under store_dir, see
+    utils.time_series_store. Afterwards the loaders read them with store_dir instead of
+    parsing the CSV files again. Sources whose store is current are skipped unless force
+    is set.
+
+    Returns:
+    dict: The store path of every source.
+    """
+    setup_logging()
+    if store_dir is None:
+        store_dir = get_store_dir()
+    sources = [
+        (gym_data_path, load_gym_data, TIME_COL_NAME),
+        (weather_data_path, load_weather_data, 'time'),
+    ]
+    store_paths = {}
+    for source_path, load, time_col in sources:
+        store_path = get_store_path(source_path, store_dir)
+        store_paths[source_path] = store_path
+        if not force and is_store_current(store_path, source_path):
+            logging.info(f"{store_path} is current, skipping {source_path}")
+            continue
+        logging.info(f"Ingesting {source_path} into {store_path}")
+        source_df = load(source_path)
+        if source_df is None:
+            raise ValueError(f"Could not load {source_path}")
+        write_time_series_store(source_df, store_path, time_col, source_path)
+    return store_paths
+
+
+if __name__=='__main__':
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    parser = argparse.ArgumentParser(description="Ingest the raw CSV files into memory-mapped time-series stores.")
+    parser.add_argument('--gym-data-path', default=os.getenv('GYM_DATA_PATH'))
+    parser.add_argument('--weather-data-path', default=os.getenv('WEATHER_DATA_PATH'))
+    parser.add_argument('--store-dir', default=None)
+    parser.add_argument('--force', action='store_true', help="Rewrite stores that are current.")
+    args = parser.parse_args()
+
+    ingest_pipeline(args.gym_data_path, args.weather_data_path, args.store_dir, args.force)
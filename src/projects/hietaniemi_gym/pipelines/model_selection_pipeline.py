@@ -0,0 +1,209 @@
+import os
+import json
+import logging
+import argparse
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import sklearn
+from dotenv import load_dotenv
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.model_selection import ParameterGrid
+from sklearn.neural_network import MLPRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from src.lib.logging.logger import setup_logging
+from src.projects.hietaniemi_gym.pipelines.feature_pipeline import feature_pipeline
+from src.projects.hietaniemi_gym.pipelines.backtest_pipeline import TARGET_COLUMN, BacktestConfig, make_folds, score_folds
+from src.projects.hietaniemi_gym.utils.stage_cache import StageCache, StageCacheConfig
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import FEATURE_COLUMNS, extract_features
+from src.projects.hietaniemi_gym.model.model_predict.model_metrics import METRIC_NAMES, MetricsAccumulator
+from src.projects.hietaniemi_gym.model.model_registry.model_registry import ModelRegistryConfig, register_model
+from src.projects.hietaniemi_gym.data.data_consts import TIME_COL_NAME
+
+# SELECTION_ESTIMATORS: The estimators candidates can use, by name, and whether their
+# features are standardized first.
+SELECTION_ESTIMATORS = {
+    'linear': (LinearRegression, False),
+    'ridge': (Ridge, False),
+    'hist_gradient_boosting': (HistGradientBoostingRegressor, False),
+    'random_forest': (RandomForestRegressor, False),
+    'mlp': (MLPRegressor, True),
+}
+
+# DEFAULT_SEARCH_GRID: The hyperparameter grid of every estimator searched by default.
+DEFAULT_SEARCH_GRID = {
+    'linear': {},
+    'ridge': {'alpha': [1.0, 10.0, 100.0]},
+    'hist_gradient_boosting': {'learning_rate': [0.05, 0.1], 'max_leaf_nodes': [15, 31], 'random_state': [0]},
+    'random_forest': {'n_estimators': [100], 'min_samples_leaf': [5, 20], 'n_jobs': [1], 'random_state': [0]},
+}
+
+# RANKING_METRIC: The pooled validation metric candidates are ranked by, lowest first.
+RANKING_METRIC = 'Root Mean Squared Error (RMSE)'
+
+
+@dataclass
+class Candidate():
+    estimator: str
+    params: dict = field(default_factory=dict)
+
+    @property
+    def label(self) -> str:
+        params = ', '.join(f'{key}={value}' for key, value in sorted(self.params.items()))
+        return f'{self.estimator}({params})'
+
+
+@dataclass
+class ModelSelectionConfig():
+    """
+    Time-aware validation of the candidates. The defaults score every candidate on
+    expanding monthly folds that start with 90 days of training data.
+    """
+    validation: BacktestConfig = field(default_factory=lambda: BacktestConfig(train_window='90D', test_window='30D', step='30D', expanding=True))
+    search_grid: Dict[str, dict] = field(default_factory=lambda: dict(DEFAULT_SEARCH_GRID))
+    max_workers: Optional[int] = None
+
+
+def expand_candidates(search_grid: Dict[str, dict]) -> List[Candidate]:
+    """
+    Expands a search grid of parameter lists by estimator name into candidates.
+
+    Raises:
+    KeyError: If an estimator is not in SELECTION_ESTIMATORS.
+    """
+    unknown = [name for name in search_grid if name not in SELECTION_ESTIMATORS]
+    if unknown:
+        raise KeyError(f"Unknown estimators {unknown}, expected some of {list(SELECTION_ESTIMATORS)}")
+    return [Candidate(name, params) for name, grid in search_grid.items() for params in ParameterGrid(grid)]
+
+
+def make_candidate_estimator(candidate: Candidate):
+    """
+    Creates the unfitted estimator of a candidate, standardizing its features if needed.
+    """
+    estimator_class, scaled = SELECTION_ESTIMATORS[candidate.estimator]
+    estimator = estimator_class(**candidate.params)
+    return make_pipeline(StandardScaler(), estimator) if scaled else estimator
+
+
+def rank_candidates(features: np.ndarray, target: np.ndarray, times: np.ndarray, candidates: List[Candidate],
+                    validation: BacktestConfig, max_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Scores every candidate on the same time-series folds and ranks them.
+
+    Every (candidate, fold) pair is an independent task, so all workers stay busy
+    whether there are few candidates with many folds or the other way round. The feature
+    matrix is shared with the workers once, see score_folds.
+
+    Parameters:
+    features (np.ndarray): The feature matrix of all rows, sorted by time.
+    target (np.ndarray): The target of all rows.
+    times (np.ndarray): The timestamps of all rows.
+    candidates (list): The candidates to compare.
+    validation (BacktestConfig): The folds every candidate is scored on.
+    max_workers (int): The number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+    pd.DataFrame: One row per candidate with its pooled validation metrics and the
+        standard deviation of its fold RMSE, best first.
+    """
+    folds = make_folds(times, validation)
+    if not folds:
+        raise ValueError(f"No validation folds fit into {len(times)} rows with {validation}")
+    tasks = [(fold, make_candidate_estimator(candidate)) for candidate in candidates for fold in folds]
+    logging.info(f"Scoring {len(candidates)} candidates on {len(folds)} folds: {len(tasks)} tasks")
+    results = score_folds(features, target, tasks, max_workers)
+
+    rows = []
+    for position, candidate in enumerate(candidates):
+        candidate_results = results[position * len(folds):(position + 1) * len(folds)]
+        pooled = MetricsAccumulator()
+        for accumulator, _ in candidate_results:
+            pooled.merge(accumulator)
+        rows.append({
+            'candidate': candidate.label,
+            'estimator': candidate.estimator,
+            'params': candidate.params,
+            **pooled.metrics(),
+            'fold_rmse_std': float(np.std([metrics[RANKING_METRIC] for _, metrics in candidate_results])),
+        })
+    ranking = pd.DataFrame(rows).sort_values(RANKING_METRIC, kind='stable', ignore_index=True)
+    logging.info(f"Best candidate {ranking.loc[0, 'candidate']} with validation {RANKING_METRIC} {ranking.loc[0, RANKING_METRIC]:.3f}")
+    return ranking
+
+
+def model_selection_pipeline(gym_data_path, weather_data_path, config: Optional[ModelSelectionConfig] = None, use_cache=True,
+                             register=True, model_name: str = 'Selected_Regressor',
+                             base_path: str = ModelRegistryConfig.base_path, artifact_version: str = '0.0.1') -> Tuple[pd.DataFrame, Optional[str]]:
+    """
+    Compares candidate models on the hourly merged data and registers the best one.
+
+    The merged feature frame is built once, reused from the stage cache if possible, and
+    the feature matrix is extracted from it with extract_features. All candidates are
+    scored on the same expanding time-series folds in a process pool, see
+    rank_candidates. The winner is refit on all rows and registered in the artifact
+    tree with its validation metrics and the full ranking in its metadata, see
+    register_model.
+
+    Returns:
+    Tuple[pd.DataFrame, Optional[str]]: The ranking and the directory of the registered
+        model, or None if register is not set.
+    """
+    setup_logging()
+    config = config or ModelSelectionConfig()
+    logging.info("Starting model selection pipeline")
+    cache = StageCache(StageCacheConfig()) if use_cache else None
+    merged_data = feature_pipeline(gym_data_path, weather_data_path, cache=cache)
+    merged_data = merged_data.sort_values(TIME_COL_NAME, kind='stable', ignore_index=True)
+    features_df = extract_features(merged_data)
+    if features_df is None:
+        raise ValueError("Could not extract the model features")
+    features = features_df.to_numpy(dtype=np.float64)
+    target = merged_data[TARGET_COLUMN].to_numpy(dtype=np.float64)
+    times = merged_data[TIME_COL_NAME].dt.tz_convert('UTC').dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+
+    candidates = expand_candidates(config.search_grid)
+    ranking = rank_candidates(features, target, times, candidates, config.validation, config.max_workers)
+    if not register:
+        return ranking, None
+
+    best = ranking.loc[0]
+    model = make_candidate_estimator(Candidate(best['estimator'], best['params']))
+    model.fit(features_df.astype(np.float64), target)
+    metadata = {
+        'name': model_name,
+        'sklearn_version': sklearn.__version__,
+        'features': FEATURE_COLUMNS,
+        'target': TARGET_COLUMN,
+        'training_start': merged_data[TIME_COL_NAME].iloc[0].isoformat(),
+        'training_end': merged_data[TIME_COL_NAME].iloc[-1].isoformat(),
+        'training_rows': len(merged_data),
+        'estimator': best['estimator'],
+        'params': best['params'],
+        'validation': asdict(config.validation),
+        'metrics': {name: float(best[name]) for name in METRIC_NAMES},
+        'ranking': json.loads(ranking.to_json(orient='records')),
+    }
+    model_dir = register_model(model, metadata, base_path, artifact_version)
+    return ranking, model_dir
+
+
+if __name__=='__main__':
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    parser = argparse.ArgumentParser(description="Select the best model on time-series folds and register it.")
+    parser.add_argument('--max-workers', type=int, default=None)
+    parser.add_argument('--model-name', default='Selected_Regressor')
+    parser.add_argument('--no-register', action='store_true')
+    args = parser.parse_args()
+
+    ranking, _ = model_selection_pipeline(os.getenv('GYM_DATA_PATH'), os.getenv('WEATHER_DATA_PATH'),
+                                          ModelSelectionConfig(max_workers=args.max_workers),
+                                          register=not args.no_register, model_name=args.model_name)
+    logging.info(f"Candidate ranking:\n{ranking[['candidate', RANKING_METRIC, 'R^2 Score', 'fold_rmse_std']].to_string()}")
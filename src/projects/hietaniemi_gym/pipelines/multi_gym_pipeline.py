@@ -0,0 +1,122 @@
+import os
+import json
+import logging
+import argparse
+from dataclasses import dataclass, field, asdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
+from src.lib.logging.logger import setup_logging
+from src.projects.hietaniemi_gym.pipelines.feature_pipeline import feature_pipeline
+from src.projects.hietaniemi_gym.utils.file_manager import get_data_dir, save_dataframe
+from src.projects.hietaniemi_gym.data.data_consts import DEVICE_COLUMNS, TIME_COL_NAME
+
+# MULTI_GYM_INDEX_NAME: The name of the combined index written next to the per-gym shards.
+MULTI_GYM_INDEX_NAME = 'index.json'
+
+
+@dataclass
+class GymSource():
+    name: str
+    gym_data_path: str
+    weather_data_path: str
+    device_columns: List[str] = field(default_factory=lambda: list(DEVICE_COLUMNS))
+
+
+def load_manifest(manifest_path: str) -> List[GymSource]:
+    """
+    Loads the gym and weather source pairs from a JSON manifest.
+
+    The manifest is a list of objects with 'name', 'gym_data_path', 'weather_data_path'
+    and an optional 'device_columns' list, which defaults to DEVICE_COLUMNS.
+
+    Parameters:
+    manifest_path (str): The path to the JSON manifest.
+
+    Returns:
+    List[GymSource]: The sources listed in the manifest.
+    """
+    try:
+        with open(manifest_path) as file:
+            sources = [GymSource(**entry) for entry in json.load(file)]
+        names = [source.name for source in sources]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate gym names in manifest: {duplicates}")
+        logging.info(f"Loaded {len(sources)} gym sources from {manifest_path}")
+        return sources
+    except Exception as e:
+        logging.error(f"Error loading manifest {manifest_path}: {e}")
+        raise
+
+
+def multi_gym_pipeline(manifest_path, output_dir=None, max_workers: Optional[int] = None, chunksize=None) -> List[dict]:
+    """
+    Runs the load/clean/aggregate/merge/feature chain for every gym in a manifest in a process pool.
+
+    Every gym is written as its own columnar shard in output_dir, and a combined index
+    lists the shards with their row counts and time ranges. A failing gym is recorded in
+    the index with its error and does not stop the other gyms.
+
+    Parameters:
+    manifest_path (str): The path to the JSON manifest, see load_manifest.
+    output_dir (str): The directory for the shards and the index. Defaults to the 'gyms' data directory.
+    max_workers (int): The number of worker processes. Defaults to the number of CPUs.
+    chunksize (int): If given, gym data is streamed in chunks of that many rows.
+
+    Returns:
+    List[dict]: The index entries, one per gym, in manifest order.
+    """
+    setup_logging()
+    logging.info("Starting multi gym pipeline")
+    sources = load_manifest(manifest_path)
+    if output_dir is None:
+        output_dir = get_data_dir(dir_name='gyms')
+    os.makedirs(output_dir, exist_ok=True)
+
+    entries = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_run_shard, source, output_dir, chunksize): source for source in sources}
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                entries[source.name] = future.result()
+                logging.info(f"Gym {source.name} processed: {entries[source.name]['rows']} rows")
+            except Exception as e:
+                # A crashed worker or a bad shard only fails this gym
+                logging.error(f"Gym {source.name} failed: {e}")
+                entries[source.name] = {**asdict(source), 'status': 'failed', 'error': repr(e)}
+
+    index = [entries[source.name] for source in sources]
+    with open(os.path.join(output_dir, MULTI_GYM_INDEX_NAME), 'w') as file:
+        json.dump(index, file, indent=2)
+    failed = [entry['name'] for entry in index if entry['status'] != 'ok']
+    logging.info(f"Multi gym pipeline finished: {len(index) - len(failed)} succeeded, {len(failed)} failed {failed}")
+    return index
+
+
+def _run_shard(source: GymSource, output_dir: str, chunksize=None) -> dict:
+    """
+    Builds and saves the merged feature frame of one gym, returning its index entry.
+    """
+    merged_data = feature_pipeline(source.gym_data_path, source.weather_data_path, chunksize,
+                                   device_columns=source.device_columns)
+    save_dataframe(merged_data, output_dir, source.name)
+    return {
+        **asdict(source),
+        'status': 'ok',
+        'path': os.path.join(output_dir, source.name),
+        'rows': len(merged_data),
+        'start': merged_data[TIME_COL_NAME].min().isoformat() if len(merged_data) else None,
+        'end': merged_data[TIME_COL_NAME].max().isoformat() if len(merged_data) else None,
+    }
+
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description="Run the feature pipeline for many gyms in parallel.")
+    parser.add_argument('manifest_path')
+    parser.add_argument('--output-dir', default=None)
+    parser.add_argument('--max-workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=None)
+    args = parser.parse_args()
+
+    multi_gym_pipeline(args.manifest_path, args.output_dir, args.max_workers, args.chunksize)
@@ -2,71 +2,81 @@ import os
 import logging
 from dotenv import load_dotenv 
 from src.lib.logging.logger import setup_logging
-from src.projects.hietaniemi_gym.data.data_processing.data_loader import (
-    load_gym_data, 
-    load_weather_data
-)
-from src.projects.hietaniemi_gym.data.data_processing.data_clean import data_clean_na
-from src.projects.hietaniemi_gym.data.data_processing.data_merge_datasets import merge_datasets
-from src.projects.hietaniemi_gym.data.data_processing.data_transformation import (
-    aggregate_hourly_usage,
-    add_weekday_feature,
-    add_hour_feature,
-    add_sum_minutes_feature,
-)
+from src.projects.hietaniemi_gym.pipelines.feature_pipeline import feature_pipeline, incremental_feature_pipeline
+from src.projects.hietaniemi_gym.utils.file_manager import get_data_dir
+from src.projects.hietaniemi_gym.utils.stage_cache import StageCache, StageCacheConfig
+from src.projects.hietaniemi_gym.utils.instrumentation import enable_instrumentation, disable_instrumentation
+from src.projects.hietaniemi_gym.utils.memory_report import StageMemoryReport
+from src.projects.hietaniemi_gym.data.data_consts import DEVICE_COLUMNS
 from src.projects.hietaniemi_gym.model.model_predict.model_predictor import PredictorModelConfig, PredictorModel
+from src.projects.hietaniemi_gym.model.model_registry.model_registry import ModelRegistryConfig, ModelRegistry
 from src.projects.hietaniemi_gym.model.model_predict.model_metrics import calculate_metrics
-from src.projects.hietaniemi_gym.data.data_consts import DEVICE_COLUMNS, TIME_COL_NAME
 
-def predict_pipeline(gym_data_path, weather_data_path, model_path):
+def predict_pipeline(gym_data_path, weather_data_path, model_path=None, chunksize=None, use_cache=True, incremental=False,
+                     model_name=None, model_version=None, memory_report=None, device_columns=DEVICE_COLUMNS, instrumentation=False,
+                     store_dir=None):
     """
     Applies a pretrained model to the data to make predictions.
 
-    """
-    setup_logging()
-    logging.info("Starting prediction pipeline")
-
-    # Load data
-    logging.info("Loading gym data from {}".format(gym_data_path))
-    gym_data = load_gym_data(gym_data_path)
-    logging.info("Loading weather data from {}".format(weather_data_path))
-    weather_data = load_weather_data(weather_data_path)
+    Without a model_path the model is resolved from the model registry by model_name
+    and model_version, defaulting to the latest registered model.
 
-    # Clean data
-    logging.info("Cleaning gym data")
-    gym_data_cleaned = data_clean_na(gym_data)
-    logging.info("Cleaning weather data")
-    weather_data_cleaned = data_clean_na(weather_data)
+    If chunksize is given, the gym data is streamed in chunks of that many rows
+    and aggregated to hourly usage while it is read. With use_cache the merged
+    feature frame is reused from the stage cache when both input files are unchanged.
+    With incremental only rows appended to the input files since the last incremental
+    run are processed and added to the saved merged dataset. With a store_dir the sources
+    are read from the time-series stores ingested there, see pipelines.ingest_pipeline.
 
-    # Data transformations
-    logging.info("Transforming data: Aggregating to hourly usage")
-    gym_hourly_data = aggregate_hourly_usage(gym_data_cleaned, TIME_COL_NAME)
-
-    # Merge datasets
-    logging.info("Merging datasets")
-    merged_data = merge_datasets(weather_data_cleaned, gym_hourly_data)
+    The time and peak memory of every stage are recorded in memory_report if one is given.
+    With instrumentation every instrumented function call is recorded as well, see
+    utils.instrumentation, and a summary table is logged at the end.
+    """
+    setup_logging()
+    if instrumentation:
+        # Per-function metrics are written next to the log file
+        enable_instrumentation()
+    try:
+        logging.info("Starting prediction pipeline")
+        if memory_report is None:
+            memory_report = StageMemoryReport()
 
-    logging.info("Transforming data: Adding weekday feature")
-    merged_data = add_weekday_feature(merged_data, TIME_COL_NAME)
-    logging.info("Transforming data: Adding hour feature")
-    merged_data = add_hour_feature(merged_data, TIME_COL_NAME)
-    logging.info("Transforming data: Adding sum of minutes feature")
-    merged_data = add_sum_minutes_feature(merged_data, DEVICE_COLUMNS) 
+        if incremental:
+            # Process only rows appended since the last run and append them to the saved dataset
+            save_dir = get_data_dir(dir_name='dataset')
+            with memory_report.stage('incremental_features'):
+                merged_data = incremental_feature_pipeline(gym_data_path, weather_data_path, save_dir, device_columns=device_columns)
+        else:
+            # Load, clean, aggregate, merge and add features, reusing the cached result if the inputs are unchanged
+            cache = StageCache(StageCacheConfig()) if use_cache else None
+            merged_data = feature_pipeline(gym_data_path, weather_data_path, chunksize, cache, device_columns, memory_report,
+                                           quality_dir=get_data_dir(dir_name='dataset'), store_dir=store_dir)
     
     
-    logging.info("Making predictions on the dataset")
-    predictor_model_config = PredictorModelConfig(model_path=model_path)
-    predictor_model = PredictorModel(predictor_model_config)
-    features = predictor_model.extract_features(merged_data)
-    if not features.empty:
-        logging.info("Features are extracted succesfully.")
-        predictions = predictor_model.predict(features)
-        gym_usage_col = 'sum_minutes'
-        true_values = merged_data[gym_usage_col].values
-        metrics = calculate_metrics(true_values, predictions)
-        logging.info(f"Prediction metrics are: {metrics}")
-    else:
-        logging.info("Features are compromised.")
+        logging.info("Making predictions on the dataset")
+        with memory_report.stage('load_model'):
+            if model_path is None:
+                predictor_model = ModelRegistry(ModelRegistryConfig()).get_predictor(model_name, model_version)
+            else:
+                predictor_model_config = PredictorModelConfig(model_path=model_path)
+                predictor_model = PredictorModel(predictor_model_config)
+        with memory_report.stage('extract_features'):
+            features = predictor_model.extract_features(merged_data)
+        if not features.empty:
+            logging.info("Features are extracted succesfully.")
+            with memory_report.stage('predict'):
+                predictions = predictor_model.predict(features)
+            with memory_report.stage('metrics'):
+                gym_usage_col = 'sum_minutes'
+                true_values = merged_data[gym_usage_col].values
+                metrics = calculate_metrics(true_values, predictions)
+            logging.info(f"Prediction metrics are: {metrics}")
+        else:
+            logging.info("Features are compromised.")
+        memory_report.log()
+    finally:
+        if instrumentation:
+            disable_instrumentation()
 
 
 
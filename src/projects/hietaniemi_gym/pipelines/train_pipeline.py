@@ -0,0 +1,155 @@
+import os
+import time
+import logging
+import argparse
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
+import pandas as pd
+import sklearn
+from dotenv import load_dotenv
+from src.lib.logging.logger import setup_logging
+from src.projects.hietaniemi_gym.pipelines.feature_pipeline import iter_feature_chunks
+from src.projects.hietaniemi_gym.pipelines.ingest_pipeline import ingest_pipeline
+from src.projects.hietaniemi_gym.pipelines.multi_gym_pipeline import GymSource, load_manifest
+from src.projects.hietaniemi_gym.utils.time_series_store import get_store_dir
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import FEATURE_COLUMNS
+from src.projects.hietaniemi_gym.model.model_predict.model_metrics import MetricsAccumulator
+from src.projects.hietaniemi_gym.model.model_registry.model_registry import ModelRegistryConfig, register_model
+from src.projects.hietaniemi_gym.model.model_train.incremental_trainer import NormalEquationRegressor, make_estimator, train_incremental
+from src.projects.hietaniemi_gym.data.data_consts import TIME_COL_NAME
+
+# TARGET_COLUMN: The column the models are trained to predict.
+TARGET_COLUMN = 'sum_minutes'
+
+# MODEL_NAMES: The default registry name of the models trained with each estimator.
+MODEL_NAMES = {'linear': 'Linear_Regressor', 'sgd': 'SGD_Regressor', 'mlp': 'MLP_Regressor'}
+
+
+@dataclass
+class TrainConfig():
+    estimator: str = 'linear'
+    params: dict = field(default_factory=dict)
+    epochs: int = 1
+    months_per_chunk: int = 1
+    model_name: Optional[str] = None
+    base_path: str = ModelRegistryConfig.base_path
+    artifact_version: str = '0.0.1'
+
+
+class _ChunkStats:
+    """
+    Running row count and time span of streamed feature chunks.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.chunks = 0
+        self.start = None
+        self.end = None
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        self.rows += len(chunk)
+        self.chunks += 1
+        if len(chunk):
+            self.start = min(self.start, chunk[TIME_COL_NAME].iloc[0]) if self.start is not None else chunk[TIME_COL_NAME].iloc[0]
+            self.end = max(self.end, chunk[TIME_COL_NAME].iloc[-1]) if self.end is not None else chunk[TIME_COL_NAME].iloc[-1]
+
+
+def train_pipeline(gym_data_path=None, weather_data_path=None, config: Optional[TrainConfig] = None, manifest_path=None,
+                   store_dir: Optional[str] = None) -> str:
+    """
+    Trains a model on the merged hourly features without loading all of them into memory.
+
+    The sources are ingested into time-series stores if needed, see ingest_pipeline, and
+    the merged features are streamed from them in chunks of config.months_per_chunk
+    months, see iter_feature_chunks. Linear regression is solved exactly from
+    accumulated normal equations in one pass, the other estimators are trained with
+    partial_fit, see train_incremental. Memory is bounded by one chunk, however many
+    years or gyms are trained on.
+
+    The model is registered in a new model directory with a metadata.json that records
+    the training data and metrics, see register_model, so the model registry resolves it
+    as the latest model.
+
+    Parameters:
+    gym_data_path (str): The gym CSV file of a single gym.
+    weather_data_path (str): The weather CSV file of a single gym.
+    config (TrainConfig): The estimator and where to register the model.
+    manifest_path (str): A multi gym manifest, see multi_gym_pipeline.load_manifest, to
+        train on all of its gyms instead of a single one.
+    store_dir (str): The directory of the time-series stores. Defaults to the 'store' data directory.
+        Every source gets its own store keyed by its full path, so gyms whose files share
+        a name do not overwrite each other.
+
+    Returns:
+    str: The path of the new model directory.
+    """
+    setup_logging()
+    config = config or TrainConfig()
+    logging.info(f"Starting training pipeline for the {config.estimator} estimator")
+    sources = load_manifest(manifest_path) if manifest_path is not None else [GymSource('default', gym_data_path, weather_data_path)]
+    if store_dir is None:
+        store_dir = get_store_dir()
+    for source in sources:
+        ingest_pipeline(source.gym_data_path, source.weather_data_path, store_dir)
+
+    def feature_chunks():
+        for source in sources:
+            yield from iter_feature_chunks(source.gym_data_path, source.weather_data_path, store_dir, source.device_columns, config.months_per_chunk)
+
+    def training_chunks():
+        for chunk in feature_chunks():
+            yield chunk[FEATURE_COLUMNS].astype(np.float64), chunk[TARGET_COLUMN].to_numpy(dtype=np.float64)
+
+    started = time.perf_counter()
+    estimator = make_estimator(config.estimator, config.params)
+    model = train_incremental(estimator, training_chunks, config.epochs)
+    training_seconds = time.perf_counter() - started
+
+    # A last pass scores the model on its training data and records the data it saw
+    metrics = MetricsAccumulator()
+    evaluation = _ChunkStats()
+    for chunk in feature_chunks():
+        evaluation.add(chunk)
+        metrics.update(chunk[TARGET_COLUMN].to_numpy(dtype=np.float64), model.predict(chunk[FEATURE_COLUMNS].astype(np.float64)))
+    logging.info(f"Training metrics: {metrics.metrics()}")
+
+    name = config.model_name or MODEL_NAMES.get(config.estimator, config.estimator)
+    metadata = {
+        'name': name,
+        'sklearn_version': sklearn.__version__,
+        'features': FEATURE_COLUMNS,
+        'target': TARGET_COLUMN,
+        'training_start': evaluation.start.isoformat() if evaluation.start is not None else None,
+        'training_end': evaluation.end.isoformat() if evaluation.end is not None else None,
+        'training_rows': evaluation.rows,
+        'training_chunks': evaluation.chunks,
+        'training_seconds': training_seconds,
+        'estimator': config.estimator,
+        'params': config.params,
+        'epochs': config.epochs if not isinstance(estimator, NormalEquationRegressor) else 1,
+        'sources': [{'name': source.name, 'gym_data_path': source.gym_data_path, 'weather_data_path': source.weather_data_path} for source in sources],
+        'metrics': metrics.metrics(),
+    }
+    model_dir = register_model(model, metadata, config.base_path, config.artifact_version)
+    logging.info(f"Trained {name} on {evaluation.rows} rows")
+    return model_dir
+
+
+if __name__=='__main__':
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    parser = argparse.ArgumentParser(description="Train a model on streamed chunks of the merged features.")
+    parser.add_argument('--estimator', default=TrainConfig.estimator, choices=list(MODEL_NAMES))
+    parser.add_argument('--epochs', type=int, default=TrainConfig.epochs)
+    parser.add_argument('--months-per-chunk', type=int, default=TrainConfig.months_per_chunk)
+    parser.add_argument('--model-name', default=None)
+    parser.add_argument('--manifest-path', default=None)
+    parser.add_argument('--store-dir', default=None)
+    args = parser.parse_args()
+
+    config = TrainConfig(estimator=args.estimator, epochs=args.epochs, months_per_chunk=args.months_per_chunk, model_name=args.model_name)
+    train_pipeline(os.getenv('GYM_DATA_PATH'), os.getenv('WEATHER_DATA_PATH'), config, args.manifest_path, args.store_dir)
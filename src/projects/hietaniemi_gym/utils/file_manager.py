@@ -1,7 +1,18 @@
 import os
+import json
+import shutil
 import dill
 import logging
-from typing import Any
+import numpy as np
+import pandas as pd
+from typing import Any, List, Optional
+
+# COLUMNAR_MANIFEST_NAME: The name of the schema file written next to the per-column
+# arrays of a columnar dataset directory.
+COLUMNAR_MANIFEST_NAME = 'manifest.json'
+
+# COLUMNAR_FORMAT_VERSION: Version of the columnar layout, bumped on incompatible changes.
+COLUMNAR_FORMAT_VERSION = 1
 
 def get_data_dir(base_path="./artifacts/hietaniemi_gym/0.0.1/data", dir_name="default"):
     """
@@ -63,13 +74,19 @@ def save_data(data: Any, dir_path: str, filename: str = "data.pkl") -> None:
         raise
 
 
-def load_data(dir_path: str, filename: str = "data.pkl") -> Any:
+def load_data(dir_path: str, filename: Optional[str] = None, columns: Optional[List[str]] = None, mmap: bool = True) -> Any:
     """
     Load data from a specified directory using dill deserialization.
 
+    If filename points to a columnar dataset directory written by save_dataframe, the
+    DataFrame is loaded with load_dataframe instead, so both formats stay readable.
+
     Parameters:
     dir_path (str): The directory path from where the data file will be loaded.
-    filename (str): The name of the file to load the data from. Defaults to 'data.pkl'.
+    filename (str): The name of the file to load the data from. Defaults to the columnar
+        'data' dataset if dir_path has one, otherwise to 'data.pkl'.
+    columns (list): Columns to materialize from a columnar dataset. Defaults to all columns.
+    mmap (bool): Whether to memory-map the arrays of a columnar dataset.
 
     Returns:
     Any: The data object that was deserialized from the file.
@@ -78,8 +95,15 @@ def load_data(dir_path: str, filename: str = "data.pkl") -> Any:
     FileNotFoundError: If the file does not exist.
     Exception: If the data cannot be deserialized.
     """
+    if filename is None:
+        # Prefer the columnar dataset the pipelines write over a pickle of an older run
+        columnar = os.path.isfile(os.path.join(dir_path, 'data', COLUMNAR_MANIFEST_NAME))
+        filename = 'data' if columnar else 'data.pkl'
+
     # Construct the full path to the data file
     file_path = os.path.join(dir_path, filename)
+    if os.path.isfile(os.path.join(file_path, COLUMNAR_MANIFEST_NAME)):
+        return load_dataframe(dir_path, filename, columns=columns, mmap=mmap)
 
     try:
         # Load the data using dill
@@ -93,4 +117,290 @@ def load_data(dir_path: str, filename: str = "data.pkl") -> Any:
         raise
     except Exception as e:
         logging.error(f"Could not load data from {file_path}: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+def save_dataframe(df: pd.DataFrame, dir_path: str, dataset_name: str = "data") -> None:
+    """
+    Save a DataFrame to a specified directory in a columnar, memory-mappable layout.
+
+    Every column is written as its own .npy array inside dir_path/dataset_name, together
+    with a manifest that records column names, dtypes and time zones. Numeric and
+    datetime columns can then be memory-mapped by load_dataframe without deserializing
+    the rest of the dataset.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame to be saved.
+    dir_path (str): The directory path where the dataset directory will be created.
+    dataset_name (str): The name of the dataset directory. Defaults to 'data'.
+
+    Returns:
+    None: This function does not return anything.
+
+    Raises:
+    OSError: If the directory cannot be created.
+    Exception: If a column cannot be written.
+    """
+    dataset_path = os.path.join(dir_path, dataset_name)
+    tmp_path = dataset_path + '.tmp'
+    try:
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+
+        manifest = {
+            'format_version': COLUMNAR_FORMAT_VERSION,
+            'num_rows': len(df),
+            'columns': [],
+            'index': None,
+        }
+        for position, column in enumerate(df.columns):
+            spec = _write_column(df[column], tmp_path, f'{position:04d}')
+            spec['name'] = column
+            manifest['columns'].append(spec)
+
+        # Only a non-default index needs to be stored
+        if not df.index.equals(pd.RangeIndex(len(df))):
+            manifest['index'] = _write_column(df.index.to_series(), tmp_path, 'index')
+            manifest['index']['name'] = df.index.name
+
+        with open(os.path.join(tmp_path, COLUMNAR_MANIFEST_NAME), 'w') as file:
+            json.dump(manifest, file, indent=2)
+
+        # Swap the finished dataset in, so readers never see a partial write
+        if os.path.exists(dataset_path):
+            shutil.rmtree(dataset_path)
+        os.rename(tmp_path, dataset_path)
+        logging.info(f"DataFrame saved in columnar format to {dataset_path}")
+
+    except OSError as e:
+        logging.error(f"Could not write columnar dataset to {dataset_path}: {e}")
+        raise
+    except Exception as e:
+        logging.error(f"Could not save DataFrame to {dataset_path}: {e}")
+        raise
+
+
+def load_dataframe(dir_path: str, dataset_name: str = "data", columns: Optional[List[str]] = None, mmap: bool = True) -> pd.DataFrame:
+    """
+    Load a DataFrame saved by save_dataframe, materializing only the requested columns.
+
+    With mmap enabled numeric and datetime columns are memory-mapped copy-on-write, so
+    they are paged in from disk on access and can still be modified in memory.
+
+    Parameters:
+    dir_path (str): The directory path that contains the dataset directory.
+    dataset_name (str): The name of the dataset directory. Defaults to 'data'.
+    columns (list): The columns to load, in the requested order. Defaults to all columns.
+    mmap (bool): Whether to memory-map the column arrays instead of reading them.
+
+    Returns:
+    pd.DataFrame: The loaded DataFrame.
+
+    Raises:
+    FileNotFoundError: If the dataset does not exist.
+    KeyError: If a requested column is not in the dataset.
+    """
+    dataset_path = os.path.join(dir_path, dataset_name)
+    try:
+        with open(os.path.join(dataset_path, COLUMNAR_MANIFEST_NAME)) as file:
+            manifest = json.load(file)
+        if manifest['format_version'] != COLUMNAR_FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar format version {manifest['format_version']}")
+
+        specs = {spec['name']: spec for spec in manifest['columns']}
+        if columns is None:
+            columns = [spec['name'] for spec in manifest['columns']]
+        missing_columns = [column for column in columns if column not in specs]
+        if missing_columns:
+            raise KeyError(f"Columns not found in dataset: {missing_columns}")
+
+        mmap_mode = 'c' if mmap else None
+        data = {column: _read_column(specs[column], dataset_path, mmap_mode) for column in columns}
+
+        index = None
+        if manifest['index'] is not None:
+            index = pd.Index(_read_column(manifest['index'], dataset_path, mmap_mode), name=manifest['index']['name'])
+
+        df = pd.DataFrame(data, index=index, columns=columns, copy=False)
+        logging.info(f"DataFrame loaded from {dataset_path} ({len(columns)} columns)")
+        return df
+
+    except FileNotFoundError as e:
+        logging.error(f"The dataset {dataset_path} does not exist: {e}")
+        raise
+    except Exception as e:
+        logging.error(f"Could not load DataFrame from {dataset_path}: {e}")
+        raise
+
+
+def append_dataframe(df: pd.DataFrame, dir_path: str, dataset_name: str = "data", keep_rows: Optional[int] = None) -> None:
+    """
+    Append rows to a DataFrame saved by save_dataframe without rewriting the stored columns.
+
+    Every column file is first truncated to keep_rows rows, then the new values are written
+    at its end and the array header is updated in place. A column is only rewritten as a
+    whole if the new rows need a wider dtype. Interrupted appends are repaired by the next
+    call, because every column is truncated to keep_rows before anything is written.
+
+    Parameters:
+    df (pd.DataFrame): The rows to append, with the same columns as the stored dataset.
+    dir_path (str): The directory path that contains the dataset directory.
+    dataset_name (str): The name of the dataset directory. Defaults to 'data'.
+    keep_rows (int): The number of stored rows to keep before appending. Defaults to all rows.
+
+    Returns:
+    None: This function does not return anything.
+
+    Raises:
+    ValueError: If the columns of df do not match the stored dataset.
+    """
+    dataset_path = os.path.join(dir_path, dataset_name)
+    manifest_path = os.path.join(dataset_path, COLUMNAR_MANIFEST_NAME)
+    try:
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        if manifest['index'] is not None:
+            raise ValueError("Cannot append to a dataset with a stored index")
+        names = [spec['name'] for spec in manifest['columns']]
+        if list(df.columns) != names:
+            raise ValueError(f"Columns {list(df.columns)} do not match the stored columns {names}")
+
+        num_rows = manifest['num_rows'] if keep_rows is None else min(keep_rows, manifest['num_rows'])
+        for spec in manifest['columns']:
+            new_spec, values, nulls = _column_values(df[spec['name']])
+            if new_spec['kind'] != spec['kind'] or new_spec.get('tz') != spec.get('tz'):
+                raise ValueError(f"Column {spec['name']} cannot be appended as {new_spec['dtype']}")
+
+            file_path = os.path.join(dataset_path, spec['file'])
+            stored_dtype = _npy_dtype(file_path)
+            if np.can_cast(values.dtype, stored_dtype, casting='safe'):
+                _append_npy(file_path, values.astype(stored_dtype, copy=False), num_rows)
+            else:
+                # The stored dtype is too narrow, rewrite the column with the common dtype
+                stored = np.load(file_path, allow_pickle=False)[:num_rows]
+                np.save(file_path, np.concatenate([stored, values]), allow_pickle=False)
+                if spec['kind'] == 'numeric':
+                    spec['dtype'] = str(np.result_type(stored.dtype, values.dtype))
+
+            if 'nulls' in spec or nulls.any():
+                nulls_file = spec.setdefault('nulls', spec['file'].replace('.npy', '.nulls.npy'))
+                nulls_path = os.path.join(dataset_path, nulls_file)
+                if not os.path.exists(nulls_path):
+                    np.save(nulls_path, np.zeros(num_rows, dtype=bool))
+                _append_npy(nulls_path, nulls, num_rows)
+
+        # The manifest is written last, readers keep seeing the old row count until then
+        manifest['num_rows'] = num_rows + len(df)
+        with open(manifest_path + '.tmp', 'w') as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        logging.info(f"Appended {len(df)} rows to {dataset_path} after row {num_rows}")
+
+    except FileNotFoundError as e:
+        logging.error(f"The dataset {dataset_path} does not exist: {e}")
+        raise
+    except Exception as e:
+        logging.error(f"Could not append to {dataset_path}: {e}")
+        raise
+
+
+def _column_values(column: pd.Series):
+    """
+    Convert one column to the array stored on disk.
+
+    Returns its manifest entry without the file names, the array and the null mask.
+    """
+    spec = {'dtype': str(column.dtype)}
+    nulls = np.zeros(len(column), dtype=bool)
+    if isinstance(column.dtype, pd.DatetimeTZDtype):
+        # Stored as naive UTC nanoseconds, the time zone is restored on load
+        spec['kind'] = 'datetime'
+        spec['tz'] = str(column.dt.tz)
+        values = column.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+    elif column.dtype == object or pd.api.types.is_string_dtype(column.dtype):
+        # Strings are stored fixed width with a separate null mask
+        spec['kind'] = 'string'
+        nulls = column.isna().to_numpy()
+        values = column.where(~nulls, '').astype(str).to_numpy(dtype=str)
+    else:
+        spec['kind'] = 'numeric'
+        values = column.to_numpy()
+        if values.dtype == object:
+            raise TypeError(f"Column {column.name} with dtype {column.dtype} cannot be stored in columnar format")
+    return spec, values, nulls
+
+
+def _write_column(column: pd.Series, dataset_path: str, file_stem: str) -> dict:
+    """
+    Write one column as a .npy array and return its manifest entry.
+    """
+    spec, values, nulls = _column_values(column)
+    spec['file'] = f'{file_stem}.npy'
+    if nulls.any():
+        spec['nulls'] = f'{file_stem}.nulls.npy'
+        np.save(os.path.join(dataset_path, spec['nulls']), nulls)
+    np.save(os.path.join(dataset_path, spec['file']), values, allow_pickle=False)
+    return spec
+
+
+def _npy_dtype(file_path: str) -> np.dtype:
+    """
+    Read the dtype from the header of a .npy file.
+    """
+    with open(file_path, 'rb') as file:
+        version = np.lib.format.read_magic(file)
+        _, _, dtype = _read_npy_header(file, version)
+    return dtype
+
+
+def _read_npy_header(file, version):
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(file)
+    return np.lib.format.read_array_header_2_0(file)
+
+
+def _append_npy(file_path: str, values: np.ndarray, keep_rows: int) -> None:
+    """
+    Truncate a 1-D .npy file to keep_rows entries and append values, updating its header in place.
+    """
+    with open(file_path, 'r+b') as file:
+        version = np.lib.format.read_magic(file)
+        shape, fortran_order, dtype = _read_npy_header(file, version)
+        header_len = file.tell()
+        if len(shape) != 1 or dtype != values.dtype:
+            raise ValueError(f"Cannot append {values.dtype} values to {file_path} with dtype {dtype} and shape {shape}")
+
+        file.truncate(header_len + keep_rows * dtype.itemsize)
+        file.seek(0, os.SEEK_END)
+        file.write(np.ascontiguousarray(values).tobytes())
+
+        # numpy pads the header so that the length of the shape can grow without moving the data
+        header = {
+            'descr': np.lib.format.dtype_to_descr(dtype),
+            'fortran_order': fortran_order,
+            'shape': (keep_rows + len(values),),
+        }
+        file.seek(0)
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(file, header)
+        else:
+            np.lib.format.write_array_header_2_0(file, header)
+        if file.tell() != header_len:
+            raise ValueError(f"The header of {file_path} changed size, the file is corrupted")
+
+
+def _read_column(spec: dict, dataset_path: str, mmap_mode: Optional[str]) -> Any:
+    """
+    Read one column written by _write_column.
+    """
+    values = np.load(os.path.join(dataset_path, spec['file']), mmap_mode=mmap_mode, allow_pickle=False)
+    if spec['kind'] == 'datetime':
+        return pd.Series(values).dt.tz_localize('UTC').dt.tz_convert(spec['tz']).array
+    if spec['kind'] == 'string':
+        values = values.astype(object)
+        if 'nulls' in spec:
+            values[np.load(os.path.join(dataset_path, spec['nulls']))] = np.nan
+        return values
+    # A plain ndarray view keeps the mapping without exposing the memmap subclass
+    return np.asarray(values)
@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import logging
+import functools
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+from src.lib.logging.logger import get_log_file_path
+from src.projects.hietaniemi_gym.utils.memory_report import current_rss_bytes, peak_rss_bytes
+
+# Only the standard library and memory_report are imported, so that instrumented modules
+# such as the NumPy-only linear predictor stay light.
+
+_MB = 1024 ** 2
+
+# tracemalloc.reset_peak was added in Python 3.9. Without it the peak of a stage is only
+# known if the stage sets a new overall peak, see stage.
+_CAN_RESET_PEAK = hasattr(tracemalloc, 'reset_peak')
+
+
+@dataclass
+class InstrumentationConfig():
+    metrics_path: Optional[str] = None
+    trace_allocations: bool = True
+
+
+class _Frame:
+    """
+    The measurements of one running stage.
+    """
+    __slots__ = ('name', 'input_rows', 'output_rows', 'traced_start', 'traced_peak', 'overall_peak_start')
+
+    def __init__(self, name: str, input_rows: Optional[int]):
+        self.name = name
+        self.input_rows = input_rows
+        self.output_rows = None
+        self.traced_start = 0
+        self.traced_peak = 0
+        self.overall_peak_start = 0
+
+
+class _InstrumentationState(threading.local):
+    def __init__(self):
+        self.stack: List[_Frame] = []
+
+
+_enabled = False
+_config = InstrumentationConfig()
+_records: List[dict] = []
+_lock = threading.Lock()
+_metrics_file = None
+_state = _InstrumentationState()
+
+
+def enable_instrumentation(config: Optional[InstrumentationConfig] = None) -> str:
+    """
+    Starts recording every instrumented stage.
+
+    Each finished stage is appended as one JSON line to config.metrics_path, which
+    defaults to a '.metrics.jsonl' file next to the current log file. With
+    trace_allocations the bytes allocated by a stage are measured with tracemalloc,
+    which slows down allocation-heavy code while instrumentation is on.
+
+    Returns:
+    str: The path of the metrics file.
+    """
+    global _enabled, _config, _metrics_file
+    disable_instrumentation(log_summary=False)
+    _config = config or InstrumentationConfig()
+    metrics_path = _config.metrics_path or _default_metrics_path()
+    os.makedirs(os.path.dirname(os.path.abspath(metrics_path)), exist_ok=True)
+    _metrics_file = open(metrics_path, 'a', buffering=1)
+    _records.clear()
+    if _config.trace_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+    logging.info(f"Instrumentation enabled, writing metrics to {metrics_path}")
+    return metrics_path
+
+
+def disable_instrumentation(log_summary: bool = True) -> None:
+    """
+    Stops recording, closes the metrics file and logs the summary of the run.
+    """
+    global _enabled, _metrics_file
+    if not _enabled:
+        return
+    _enabled = False
+    if _config.trace_allocations and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    with _lock:
+        _metrics_file.close()
+        _metrics_file = None
+    if log_summary:
+        logging.info("Instrumentation summary:\n" + format_summary())
+
+
+def instrumentation_enabled() -> bool:
+    return _enabled
+
+
+def instrument(name: Optional[str] = None) -> Callable:
+    """
+    Decorator that records a function as a stage while instrumentation is enabled.
+
+    The input rows are the length of the first DataFrame, Series or array argument and
+    the output rows the length of the returned one. While instrumentation is disabled
+    the only overhead is one flag check per call.
+    """
+    def decorator(func: Callable) -> Callable:
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with stage(stage_name, _row_count(*args, *kwargs.values())) as frame:
+                result = func(*args, **kwargs)
+                frame.output_rows = _row_count(*result) if isinstance(result, tuple) else _row_count(result)
+                return result
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def stage(name: str, input_rows: Optional[int] = None) -> Iterator[Optional[_Frame]]:
+    """
+    Records a block of code as a stage while instrumentation is enabled.
+
+    The yielded frame's output_rows can be set inside the block; it is None when
+    instrumentation is disabled. Stages may be nested, the allocation peak of an outer
+    stage includes those of its inner stages. The RSS high-water mark is only read, never
+    reset, so that it stays valid for the StageMemoryReport stages around the calls.
+
+    On Python 3.8 the traced peak cannot be reset. A stage that does not raise the
+    overall peak then reports the memory it still holds at its end, a lower bound of its
+    allocation peak.
+    """
+    if not _enabled:
+        yield None
+        return
+
+    frame = _Frame(name, input_rows)
+    stack = _state.stack
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        if _CAN_RESET_PEAK:
+            # Resetting the traced peak would hide the current peak from the enclosing stages
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            for outer in stack:
+                outer.traced_peak = max(outer.traced_peak, traced_peak)
+            tracemalloc.reset_peak()
+        frame.traced_start, frame.overall_peak_start = tracemalloc.get_traced_memory()
+    rss_before = current_rss_bytes()
+    stack.append(frame)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield frame
+    finally:
+        wall_seconds = time.perf_counter() - wall_start
+        cpu_seconds = time.process_time() - cpu_start
+        stack.pop()
+        allocated_bytes = None
+        if tracing and tracemalloc.is_tracing():
+            traced_current, traced_peak = tracemalloc.get_traced_memory()
+            if not _CAN_RESET_PEAK and traced_peak <= frame.overall_peak_start:
+                # The peak was reached before the stage started and says nothing about it
+                traced_peak = traced_current
+            frame.traced_peak = max(frame.traced_peak, traced_peak)
+            allocated_bytes = max(frame.traced_peak - frame.traced_start, 0)
+            for outer in stack:
+                outer.traced_peak = max(outer.traced_peak, frame.traced_peak)
+        _emit({
+            'time': datetime.now().isoformat(),
+            'pid': os.getpid(),
+            'stage': name,
+            'parent': stack[-1].name if stack else None,
+            'wall_seconds': wall_seconds,
+            'cpu_seconds': cpu_seconds,
+            'input_rows': frame.input_rows,
+            'output_rows': frame.output_rows,
+            'allocated_bytes': allocated_bytes,
+            'rss_before_mb': rss_before / _MB,
+            'rss_after_mb': current_rss_bytes() / _MB,
+            'peak_rss_mb': peak_rss_bytes() / _MB,
+        })
+
+
+def _emit(record: dict) -> None:
+    with _lock:
+        _records.append(record)
+        if _metrics_file is not None:
+            _metrics_file.write(json.dumps(record) + '\n')
+
+
+def _row_count(*values) -> Optional[int]:
+    for value in values:
+        shape = getattr(value, 'shape', None)
+        if shape:
+            return int(shape[0])
+    return None
+
+
+def _default_metrics_path() -> str:
+    log_file_path = get_log_file_path()
+    if log_file_path is not None:
+        return os.path.splitext(log_file_path)[0] + '.metrics.jsonl'
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.FileHandler):
+            return os.path.splitext(handler.baseFilename)[0] + '.metrics.jsonl'
+    return os.path.join('logs', datetime.now().strftime("metrics_%Y-%m-%d_%H-%M-%S.jsonl"))
+
+
+def summary() -> List[dict]:
+    """
+    Aggregates the recorded stages of this run by stage name, in order of first appearance.
+    """
+    stages = {}
+    with _lock:
+        records = list(_records)
+    for record in records:
+        entry = stages.setdefault(record['stage'], {
+            'stage': record['stage'], 'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+            'input_rows': 0, 'output_rows': 0, 'allocated_mb': 0.0, 'peak_rss_mb': 0.0,
+        })
+        entry['calls'] += 1
+        entry['wall_seconds'] += record['wall_seconds']
+        entry['cpu_seconds'] += record['cpu_seconds']
+        entry['input_rows'] += record['input_rows'] or 0
+        entry['output_rows'] += record['output_rows'] or 0
+        entry['allocated_mb'] = max(entry['allocated_mb'], (record['allocated_bytes'] or 0) / _MB)
+        entry['peak_rss_mb'] = max(entry['peak_rss_mb'], record['peak_rss_mb'])
+    return list(stages.values())
+
+
+def format_summary() -> str:
+    """
+    Formats summary() as a table. Allocated memory is the largest of any call and peak
+    memory the highest RSS high-water mark read at the end of a call.
+    """
+    lines = [f"{'stage':<44}{'calls':>6}{'wall s':>10}{'cpu s':>10}{'rows in':>12}{'rows out':>12}{'alloc MB':>10}{'peak MB':>10}"]
+    for entry in summary():
+        lines.append(f"{entry['stage']:<44}{entry['calls']:>6}{entry['wall_seconds']:>10.3f}{entry['cpu_seconds']:>10.3f}"
+                     f"{entry['input_rows']:>12}{entry['output_rows']:>12}{entry['allocated_mb']:>10.1f}{entry['peak_rss_mb']:>10.1f}")
+    return '\n'.join(lines)
@@ -0,0 +1,120 @@
+import sys
+import time
+import logging
+import resource
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+# /proc/self/status reports the peak resident set size as VmHWM, and writing '5' to
+# /proc/self/clear_refs resets it, which gives a peak per stage on Linux. Elsewhere only
+# the peak of the whole process is available.
+_PROC_STATUS = '/proc/self/status'
+_PROC_CLEAR_REFS = '/proc/self/clear_refs'
+
+_MB = 1024 ** 2
+
+
+@dataclass
+class MemoryBudgetConfig():
+    max_peak_rss_mb: Optional[float] = None
+
+
+def current_rss_bytes() -> int:
+    """
+    Returns the current resident set size of the process in bytes.
+    """
+    rss = _read_proc_status('VmRSS')
+    return rss if rss is not None else peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    """
+    Returns the peak resident set size since the last reset_peak_rss in bytes.
+    """
+    peak = _read_proc_status('VmHWM')
+    if peak is not None:
+        return peak
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak resident set size to the current one. Returns False if the platform does not support it.
+    """
+    try:
+        with open(_PROC_CLEAR_REFS, 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _read_proc_status(field: str) -> Optional[int]:
+    try:
+        with open(_PROC_STATUS) as file:
+            for line in file:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class StageMemoryReport:
+    """
+    Records the duration and the resident memory of the process around each pipeline stage.
+
+    Every stage records its wall time, the RSS before and after it and its peak RSS. Stages above
+    config.max_peak_rss_mb are logged as warnings. Without a resettable peak counter
+    (outside Linux), the peak of a stage is the peak of the process so far.
+    """
+    def __init__(self, config: Optional[MemoryBudgetConfig] = None):
+        self.max_peak_rss_mb = (config or MemoryBudgetConfig()).max_peak_rss_mb
+        self.stages: List[dict] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        rss_before = current_rss_bytes()
+        per_stage_peak = reset_peak_rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = peak_rss_bytes()
+            record = {
+                'stage': name,
+                'seconds': seconds,
+                'rss_before_mb': rss_before / _MB,
+                'rss_after_mb': current_rss_bytes() / _MB,
+                'peak_rss_mb': peak / _MB,
+                'per_stage_peak': per_stage_peak,
+                'within_budget': self.max_peak_rss_mb is None or peak / _MB <= self.max_peak_rss_mb,
+            }
+            self.stages.append(record)
+            if not record['within_budget']:
+                logging.warning(f"Stage {name} peaked at {record['peak_rss_mb']:.1f} MB, "
+                                f"above the budget of {self.max_peak_rss_mb:.1f} MB")
+
+    @property
+    def peak_rss_mb(self) -> Optional[float]:
+        return max((record['peak_rss_mb'] for record in self.stages), default=None)
+
+    @property
+    def within_budget(self) -> bool:
+        return all(record['within_budget'] for record in self.stages)
+
+    def format(self) -> str:
+        lines = [f"{'stage':<24}{'seconds':>10}{'before MB':>12}{'after MB':>12}{'peak MB':>12}"]
+        for record in self.stages:
+            lines.append(f"{record['stage']:<24}{record['seconds']:>10.3f}{record['rss_before_mb']:>12.1f}"
+                         f"{record['rss_after_mb']:>12.1f}{record['peak_rss_mb']:>12.1f}")
+        budget = 'none' if self.max_peak_rss_mb is None else f"{self.max_peak_rss_mb:.1f} MB"
+        lines.append(f"budget: {budget}, within budget: {self.within_budget}")
+        return '\n'.join(lines)
+
+    def log(self) -> None:
+        logging.info("Time and peak memory per stage:\n" + self.format())
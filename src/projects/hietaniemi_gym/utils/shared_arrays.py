@@ -0,0 +1,80 @@
+import logging
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Tuple
+import numpy as np
+
+# Blocks attached in this process, kept open for as long as their views are in use.
+_attached: Dict[str, SharedMemory] = {}
+
+
+@dataclass(frozen=True)
+class SharedArrayHandle():
+    """
+    Picklable reference to an array published in shared memory by SharedArrays.
+    """
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+class SharedArrays:
+    """
+    Publishes NumPy arrays in shared memory for the workers of a process pool.
+
+    Every array is copied once into its own shared memory block. The handles returned on
+    entering are small and picklable, so they can be passed to workers, which map the
+    same memory with attach_shared_arrays instead of receiving a copy of the data. The
+    blocks are released on exit, so workers must be done by then.
+    """
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        self._blocks = []
+
+    def __enter__(self) -> Dict[str, SharedArrayHandle]:
+        handles = {}
+        try:
+            for key, array in self.arrays.items():
+                array = np.ascontiguousarray(array)
+                block = SharedMemory(create=True, size=max(array.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+                handles[key] = SharedArrayHandle(block.name, array.shape, array.dtype.str)
+        except Exception:
+            self._release()
+            raise
+        logging.info(f"Published {len(handles)} arrays in shared memory ({sum(block.size for block in self._blocks) / 1024 ** 2:.1f} MB)")
+        return handles
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._release()
+
+    def _release(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def attach_shared_arrays(handles: Dict[str, SharedArrayHandle]) -> Dict[str, np.ndarray]:
+    """
+    Maps arrays published by SharedArrays into this process as read-only views.
+
+    Parameters:
+    handles (dict): The handles returned by SharedArrays, by key.
+
+    Returns:
+    dict: The read-only arrays by key.
+    """
+    arrays = {}
+    for key, handle in handles.items():
+        block = _attached.get(handle.name)
+        if block is None:
+            # Pool workers share the resource tracker of the publishing process, which
+            # unlinks the block when SharedArrays exits
+            block = SharedMemory(name=handle.name)
+            _attached[handle.name] = block
+        array = np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[key] = array
+    return arrays
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+import pandas as pd
+from src.projects.hietaniemi_gym.utils.file_manager import save_dataframe, load_dataframe
+
+# STAGE_CACHE_META_NAME: The name of the metadata file kept in every cache entry. Its
+# modification time doubles as the last access time for LRU eviction.
+STAGE_CACHE_META_NAME = 'meta.json'
+
+
+@dataclass
+class StageCacheConfig():
+    cache_dir: str = "./artifacts/hietaniemi_gym/0.0.1/cache"
+    max_bytes: int = 1024 ** 3
+
+
+def hash_file(file_path: str, block_size: int = 1024 ** 2) -> str:
+    """
+    Computes the BLAKE2b digest of a file's content, reading it in fixed-size blocks.
+
+    Parameters:
+    file_path (str): The path of the file to hash.
+    block_size (int): The number of bytes read at a time.
+
+    Returns:
+    str: The hex digest of the file content.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def path_id(file_path: str) -> str:
+    """
+    Returns a short id of the absolute path of a file, for naming artifacts derived from it.
+
+    Files with the same name in different directories, such as the per-gym sources of a
+    multi-gym manifest, get different ids.
+    """
+    absolute_path = os.path.normcase(os.path.abspath(file_path))
+    return hashlib.blake2b(absolute_path.encode(), digest_size=8).hexdigest()
+
+
+class StageCache:
+    """
+    Content-addressed on-disk cache for DataFrames produced by pipeline stages.
+
+    Entries are keyed by the content of the input files, the stage parameters and the
+    stage version, so a changed input or a bumped version never returns stale data.
+    The cache is bounded by config.max_bytes; the least recently used entries are
+    evicted first.
+    """
+    def __init__(self, config: StageCacheConfig):
+        self.cache_dir = config.cache_dir
+        self.max_bytes = config.max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, stage_name: str, input_paths: List[str], params: Dict[str, Any], version: int) -> str:
+        """
+        Builds the cache key of a stage from its inputs, parameters and version.
+        """
+        payload = {
+            'stage': stage_name,
+            'version': version,
+            'inputs': [hash_file(path) for path in input_paths],
+            'params': params,
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return f"{stage_name}-{hashlib.blake2b(encoded, digest_size=16).hexdigest()}"
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """
+        Returns the cached DataFrame for key, or None on a miss.
+        """
+        entry_path = os.path.join(self.cache_dir, key)
+        meta_path = os.path.join(entry_path, STAGE_CACHE_META_NAME)
+        if not os.path.isfile(meta_path):
+            logging.info(f"Stage cache miss for {key}")
+            return None
+        try:
+            df = load_dataframe(entry_path)
+            os.utime(meta_path)
+            logging.info(f"Stage cache hit for {key}")
+            return df
+        except Exception as e:
+            # A damaged entry is treated as a miss and dropped
+            logging.warning(f"Discarding unreadable stage cache entry {key}: {e}")
+            shutil.rmtree(entry_path, ignore_errors=True)
+            return None
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        """
+        Stores df under key and evicts least recently used entries above the size limit.
+        """
+        entry_path = os.path.join(self.cache_dir, key)
+        try:
+            os.makedirs(entry_path, exist_ok=True)
+            save_dataframe(df, entry_path)
+            # The metadata file is written last, it marks the entry as complete
+            with open(os.path.join(entry_path, STAGE_CACHE_META_NAME), 'w') as file:
+                json.dump({'key': key, 'created': time.time(), 'rows': len(df)}, file)
+            logging.info(f"Stage cache entry {key} stored")
+        except Exception as e:
+            logging.error(f"Could not store stage cache entry {key}: {e}")
+            shutil.rmtree(entry_path, ignore_errors=True)
+            raise
+        self.evict()
+
+    def get_or_compute(self, stage_name: str, input_paths: List[str], params: Dict[str, Any], version: int,
+                       compute: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Returns the cached result of a stage, computing and storing it on a miss.
+        """
+        key = self.make_key(stage_name, input_paths, params, version)
+        df = self.get(key)
+        if df is None:
+            df = compute()
+            self.put(key, df)
+        return df
+
+    def evict(self) -> None:
+        """
+        Removes least recently used entries until the cache fits into max_bytes.
+
+        Entries left without a metadata file by an interrupted put count towards the limit
+        too and are evicted by the time they were last written, so they cannot pile up
+        outside of it.
+        """
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry_path = os.path.join(self.cache_dir, key)
+            meta_path = os.path.join(entry_path, STAGE_CACHE_META_NAME)
+            if os.path.isfile(meta_path):
+                entries.append((os.path.getmtime(meta_path), _dir_size(entry_path), entry_path))
+            elif _is_partial_entry(entry_path):
+                entries.append((os.path.getmtime(entry_path), _dir_size(entry_path), entry_path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total_bytes -= size
+            logging.info(f"Evicted stage cache entry {entry_path}")
+
+
+def _is_partial_entry(entry_path: str) -> bool:
+    """
+    Checks whether a directory without a metadata file was left behind by StageCache.put.
+
+    put creates the entry directory and then writes the dataset through a temporary
+    directory, so a partial entry holds nothing else. Other directories below the cache
+    directory, e.g. the scenario tables, are left alone, even when they are empty.
+    """
+    if not os.path.isdir(entry_path):
+        return False
+    names = set(os.listdir(entry_path))
+    return bool(names) and names <= {'data', 'data.tmp'}
+
+
+def _dir_size(dir_path: str) -> int:
+    """
+    Returns the total size in bytes of all files below dir_path.
+    """
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(dir_path)
+        for name in names
+    )
@@ -0,0 +1,253 @@
+import os
+import json
+import shutil
+import logging
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Tuple
+from src.projects.hietaniemi_gym.utils.file_manager import COLUMNAR_MANIFEST_NAME
+from src.projects.hietaniemi_gym.utils.instrumentation import instrument
+from src.projects.hietaniemi_gym.utils.stage_cache import path_id
+
+# TIME_SERIES_STORE_VERSION: Version of the store layout, bumped on incompatible changes.
+TIME_SERIES_STORE_VERSION = 1
+
+# TimeRange: A half-open [start, end) interval of anything pd.Timestamp accepts. Either
+# end may be None for an open interval, naive times are read as UTC.
+TimeRange = Tuple[Optional[object], Optional[object]]
+
+
+def get_store_dir(base_path="./artifacts/hietaniemi_gym/0.0.1/data", dir_name="store"):
+    """
+    Returns the directory that holds the time-series stores of all ingested sources.
+    """
+    store_dir = os.path.join(base_path, dir_name)
+    os.makedirs(store_dir, exist_ok=True)
+    return store_dir
+
+
+def get_store_path(source_path: str, store_dir: str) -> str:
+    """
+    Returns the path of the store ingested from source_path.
+
+    The store is named after the source file and the id of its absolute path, see
+    stage_cache.path_id, so sources with the same file name in different directories,
+    such as the gyms of a multi-gym manifest, get separate stores.
+    """
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(store_dir, f'{name}-{path_id(source_path)}')
+
+
+@instrument()
+def write_time_series_store(df: pd.DataFrame, store_path: str, time_col: str, source_path: Optional[str] = None) -> dict:
+    """
+    Write a DataFrame as a memory-mappable time-series store.
+
+    Rows are sorted by time and split into monthly partitions. Every partition is a
+    directory of flat .npy arrays, one per column, that share the partition's sorted
+    int64 time index of UTC epoch nanoseconds. A manifest records the columns, their
+    dtypes and the time span of every partition, so readers can pick the partitions
+    of a time range without opening any others. Rows with missing times are dropped.
+
+    The store is written next to store_path and swapped in when complete, so readers
+    never see a partial write.
+
+    Parameters:
+    df (pd.DataFrame): The data with a time column and numeric value columns.
+    store_path (str): The directory of the store.
+    time_col (str): The name of the column that contains time data.
+    source_path (str): The file the data was read from. Its absolute path, size and
+        modification time are recorded, see is_store_current.
+
+    Returns:
+    dict: The manifest of the store.
+    """
+    tmp_path = store_path + '.tmp'
+    try:
+        times = df[time_col]
+        if isinstance(times.dtype, pd.DatetimeTZDtype):
+            times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+        times = times.to_numpy(dtype='datetime64[ns]')
+        valid = ~np.isnat(times)
+        if not valid.all():
+            logging.warning(f"Dropping {(~valid).sum()} rows without a time from {store_path}")
+
+        # A stable sort keeps rows with equal times in their original order
+        order = np.flatnonzero(valid)
+        order = order[np.argsort(times[order], kind='stable')]
+        times = times[order].view(np.int64)
+
+        value_columns = [column for column in df.columns if column != time_col]
+        values = {column: df[column].to_numpy()[order] for column in value_columns}
+        for column, column_values in values.items():
+            if column_values.dtype.kind not in 'biuf':
+                raise TypeError(f"Column {column} with dtype {column_values.dtype} cannot be stored in a time-series store")
+
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+
+        manifest = {
+            'format_version': TIME_SERIES_STORE_VERSION,
+            'time_col': time_col,
+            'columns': [
+                {'name': column, 'dtype': 'int64' if column == time_col else str(values[column].dtype), 'file': f'{position:04d}.npy'}
+                for position, column in enumerate(df.columns)
+            ],
+            'num_rows': len(times),
+            'partitions': [],
+            'source': _source_stat(source_path) if source_path is not None else None,
+        }
+
+        months = times.view('datetime64[ns]').astype('datetime64[M]')
+        bounds = np.concatenate([[0], np.flatnonzero(months[1:] != months[:-1]) + 1, [len(times)]]) if len(times) else [0]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            partition = {'name': str(months[start]), 'rows': int(end - start), 'first': int(times[start]), 'last': int(times[end - 1])}
+            os.makedirs(os.path.join(tmp_path, partition['name']))
+            for spec in manifest['columns']:
+                column_values = times if spec['name'] == time_col else values[spec['name']]
+                np.save(os.path.join(tmp_path, partition['name'], spec['file']), column_values[start:end], allow_pickle=False)
+            manifest['partitions'].append(partition)
+
+        with open(os.path.join(tmp_path, COLUMNAR_MANIFEST_NAME), 'w') as file:
+            json.dump(manifest, file, indent=2)
+
+        if os.path.exists(store_path):
+            shutil.rmtree(store_path)
+        os.rename(tmp_path, store_path)
+        logging.info(f"Wrote {len(times)} rows in {len(manifest['partitions'])} monthly partitions to {store_path}")
+        return manifest
+
+    except OSError as e:
+        logging.error(f"Could not write time-series store to {store_path}: {e}")
+        raise
+    except Exception as e:
+        logging.error(f"Could not save DataFrame to {store_path}: {e}")
+        raise
+
+
+def read_store_manifest(store_path: str) -> dict:
+    """
+    Read the manifest of a store written by write_time_series_store.
+    """
+    with open(os.path.join(store_path, COLUMNAR_MANIFEST_NAME)) as file:
+        manifest = json.load(file)
+    if manifest['format_version'] != TIME_SERIES_STORE_VERSION:
+        raise ValueError(f"Unsupported time-series store version {manifest['format_version']}")
+    return manifest
+
+
+def is_store_current(store_path: str, source_path: str) -> bool:
+    """
+    Checks whether a store exists, was ingested from source_path and the file has not
+    changed since.
+
+    Only the path, size and modification time of the source are compared, so the check
+    does not read the source.
+    """
+    try:
+        manifest = read_store_manifest(store_path)
+    except FileNotFoundError:
+        return False
+    return manifest['source'] is not None and os.path.exists(source_path) and manifest['source'] == _source_stat(source_path)
+
+
+@instrument()
+def load_time_series_store(store_path: str, time_range: Optional[TimeRange] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Load the rows of a store in a time range.
+
+    Only the partitions that overlap the range are opened. Their arrays are memory-mapped
+    and the rows in range are found by binary search on the time index, so only those
+    rows are read from disk and the cost of loading a short range does not depend on the
+    length of the history.
+
+    Parameters:
+    store_path (str): The directory of the store.
+    time_range (TimeRange): The half-open [start, end) range of rows to load. Defaults
+        to all rows.
+    columns (list): The columns to load, in the requested order. Defaults to all columns.
+
+    Returns:
+    pd.DataFrame: The rows in time order, with the time column as UTC timestamps.
+
+    Raises:
+    FileNotFoundError: If the store does not exist.
+    KeyError: If a requested column is not in the store.
+    """
+    try:
+        manifest = read_store_manifest(store_path)
+        time_col = manifest['time_col']
+        specs = {spec['name']: spec for spec in manifest['columns']}
+        if columns is None:
+            columns = [spec['name'] for spec in manifest['columns']]
+        missing_columns = [column for column in columns if column not in specs]
+        if missing_columns:
+            raise KeyError(f"Columns not found in store: {missing_columns}")
+
+        start, end = time_range_bounds(time_range)
+        parts = {column: [] for column in columns}
+        partitions = [partition for partition in manifest['partitions'] if partition['last'] >= start and partition['first'] < end]
+        for partition in partitions:
+            partition_path = os.path.join(store_path, partition['name'])
+            times = np.load(os.path.join(partition_path, specs[time_col]['file']), mmap_mode='r', allow_pickle=False)
+            low = 0 if start <= partition['first'] else np.searchsorted(times, start, side='left')
+            high = partition['rows'] if end > partition['last'] else np.searchsorted(times, end, side='left')
+            for column in columns:
+                column_values = times if column == time_col else np.load(os.path.join(partition_path, specs[column]['file']), mmap_mode='r', allow_pickle=False)
+                parts[column].append(column_values[low:high])
+
+        data = {}
+        for column in columns:
+            # Concatenating copies only the rows in range out of the mappings
+            values = np.concatenate(parts[column]) if parts[column] else np.empty(0, dtype=specs[column]['dtype'])
+            if column == time_col:
+                values = pd.DatetimeIndex(values.view('datetime64[ns]')).tz_localize('UTC')
+            data[column] = values
+
+        df = pd.DataFrame(data, columns=columns)
+        logging.info(f"Loaded {len(df)} rows from {len(partitions)} of {len(manifest['partitions'])} partitions of {store_path}")
+        return df
+
+    except FileNotFoundError as e:
+        logging.error(f"The time-series store {store_path} does not exist: {e}")
+        raise
+    except Exception as e:
+        logging.error(f"Could not load time-series store {store_path}: {e}")
+        raise
+
+
+def time_range_bounds(time_range: Optional[TimeRange]) -> Tuple[int, int]:
+    """
+    Converts a time range to half-open bounds in UTC epoch nanoseconds.
+    """
+    start, end = time_range if time_range is not None else (None, None)
+    return (
+        np.iinfo(np.int64).min if start is None else _utc_timestamp(start).value,
+        np.iinfo(np.int64).max if end is None else _utc_timestamp(end).value,
+    )
+
+
+def select_time_range(df: pd.DataFrame, time_col: str, time_range: Optional[TimeRange]) -> pd.DataFrame:
+    """
+    Selects the rows of df in a time range, with the same bounds as load_time_series_store.
+    """
+    if time_range is None:
+        return df
+    start, end = time_range
+    in_range = pd.Series(True, index=df.index)
+    if start is not None:
+        in_range &= df[time_col] >= _utc_timestamp(start)
+    if end is not None:
+        in_range &= df[time_col] < _utc_timestamp(end)
+    return df[in_range].reset_index(drop=True)
+
+
+def _utc_timestamp(value) -> pd.Timestamp:
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize('UTC') if timestamp.tz is None else timestamp.tz_convert('UTC')
+
+
+def _source_stat(source_path: str) -> dict:
+    stat = os.stat(source_path)
+    return {'path': os.path.abspath(source_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
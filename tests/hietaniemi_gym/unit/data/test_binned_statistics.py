@@ -0,0 +1,56 @@
+import pandas as pd
+import numpy as np
+import pytest
+from src.projects.hietaniemi_gym.data.data_analysis.data_statistics.binned_statistics import (
+    BinSpec,
+    BinnedStatistics,
+    compute_binned_statistics
+)
+
+@pytest.fixture
+def merged_df():
+    rng = np.random.default_rng(0)
+    temperature = rng.normal(5, 8, 1000)
+    temperature[::97] = np.nan
+    sum_minutes = rng.integers(0, 300, 1000).astype(float)
+    sum_minutes[::89] = np.nan
+    return pd.DataFrame({
+        'Temperature (degC)': temperature,
+        'Precipitation (mm)': rng.exponential(0.5, 1000),
+        'sum_minutes': sum_minutes,
+    })
+
+@pytest.mark.parametrize("x_col", ['Temperature (degC)', 'Precipitation (mm)'])
+def test_matches_pandas_groupby(merged_df, x_col):
+    stats = compute_binned_statistics(merged_df, [BinSpec(x_col, 'sum_minutes', 20)])[BinSpec(x_col, 'sum_minutes', 20)]
+
+    edges = np.linspace(merged_df[x_col].min(), merged_df[x_col].max(), 21)
+    grouped = merged_df.groupby(pd.cut(merged_df[x_col], bins=edges, include_lowest=True), observed=False)['sum_minutes']
+    np.testing.assert_array_equal(stats.count, grouped.count().to_numpy())
+    np.testing.assert_allclose(stats.mean, grouped.mean().to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(stats.std, grouped.std().to_numpy(), rtol=1e-9)
+
+def test_keeps_top_and_bottom_bins(merged_df):
+    stats = BinnedStatistics(merged_df).get('Temperature (degC)', 'sum_minutes', 20)
+    assert len(stats.count) == 20
+    both_valid = merged_df[['Temperature (degC)', 'sum_minutes']].notna().all(axis=1)
+    assert stats.count.sum() == both_valid.sum()
+
+def test_results_are_memoized(merged_df):
+    binned_statistics = BinnedStatistics(merged_df)
+    first, second = binned_statistics.compute([
+        BinSpec('Temperature (degC)', 'sum_minutes', 20),
+        BinSpec('Precipitation (mm)', 'sum_minutes', 20),
+    ])
+    assert binned_statistics.get('Temperature (degC)', 'sum_minutes', 20) is first
+    assert binned_statistics.get('Precipitation (mm)', 'sum_minutes', 20) is second
+
+    with pytest.raises(ValueError):
+        binned_statistics.get('Temperature (degC)', 'sum_minutes', 0)
+
+def test_std_is_exact_for_large_offsets():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'x': rng.uniform(0, 1, 1000), 'y': 1e9 + rng.normal(0, 1e-3, 1000)})
+    stats = compute_binned_statistics(df, [BinSpec('x', 'y', 4)])[BinSpec('x', 'y', 4)]
+    expected = df.groupby(pd.cut(df['x'], stats.edges, include_lowest=True), observed=False)['y'].std()
+    np.testing.assert_allclose(stats.std, expected.to_numpy(), rtol=1e-4)
@@ -0,0 +1,45 @@
+import datetime
+import pandas as pd
+import pytest
+from src.projects.hietaniemi_gym.data.data_processing.calendar_features import (
+    add_calendar_features,
+    finnish_holidays,
+    CALENDAR_FEATURES
+)
+
+@pytest.fixture
+def time_df():
+    times = pd.date_range('2019-12-30', '2021-01-03', freq='h', tz='UTC')
+    return pd.DataFrame({'time': times[::7]})
+
+def test_matches_datetime_accessors(time_df):
+    df = add_calendar_features(time_df.copy(), 'time', ['hour', 'weekday', 'is_weekend', 'month', 'day_of_year'])
+    times = time_df['time'].dt
+    assert df['hour'].tolist() == times.hour.tolist()
+    assert df['weekday'].tolist() == times.weekday.tolist()
+    assert df['is_weekend'].tolist() == (times.weekday >= 5).astype(int).tolist()
+    assert df['month'].tolist() == times.month.tolist()
+    assert df['day_of_year'].tolist() == times.dayofyear.tolist()
+    for feature in ['hour', 'weekday', 'is_weekend', 'month', 'day_of_year']:
+        assert df[feature].dtype == CALENDAR_FEATURES[feature]
+
+def test_sparse_times_and_strings():
+    df = pd.DataFrame({'time': ['2020-04-24 23:10:00+00:00', '2000-01-01 00:00:00+00:00', '2020-04-24 23:50:00+00:00']})
+    df = add_calendar_features(df, 'time', ['weekday', 'hour'])
+    assert df['weekday'].tolist() == [4, 5, 4]
+    assert df['hour'].tolist() == [23, 0, 23]
+
+def test_holidays_in_local_time():
+    assert datetime.date(2024, 6, 21) in finnish_holidays([2024])  # Midsummer Eve
+    assert datetime.date(2024, 3, 29) in finnish_holidays([2024])  # Good Friday
+
+    # 22:00 UTC on 5 December is already Independence Day in Helsinki
+    df = pd.DataFrame({'time': pd.to_datetime(['2020-12-05 21:00', '2020-12-05 22:00'], utc=True)})
+    assert add_calendar_features(df.copy(), 'time', ['is_holiday'])['is_holiday'].tolist() == [0, 0]
+    assert add_calendar_features(df.copy(), 'time', ['is_holiday'], tz='Europe/Helsinki')['is_holiday'].tolist() == [0, 1]
+
+def test_rejects_unknown_features_and_missing_times(time_df):
+    with pytest.raises(ValueError):
+        add_calendar_features(time_df.copy(), 'time', ['week'])
+    with pytest.raises(ValueError):
+        add_calendar_features(pd.DataFrame({'time': pd.to_datetime(['2020-01-01', None], utc=True)}))
@@ -0,0 +1,110 @@
+import pandas as pd
+import os
+from dotenv import load_dotenv
+import pytest
+from src.projects.hietaniemi_gym.data.data_processing.data_loader import (
+    load_gym_data,
+    load_gym_data_hourly,
+    load_weather_data,
+    weather_timestamps,
+    _weather_timestamps_str
+)
+from src.projects.hietaniemi_gym.data.data_processing.data_clean import data_clean_na
+from src.projects.hietaniemi_gym.data.data_processing.data_schema import read_gym_csv, read_weather_csv
+from src.projects.hietaniemi_gym.data.data_processing.data_transformation import aggregate_hourly_usage
+from src.projects.hietaniemi_gym.data.data_consts import TIME_COL_NAME
+
+@pytest.fixture(scope="module", autouse=True)
+def load_env():
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+@pytest.fixture(scope="module")
+def gym_data_path():
+    return os.getenv('GYM_DATA_PATH')
+
+@pytest.fixture(scope="module")
+def weather_data_path():
+    return os.getenv('WEATHER_DATA_PATH')
+
+@pytest.mark.parametrize("chunksize", [1000, 100000])
+def test_streaming_matches_full_load(gym_data_path, chunksize):
+    expected = aggregate_hourly_usage(data_clean_na(load_gym_data(gym_data_path)), TIME_COL_NAME)
+    streamed = load_gym_data_hourly(gym_data_path, chunksize=chunksize)
+    pd.testing.assert_frame_equal(streamed, expected, check_exact=True)
+
+def test_streaming_hours_spanning_chunks(tmp_path):
+    csv_path = tmp_path / "gym.csv"
+    csv_path.write_text(
+        "time,19,20\n"
+        "2020-04-24 00:00:00+00:00,1,2\n"
+        "2020-04-24 00:10:00+00:00,3,\n"
+        "2020-04-24 00:20:00+00:00,5,6\n"
+        "2020-04-24 00:50:00+00:00,7,8\n"
+        "2020-04-24 03:00:00+00:00,1,1\n"
+    )
+    expected = aggregate_hourly_usage(data_clean_na(load_gym_data(str(csv_path))), TIME_COL_NAME)
+    streamed = load_gym_data_hourly(str(csv_path), chunksize=2)
+    pd.testing.assert_frame_equal(streamed, expected, check_exact=True)
+    assert streamed['19'].tolist() == [13, 0, 0, 1]
+
+def test_compact_dtypes(gym_data_path, weather_data_path):
+    gym_df = load_gym_data(gym_data_path)
+    assert str(gym_df[TIME_COL_NAME].dtype) == 'datetime64[ns, UTC]'
+    assert (gym_df.drop(columns=TIME_COL_NAME).dtypes == 'uint8').all()
+    # An hour has at most 6 counters of at most 10 minutes
+    gym_hourly_df = aggregate_hourly_usage(gym_df, TIME_COL_NAME)
+    assert (gym_hourly_df.drop(columns=TIME_COL_NAME).dtypes == 'uint8').all()
+    weather_df = load_weather_data(weather_data_path)
+    assert (weather_df.drop(columns='time').dtypes == 'float32').all()
+
+def test_counters_are_widened_instead_of_wrapped(tmp_path):
+    csv_path = tmp_path / "gym.csv"
+    csv_path.write_text(
+        "time,19,20\n"
+        "2020-04-24 00:00:00+00:00,200,-1\n"
+        "2020-04-24 00:10:00+00:00,300,2\n"
+    )
+    gym_df = read_gym_csv(str(csv_path))
+    assert gym_df['19'].dtype == 'uint16' and gym_df['19'].tolist() == [200, 300]
+    assert gym_df['20'].dtype == 'int8' and gym_df['20'].tolist() == [-1, 2]
+    gym_hourly_df = aggregate_hourly_usage(gym_df, TIME_COL_NAME)
+    assert gym_hourly_df['19'].dtype == 'uint16' and gym_hourly_df['19'].tolist() == [500]
+
+    # Values beyond int16 are neither wrapped around nor truncated
+    csv_path.write_text("time,19\n2020-04-24 00:00:00+00:00,70000\n")
+    assert read_gym_csv(str(csv_path))['19'].tolist() == [70000]
+    assert load_gym_data_hourly(str(csv_path))['19'].tolist() == [70000]
+
+def test_weather_timestamps_match_string_parser(weather_data_path):
+    raw_weather_df = read_weather_csv(weather_data_path)
+    raw_weather_df['Hour'] = raw_weather_df['Hour'] + ':00'
+    weather_df = load_weather_data(weather_data_path)
+    assert list(weather_df.columns) == ['Precipitation (mm)', 'Snow depth (cm)', 'Temperature (degC)', 'time']
+    pd.testing.assert_series_equal(weather_df['time'], _weather_timestamps_str(raw_weather_df), check_exact=True, check_names=False)
+
+def test_weather_timestamps_fall_back_for_malformed_rows():
+    weather_df = pd.DataFrame({
+        'Year': [2020, 2020, 2020, 2021],
+        'Month': [2, 4, 4, 1],
+        'Day': [29, 24, 24, 1],
+        'Hour': ['23:00:00', '7:00:00', '01:00:00', '00:00:00'],
+    })
+    pd.testing.assert_series_equal(weather_timestamps(weather_df), _weather_timestamps_str(weather_df), check_exact=True)
+
+    weather_df.loc[0, 'Year'] = 2021
+    with pytest.raises(ValueError):
+        weather_timestamps(weather_df)
+
+def test_cleaning_and_aggregation_leave_the_input_unchanged(gym_data_path):
+    gym_df = load_gym_data(gym_data_path)
+    original = gym_df.copy()
+    expected = aggregate_hourly_usage(data_clean_na(gym_df), TIME_COL_NAME)
+    pd.testing.assert_frame_equal(gym_df, original, check_exact=True)
+
+    # Owning callers skip the copies and get the same result
+    owned = data_clean_na(original, copy=False)
+    assert owned is original or len(owned) < len(original)
+    pd.testing.assert_frame_equal(aggregate_hourly_usage(owned, TIME_COL_NAME, copy=False), expected, check_exact=True)
@@ -1,35 +1,89 @@
 import pandas as pd
+import numpy as np
 import os
 from dotenv import load_dotenv
-from src.projects.hietaniemi_gym.data.data_processing.data_loader import load_gym_data
+from src.projects.hietaniemi_gym.data.data_processing.data_quality import (
+    DataQualityRules,
+    data_quality_report,
+    nan_runs,
+    profile_data_quality
+)
+from src.projects.hietaniemi_gym.utils.file_manager import get_data_dir
 import pytest
 from src.projects.hietaniemi_gym.data.data_consts import DEVICE_COLUMNS, TIME_COL_NAME
 @pytest.fixture(scope="module")
-def hietaniemi_gym_data_df():
+def hietaniemi_gym_data_report():
     # load env
     app_env = 'development'
     env_file = f"config/.env.{app_env}"
     load_dotenv(dotenv_path=env_file)
 
-    # get data path
+    # get data path, the report is cached next to the dataset by the pipelines
     gym_data_path = os.getenv('GYM_DATA_PATH')
-    return load_gym_data(gym_data_path)
+    return data_quality_report(gym_data_path, get_data_dir(dir_name='dataset'))
 
-def test_row_count(hietaniemi_gym_data_df):
-    row_count = len(hietaniemi_gym_data_df)
+def test_row_count(hietaniemi_gym_data_report):
+    row_count = hietaniemi_gym_data_report.rows
     assert row_count > 50000, f"The dataset should have more than 50,000 rows, but has {row_count}."
 
-def test_date_range(hietaniemi_gym_data_df):
-    time_data = pd.to_datetime(hietaniemi_gym_data_df[TIME_COL_NAME])
-    min_date = time_data.min()
-    max_date = time_data.max()
+def test_date_range(hietaniemi_gym_data_report):
+    min_date = pd.Timestamp(hietaniemi_gym_data_report.min_time)
+    max_date = pd.Timestamp(hietaniemi_gym_data_report.max_time)
+    assert hietaniemi_gym_data_report.invalid_times == 0, "All timestamps should be valid."
     assert min_date >= pd.Timestamp('2020-04-24', tz='UTC'), f"The dataset should have records from 2020-04-24, but starts from {min_date}."
     assert max_date < pd.Timestamp('2021-05-12', tz='UTC'), f"The dataset should have records up to 2021-05-11, but goes until {max_date}."
 
 
-def test_positive_values(hietaniemi_gym_data_df):
-    numeric_cols = hietaniemi_gym_data_df.select_dtypes(include=['number']).columns
-    assert (hietaniemi_gym_data_df[numeric_cols] >= 0).all().all(), "All values in the numerical columns should be positive."
+def test_positive_values(hietaniemi_gym_data_report):
+    columns = hietaniemi_gym_data_report.columns
+    assert all(columns[column]['negative_count'] == 0 for column in DEVICE_COLUMNS), "All values in the numerical columns should be positive."
 
+def test_nan_runs():
+    mask = np.array([[1, 0], [1, 0], [0, 1], [1, 1], [1, 1], [1, 0]], dtype=bool)
+    counts, longest = nan_runs(mask)
+    assert counts.tolist() == [5, 3]
+    assert longest.tolist() == [3, 3]
+    assert nan_runs(np.zeros(0, dtype=bool))[1].tolist() == [0]
 
+def test_profile_data_quality():
+    times = pd.date_range('2020-04-24', periods=8, freq='10min', tz='UTC').astype(str).tolist()
+    # One duplicate, a gap of three missing rows and an unparseable timestamp
+    times = times[:3] + [times[2]] + times[6:] + ['not a time', times[7]]
+    df = pd.DataFrame({
+        TIME_COL_NAME: times,
+        '19': [2, np.nan, np.nan, 3, -1, 4, 2, 2],
+        '20': [2, 2, 2, 2, 2, 2, np.nan, 2],
+    })
+    report = profile_data_quality(df, rules=DataQualityRules(cadence='10min', min_time='2020-04-24 00:10:00+00:00'))
 
+    assert report.rows == 8
+    assert (report.invalid_times, report.out_of_range_times, report.duplicate_times) == (1, 1, 2)
+    assert report.min_time == '2020-04-24T00:00:00+00:00'
+    assert (report.gaps, report.missing_slots, report.longest_gap_seconds) == (1, 3, 4 * 600)
+    assert report.columns['19'] == {'nan_count': 2, 'longest_nan_run': 2, 'negative_count': 1}
+    assert report.columns['20']['longest_nan_run'] == 1
+    assert len(report.issues()) == 7
+
+def test_report_is_cached_with_the_source_hash(tmp_path):
+    source = tmp_path / 'gym.csv'
+    source.write_text("time,19\n2020-04-24 00:00:00+00:00,2\n2020-04-24 00:10:00+00:00,3\n")
+    first = data_quality_report(str(source), str(tmp_path))
+    assert len(list(tmp_path.glob('gym.csv-*.quality.json'))) == 1
+    assert data_quality_report(str(source), str(tmp_path), load=lambda path: pytest.fail("rescanned")) == first
+
+    with open(source, 'a') as file:
+        file.write("2020-04-24 00:20:00+00:00,-1\n")
+    assert data_quality_report(str(source), str(tmp_path)).rows == 3
+
+def test_sources_with_the_same_name_keep_separate_reports(tmp_path):
+    reports = {}
+    for gym, rows in [('a', 2), ('b', 3)]:
+        source = tmp_path / gym / 'gym.csv'
+        source.parent.mkdir()
+        source.write_text("time,19\n" + "".join(f"2020-04-24 00:{10 * row:02d}:00+00:00,2\n" for row in range(rows)))
+        reports[gym] = data_quality_report(str(source), str(tmp_path / 'reports'))
+    assert len(list((tmp_path / 'reports').glob('gym.csv-*.quality.json'))) == 2
+
+    for gym in ['a', 'b']:
+        cached = data_quality_report(str(tmp_path / gym / 'gym.csv'), str(tmp_path / 'reports'), load=lambda path: pytest.fail("rescanned"))
+        assert cached == reports[gym]
@@ -0,0 +1,55 @@
+import pandas as pd
+import numpy as np
+import pytest
+from src.projects.hietaniemi_gym.utils.file_manager import save_data, load_data, save_dataframe, load_dataframe, append_dataframe
+
+@pytest.fixture
+def merged_df():
+    return pd.DataFrame({
+        'time': pd.date_range('2020-04-24', periods=4, freq='h', tz='UTC'),
+        'Hour': ['00:00', '01:00', None, '03:00'],
+        'Temperature (degC)': [6.2, np.nan, 5.9, 5.5],
+        '19': np.array([1, 2, 3, 4], dtype=np.int64),
+        'weekday': np.array([4, 4, 4, 4], dtype=np.int32),
+    })
+
+def test_columnar_roundtrip(tmp_path, merged_df):
+    save_dataframe(merged_df, str(tmp_path))
+    pd.testing.assert_frame_equal(load_data(str(tmp_path), 'data'), merged_df, check_exact=True)
+    pd.testing.assert_frame_equal(load_dataframe(str(tmp_path), mmap=False), merged_df, check_exact=True)
+
+def test_load_data_prefers_the_columnar_dataset(tmp_path, merged_df):
+    save_data(merged_df.iloc[:2], str(tmp_path))
+    save_dataframe(merged_df, str(tmp_path))
+    pd.testing.assert_frame_equal(load_data(str(tmp_path)), merged_df, check_exact=True)
+    pd.testing.assert_frame_equal(load_data(str(tmp_path), 'data.pkl'), merged_df.iloc[:2])
+
+def test_columnar_loads_requested_columns(tmp_path, merged_df):
+    save_dataframe(merged_df, str(tmp_path))
+    df = load_dataframe(str(tmp_path), columns=['19', 'time'])
+    assert list(df.columns) == ['19', 'time']
+    pd.testing.assert_frame_equal(df, merged_df[['19', 'time']], check_exact=True)
+
+    # Copy-on-write mapping: in-memory edits never reach the file
+    df['19'] += 1
+    assert load_dataframe(str(tmp_path), columns=['19'])['19'].tolist() == [1, 2, 3, 4]
+
+    with pytest.raises(KeyError):
+        load_dataframe(str(tmp_path), columns=['missing'])
+
+def test_append_truncates_and_widens(tmp_path, merged_df):
+    save_dataframe(merged_df, str(tmp_path))
+    new_rows = merged_df.iloc[2:].reset_index(drop=True)
+    new_rows['19'] = new_rows['19'] + 0.5
+    new_rows['Hour'] = ['02:00:00', None]
+    append_dataframe(new_rows, str(tmp_path), keep_rows=2)
+
+    expected = pd.concat([merged_df.iloc[:2], new_rows], ignore_index=True)
+    pd.testing.assert_frame_equal(load_dataframe(str(tmp_path)), expected, check_exact=True)
+
+    with pytest.raises(ValueError):
+        append_dataframe(new_rows[['19']], str(tmp_path))
+
+def test_pickle_format_still_readable(tmp_path, merged_df):
+    save_data(merged_df, str(tmp_path))
+    pd.testing.assert_frame_equal(load_data(str(tmp_path)), merged_df)
@@ -0,0 +1,55 @@
+import os
+import pandas as pd
+import pytest
+from dotenv import load_dotenv
+from src.projects.hietaniemi_gym.pipelines.feature_pipeline import feature_pipeline, incremental_feature_pipeline
+
+@pytest.fixture(scope="module")
+def source_lines():
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    with open(os.getenv('GYM_DATA_PATH')) as file:
+        gym_lines = file.readlines()
+    with open(os.getenv('WEATHER_DATA_PATH')) as file:
+        weather_lines = file.readlines()
+    return gym_lines, weather_lines
+
+def test_incremental_runs_match_full_run(tmp_path, source_lines):
+    gym_lines, weather_lines = source_lines
+    gym_path = str(tmp_path / "gym.csv")
+    weather_path = str(tmp_path / "weather.csv")
+    dataset_dir = str(tmp_path / "dataset")
+    os.makedirs(dataset_dir)
+
+    # Growing files: a boundary inside an hour, weather lagging behind, a half written line
+    steps = [(20003, 4001, ''), (30010, 4500, '2020-10-1'), (30015, 6000, ''), (len(gym_lines), len(weather_lines), '')]
+    for gym_rows, weather_rows, partial_line in steps:
+        with open(gym_path, 'w') as file:
+            file.writelines(gym_lines[:gym_rows])
+            file.write(partial_line)
+        with open(weather_path, 'w') as file:
+            file.writelines(weather_lines[:weather_rows])
+
+        incremental = incremental_feature_pipeline(gym_path, weather_path, dataset_dir)
+
+        with open(gym_path, 'w') as file:
+            file.writelines(gym_lines[:gym_rows])
+        pd.testing.assert_frame_equal(incremental, feature_pipeline(gym_path, weather_path), check_exact=True)
+
+def test_rewritten_source_triggers_rebuild(tmp_path, source_lines):
+    gym_lines, weather_lines = source_lines
+    gym_path = str(tmp_path / "gym.csv")
+    weather_path = str(tmp_path / "weather.csv")
+    dataset_dir = str(tmp_path / "dataset")
+    os.makedirs(dataset_dir)
+
+    for weather_rows in [5000, 3000]:
+        with open(gym_path, 'w') as file:
+            file.writelines(gym_lines[:30000])
+        with open(weather_path, 'w') as file:
+            file.writelines(weather_lines[:weather_rows])
+        incremental = incremental_feature_pipeline(gym_path, weather_path, dataset_dir)
+    pd.testing.assert_frame_equal(incremental, feature_pipeline(gym_path, weather_path), check_exact=True)
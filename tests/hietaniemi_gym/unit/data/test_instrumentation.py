@@ -0,0 +1,69 @@
+import json
+import tracemalloc
+import pandas as pd
+import numpy as np
+import pytest
+from src.projects.hietaniemi_gym.utils import instrumentation
+from src.projects.hietaniemi_gym.utils.instrumentation import (
+    InstrumentationConfig,
+    enable_instrumentation,
+    disable_instrumentation,
+    instrument,
+    instrumentation_enabled,
+    stage,
+    summary,
+    format_summary
+)
+from src.projects.hietaniemi_gym.data.data_processing.data_clean import data_clean_na
+from src.projects.hietaniemi_gym.pipelines.predict_pipeline import predict_pipeline
+
+@instrument()
+def allocate(rows):
+    return np.ones(rows)
+
+def test_disabled_records_nothing(tmp_path):
+    metrics_path = tmp_path / 'run.metrics.jsonl'
+    enable_instrumentation(InstrumentationConfig(metrics_path=str(metrics_path)))
+    disable_instrumentation()
+    assert len(allocate(10)) == 10
+    with stage('block') as frame:
+        assert frame is None
+    assert metrics_path.read_text() == ''
+    assert summary() == []
+
+# Without reset_peak, as on Python 3.8, the allocation peaks are tracked from the overall peak
+@pytest.mark.parametrize("can_reset_peak", [True, False])
+def test_records_stages_as_json_lines(tmp_path, monkeypatch, can_reset_peak):
+    if not can_reset_peak:
+        monkeypatch.setattr(instrumentation, '_CAN_RESET_PEAK', False)
+        monkeypatch.delattr(instrumentation.tracemalloc, 'reset_peak', raising=False)
+    metrics_path = tmp_path / 'run.metrics.jsonl'
+    enable_instrumentation(InstrumentationConfig(metrics_path=str(metrics_path)))
+    try:
+        df = pd.DataFrame({'a': [1.0, np.nan, 3.0]})
+        with stage('outer', input_rows=len(df)) as frame:
+            cleaned = data_clean_na(df)
+            allocate(1024 ** 2)
+            allocate(10)
+            frame.output_rows = len(cleaned)
+    finally:
+        disable_instrumentation(log_summary=False)
+
+    records = [json.loads(line) for line in metrics_path.read_text().splitlines()]
+    assert [record['stage'] for record in records] == ['data_clean_na', 'allocate', 'allocate', 'outer']
+    assert records[0]['input_rows'] == 3 and records[0]['output_rows'] == 2
+    assert records[0]['parent'] == 'outer' and records[-1]['parent'] is None
+    assert records[1]['allocated_bytes'] >= 8 * 1024 ** 2
+    # The outer stage includes the allocations of the inner ones
+    assert records[-1]['allocated_bytes'] >= records[1]['allocated_bytes']
+    assert all(record['wall_seconds'] >= 0 and record['cpu_seconds'] >= 0 for record in records)
+
+    entries = {entry['stage']: entry for entry in summary()}
+    assert entries['allocate']['calls'] == 2
+    assert entries['allocate']['output_rows'] == 1024 ** 2 + 10
+    assert 'data_clean_na' in format_summary()
+
+def test_failing_pipeline_disables_instrumentation(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        predict_pipeline(str(tmp_path / 'gym.csv'), str(tmp_path / 'weather.csv'), use_cache=False, instrumentation=True)
+    assert not instrumentation_enabled() and not tracemalloc.is_tracing()
@@ -0,0 +1,36 @@
+import pandas as pd
+import numpy as np
+from src.projects.hietaniemi_gym.utils.memory_report import MemoryBudgetConfig, StageMemoryReport
+from src.projects.hietaniemi_gym.data.data_processing.data_clean import data_clean_na
+from src.projects.hietaniemi_gym.data.data_processing.data_merge_datasets import merge_datasets
+
+def test_stage_peak_and_budget():
+    memory_report = StageMemoryReport(MemoryBudgetConfig(max_peak_rss_mb=1e6))
+    with memory_report.stage('allocate'):
+        data = np.ones(64 * 1024 ** 2 // 8)
+        del data
+    record = memory_report.stages[0]
+    assert record['stage'] == 'allocate'
+    assert record['peak_rss_mb'] >= record['rss_before_mb']
+    if record['per_stage_peak']:
+        assert record['peak_rss_mb'] - record['rss_before_mb'] > 32
+    assert memory_report.within_budget
+
+    memory_report.max_peak_rss_mb = 1
+    with memory_report.stage('over budget'):
+        pass
+    assert not memory_report.within_budget
+    assert 'within budget: False' in memory_report.format()
+
+def test_clean_and_merge_leave_inputs_unchanged():
+    times = pd.date_range('2020-04-24', periods=3, freq='h', tz='UTC')
+    weather_df = pd.DataFrame({'Temperature (degC)': [6.2, np.nan, 5.5], 'time': times})
+    gym_df = pd.DataFrame({'time': times, '19': [1, 2, 3]})
+    weather_before = weather_df.copy()
+    gym_before = gym_df.copy()
+
+    merged = merge_datasets(data_clean_na(weather_df), gym_df)
+    pd.testing.assert_frame_equal(weather_df, weather_before)
+    pd.testing.assert_frame_equal(gym_df, gym_before)
+    assert list(merged.columns) == ['time', 'Temperature (degC)', '19']
+    assert merged['19'].tolist() == [1, 3]
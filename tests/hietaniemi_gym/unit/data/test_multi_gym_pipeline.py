@@ -0,0 +1,39 @@
+import os
+import json
+import pandas as pd
+import pytest
+from dotenv import load_dotenv
+from src.projects.hietaniemi_gym.pipelines.feature_pipeline import feature_pipeline
+from src.projects.hietaniemi_gym.pipelines.multi_gym_pipeline import multi_gym_pipeline, MULTI_GYM_INDEX_NAME
+from src.projects.hietaniemi_gym.utils.file_manager import load_dataframe
+
+@pytest.fixture(scope="module")
+def data_paths():
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+    return os.getenv('GYM_DATA_PATH'), os.getenv('WEATHER_DATA_PATH')
+
+def test_bad_shard_does_not_abort_the_rest(tmp_path, data_paths):
+    gym_data_path, weather_data_path = data_paths
+    manifest = [
+        {'name': 'hietaniemi', 'gym_data_path': gym_data_path, 'weather_data_path': weather_data_path},
+        {'name': 'missing', 'gym_data_path': str(tmp_path / 'missing.csv'), 'weather_data_path': weather_data_path},
+        {'name': 'two_devices', 'gym_data_path': gym_data_path, 'weather_data_path': weather_data_path,
+         'device_columns': ['19', '20']},
+    ]
+    manifest_path = tmp_path / 'manifest.json'
+    manifest_path.write_text(json.dumps(manifest))
+    output_dir = str(tmp_path / 'gyms')
+
+    index = multi_gym_pipeline(str(manifest_path), output_dir, max_workers=2)
+
+    assert [entry['status'] for entry in index] == ['ok', 'failed', 'ok']
+    with open(os.path.join(output_dir, MULTI_GYM_INDEX_NAME)) as file:
+        assert json.load(file) == index
+
+    expected = feature_pipeline(gym_data_path, weather_data_path)
+    pd.testing.assert_frame_equal(load_dataframe(output_dir, 'hietaniemi'), expected)
+    two_devices = load_dataframe(output_dir, 'two_devices')
+    assert (two_devices['sum_minutes'] == expected['19'] + expected['20']).all()
@@ -0,0 +1,61 @@
+import pandas as pd
+import numpy as np
+import pytest
+from src.projects.hietaniemi_gym.data.data_analysis.data_visualization.data_plot_and_save import (
+    plot_total_device_usage,
+    plot_gym_usage_vs_temperature,
+    plot_mean_gym_usage_vs_temperature,
+    mean_usage_by_day_type,
+    PlotJob,
+    render_plots
+)
+
+from src.projects.hietaniemi_gym.data.data_processing.calendar_features import add_calendar_features
+from src.projects.hietaniemi_gym.pipelines.data_analysis_pipeline import categorize_day
+
+@pytest.fixture
+def merged_df():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        '19': rng.integers(0, 10, 48),
+        '20': rng.integers(0, 10, 48),
+        'Temperature (degC)': rng.normal(10, 5, 48),
+        'sum_minutes': rng.integers(0, 100, 48),
+    }, index=pd.Index(np.arange(48) % 7, name='weekday'))
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_render_plots_writes_every_image(tmp_path, merged_df, parallel):
+    temperature_col = 'Temperature (degC)'
+    jobs = [
+        PlotJob(plot_total_device_usage, ['19', '20'], kwargs={'device_columns': ['19', '20'], 'dir': str(tmp_path)}),
+        PlotJob(plot_gym_usage_vs_temperature, [temperature_col, 'sum_minutes'], (temperature_col, 'sum_minutes'), {'dir': str(tmp_path)}),
+        PlotJob(plot_mean_gym_usage_vs_temperature, [temperature_col, 'sum_minutes'], (temperature_col, 'sum_minutes', 5), {'dir': str(tmp_path)}),
+    ]
+    render_plots(merged_df, jobs, parallel=parallel, max_workers=2)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        'gym_usage_vs_temperature.png',
+        'mean_gym_usage_vs_temperature.png',
+        'total_device_usage.png',
+    ]
+
+def test_render_plots_raises_after_all_jobs(tmp_path, merged_df):
+    jobs = [
+        PlotJob(plot_gym_usage_vs_temperature, ['sum_minutes'], ('Temperature (degC)', 'sum_minutes'), {'dir': str(tmp_path)}),
+        PlotJob(plot_total_device_usage, ['19', '20'], kwargs={'device_columns': ['19', '20'], 'dir': str(tmp_path)}),
+    ]
+    with pytest.raises(KeyError):
+        render_plots(merged_df, jobs, max_workers=2)
+    assert [path.name for path in tmp_path.iterdir()] == ['total_device_usage.png']
+
+def test_render_plots_without_jobs(merged_df):
+    render_plots(merged_df, [], parallel=True)
+
+def test_weekend_split_follows_the_dates():
+    # Friday, Saturday, Sunday and Monday. The row numbers 0-3 would all count as weekdays.
+    df = pd.DataFrame({
+        'time': pd.to_datetime(['2024-02-09 12:00', '2024-02-10 12:00', '2024-02-11 12:00', '2024-02-12 12:00'], utc=True),
+        '19': [1.0, 10.0, 20.0, 3.0],
+    })
+    df = add_calendar_features(df, 'time', ['is_weekend'])
+    mean_usage = mean_usage_by_day_type(df, categorize_day, ['19'], weekend_col='is_weekend')
+    assert mean_usage['19'].to_dict() == {'weekday': 2.0, 'weekend': 15.0}
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+from src.projects.hietaniemi_gym.data.data_processing.sorted_join import sorted_join
+from src.projects.hietaniemi_gym.data.data_processing.data_merge_datasets import merge_datasets
+
+@pytest.fixture
+def weather_df():
+    return pd.DataFrame({
+        'Temperature (degC)': [6.2, 6.0, 5.9, 5.5],
+        'time': pd.date_range('2020-04-24 00:00', periods=4, freq='h', tz='UTC'),
+    })
+
+@pytest.fixture
+def gym_df():
+    return pd.DataFrame({
+        'time': pd.to_datetime(['2020-04-24 00:00', '2020-04-24 00:10', '2020-04-24 01:50',
+                                '2020-04-24 05:00', '2020-04-23 23:50'], utc=True),
+        '19': [1, 2, 3, 4, 5],
+    })
+
+def test_inner_join_matches_pandas_merge(weather_df):
+    gym_hourly = pd.DataFrame({
+        'time': pd.to_datetime(['2020-04-24 03:00', '2020-04-24 01:00', '2020-04-24 05:00'], utc=True),
+        '19': [3, 1, 5],
+    })
+    expected = pd.merge(weather_df.set_index('time'), gym_hourly.set_index('time'),
+                        left_index=True, right_index=True, how='inner').reset_index()
+    pd.testing.assert_frame_equal(merge_datasets(weather_df, gym_hourly), expected)
+
+    _, report = sorted_join(weather_df, gym_hourly)
+    assert (report.matched_rows, report.left_dropped, report.right_dropped) == (2, 2, 1)
+
+def test_interval_join_at_sub_hour_resolution(gym_df, weather_df):
+    joined, report = sorted_join(gym_df, weather_df, how='interval', interval=pd.Timedelta(hours=1))
+    assert joined['19'].tolist() == [1, 2, 3]
+    assert joined['Temperature (degC)'].tolist() == [6.2, 6.2, 6.0]
+    assert (report.left_dropped, report.right_dropped) == (2, 2)
+
+def test_asof_join_with_tolerance(gym_df, weather_df):
+    joined, _ = sorted_join(gym_df, weather_df, how='asof')
+    assert joined['19'].tolist() == [1, 2, 3, 4]
+    assert joined['Temperature (degC)'].tolist() == [6.2, 6.2, 6.0, 5.5]
+
+    joined, report = sorted_join(gym_df, weather_df, how='asof', tolerance=pd.Timedelta(minutes=30))
+    assert joined['19'].tolist() == [1, 2]
+    assert report.left_dropped == 3
+
+def test_rejects_duplicate_right_keys(weather_df):
+    with pytest.raises(ValueError):
+        sorted_join(weather_df, pd.concat([weather_df, weather_df]))
@@ -0,0 +1,64 @@
+import os
+import pandas as pd
+import pytest
+from src.projects.hietaniemi_gym.utils.stage_cache import StageCache, StageCacheConfig
+
+@pytest.fixture
+def input_path(tmp_path):
+    path = tmp_path / "input.csv"
+    path.write_text("a,b\n1,2\n")
+    return str(path)
+
+def test_cache_reuses_result_until_input_changes(tmp_path, input_path):
+    cache = StageCache(StageCacheConfig(cache_dir=str(tmp_path / "cache")))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return pd.DataFrame({'a': [len(calls)]})
+
+    first = cache.get_or_compute('stage', [input_path], {'p': 1}, 1, compute)
+    second = cache.get_or_compute('stage', [input_path], {'p': 1}, 1, compute)
+    pd.testing.assert_frame_equal(first, second)
+    assert len(calls) == 1
+
+    # Different parameters, version or input content are separate entries
+    cache.get_or_compute('stage', [input_path], {'p': 2}, 1, compute)
+    cache.get_or_compute('stage', [input_path], {'p': 1}, 2, compute)
+    with open(input_path, 'a') as file:
+        file.write("3,4\n")
+    cache.get_or_compute('stage', [input_path], {'p': 1}, 1, compute)
+    assert len(calls) == 4
+
+def test_cache_evicts_least_recently_used(tmp_path, input_path):
+    cache = StageCache(StageCacheConfig(cache_dir=str(tmp_path / "cache")))
+    df = pd.DataFrame({'a': range(1000)})
+    for name in ['old', 'used', 'new']:
+        cache.put(name, df)
+    meta_path = os.path.join(cache.cache_dir, '{}', 'meta.json')
+    os.utime(meta_path.format('old'), (1, 1))
+    os.utime(meta_path.format('used'), (2, 2))
+    os.utime(meta_path.format('new'), (3, 3))
+    assert cache.get('used') is not None
+
+    cache.max_bytes = sum(os.path.getsize(os.path.join(root, name))
+                          for key in ['used', 'new']
+                          for root, _, names in os.walk(os.path.join(cache.cache_dir, key)) for name in names)
+    cache.evict()
+    assert sorted(os.listdir(cache.cache_dir)) == ['new', 'used']
+
+def test_cache_evicts_interrupted_entries(tmp_path):
+    cache = StageCache(StageCacheConfig(cache_dir=str(tmp_path / "cache")))
+    df = pd.DataFrame({'a': range(1000)})
+    cache.put('complete', df)
+    cache.put('interrupted', df)
+    os.remove(os.path.join(cache.cache_dir, 'interrupted', 'meta.json'))
+    os.utime(os.path.join(cache.cache_dir, 'interrupted'), (1, 1))
+    # An empty sibling directory is no cache entry, even when it is the oldest
+    os.makedirs(os.path.join(cache.cache_dir, 'scenarios'))
+    os.utime(os.path.join(cache.cache_dir, 'scenarios'), (0, 0))
+
+    cache.max_bytes = sum(os.path.getsize(os.path.join(root, name))
+                          for root, _, names in os.walk(os.path.join(cache.cache_dir, 'complete')) for name in names)
+    cache.evict()
+    assert sorted(os.listdir(cache.cache_dir)) == ['complete', 'scenarios']
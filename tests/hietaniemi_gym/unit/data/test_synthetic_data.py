@@ -0,0 +1,44 @@
+import pandas as pd
+from benchmarks.hietaniemi_gym.synthetic_data import generate_dataset, device_columns
+from benchmarks.hietaniemi_gym.bench_pipelines import compare_to_baseline, baseline_mismatches, run_settings
+from src.projects.hietaniemi_gym.pipelines.feature_pipeline import feature_pipeline
+
+def test_generated_data_is_deterministic_and_loadable(tmp_path):
+    gym_path, weather_path = generate_dataset(str(tmp_path / 'a'), scale=0.05, device_count=3, seed=7)
+    other_gym_path, other_weather_path = generate_dataset(str(tmp_path / 'b'), scale=0.05, device_count=3, seed=7)
+    assert open(gym_path).read() == open(other_gym_path).read()
+    assert open(weather_path).read() == open(other_weather_path).read()
+
+    gym_df = pd.read_csv(gym_path)
+    assert list(gym_df.columns) == ['time', '19', '20', '21']
+    assert len(gym_df) == int(55102 * 0.05)
+
+    merged_df = feature_pipeline(gym_path, weather_path, device_columns=device_columns(3))
+    assert len(merged_df) > 0.9 * len(gym_df) / 6
+    assert (merged_df['sum_minutes'] == merged_df[['19', '20', '21']].sum(axis=1)).all()
+
+def test_compare_to_baseline_flags_slower_stages():
+    baseline = {'results': [{'pipeline': 'predict_pipeline', 'scale': 1, 'stages': [
+        {'stage': 'load_gym', 'seconds': 1.0, 'peak_rss_mb': 100},
+        {'stage': 'merge', 'seconds': 0.001, 'peak_rss_mb': 100},
+    ]}]}
+    current = {'results': [{'pipeline': 'predict_pipeline', 'scale': 1, 'stages': [
+        {'stage': 'load_gym', 'seconds': 1.5, 'peak_rss_mb': 110},
+        {'stage': 'merge', 'seconds': 0.01, 'peak_rss_mb': 100},
+    ]}]}
+    regressions = compare_to_baseline(current, baseline, threshold=0.25)
+    assert len(regressions) == 1 and 'load_gym' in regressions[0]
+
+def test_baseline_mismatches_list_settings_and_missing_stages():
+    settings = run_settings(device_count=8, seed=0, repeats=3)
+    baseline = {'settings': dict(settings, cpu_count=1), 'results': [{'pipeline': 'predict_pipeline', 'scale': 1, 'stages': [
+        {'stage': 'load_gym', 'seconds': 1.0, 'peak_rss_mb': 100},
+    ]}]}
+    current = {'settings': dict(settings, cpu_count=4), 'results': [{'pipeline': 'predict_pipeline', 'scale': 1, 'stages': [
+        {'stage': 'load_gym', 'seconds': 1.0, 'peak_rss_mb': 100},
+        {'stage': 'profile_gym', 'seconds': 1.0, 'peak_rss_mb': 100},
+    ]}]}
+    assert baseline_mismatches(current, baseline) == [
+        'setting cpu_count: baseline 1, current 4',
+        'predict_pipeline x1 profile_gym: not in the baseline',
+    ]
@@ -0,0 +1,100 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from dotenv import load_dotenv
+from src.projects.hietaniemi_gym.data.data_processing.data_loader import load_gym_data, load_weather_data
+from src.projects.hietaniemi_gym.pipelines.ingest_pipeline import ingest_pipeline
+from src.projects.hietaniemi_gym.utils.time_series_store import (
+    is_store_current,
+    load_time_series_store,
+    read_store_manifest,
+    write_time_series_store
+)
+from src.projects.hietaniemi_gym.data.data_consts import TIME_COL_NAME
+
+@pytest.fixture(scope="module")
+def store_dir(tmp_path_factory):
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    store_dir = str(tmp_path_factory.mktemp('store'))
+    ingest_pipeline(os.getenv('GYM_DATA_PATH'), os.getenv('WEATHER_DATA_PATH'), store_dir)
+    return store_dir
+
+@pytest.fixture
+def unsorted_df():
+    times = pd.date_range('2020-01-30', '2020-03-02', freq='6h', tz='UTC')
+    order = np.random.default_rng(0).permutation(len(times))
+    return pd.DataFrame({
+        'a': np.arange(len(times), dtype=np.uint8)[order],
+        TIME_COL_NAME: times[order],
+        'b': np.linspace(0, 1, len(times), dtype=np.float32)[order],
+    })
+
+def test_partitions_are_monthly_and_sorted(tmp_path, unsorted_df):
+    store_path = str(tmp_path / 'store')
+    manifest = write_time_series_store(unsorted_df, store_path, TIME_COL_NAME)
+    assert [partition['name'] for partition in manifest['partitions']] == ['2020-01', '2020-02', '2020-03']
+    assert sum(partition['rows'] for partition in manifest['partitions']) == len(unsorted_df)
+
+    expected = unsorted_df.sort_values(TIME_COL_NAME, ignore_index=True)
+    pd.testing.assert_frame_equal(load_time_series_store(store_path), expected, check_exact=True)
+
+def test_time_range_opens_only_partitions_in_range(tmp_path, unsorted_df):
+    store_path = str(tmp_path / 'store')
+    write_time_series_store(unsorted_df, store_path, TIME_COL_NAME)
+    # Partitions out of range are not opened, so removing them must not matter
+    for partition in ['2020-01', '2020-03']:
+        for file_name in os.listdir(tmp_path / 'store' / partition):
+            os.remove(tmp_path / 'store' / partition / file_name)
+
+    loaded = load_time_series_store(store_path, ('2020-02-10 03:00', pd.Timestamp('2020-02-12', tz='Europe/Helsinki')), columns=['b', TIME_COL_NAME])
+    expected = unsorted_df.sort_values(TIME_COL_NAME, ignore_index=True)
+    in_range = (expected[TIME_COL_NAME] >= pd.Timestamp('2020-02-10 03:00', tz='UTC')) & (expected[TIME_COL_NAME] < pd.Timestamp('2020-02-11 22:00', tz='UTC'))
+    pd.testing.assert_frame_equal(loaded, expected.loc[in_range, ['b', TIME_COL_NAME]].reset_index(drop=True), check_exact=True)
+
+    empty = load_time_series_store(store_path, ('2019-01-01', '2019-02-01'))
+    assert len(empty) == 0 and list(empty.dtypes.astype(str)) == ['uint8', 'datetime64[ns, UTC]', 'float32']
+
+def test_loaders_read_the_ingested_store(store_dir):
+    gym_data_path, weather_data_path = os.getenv('GYM_DATA_PATH'), os.getenv('WEATHER_DATA_PATH')
+    expected = load_gym_data(gym_data_path).sort_values(TIME_COL_NAME, kind='stable', ignore_index=True)
+    pd.testing.assert_frame_equal(load_gym_data(gym_data_path, store_dir), expected, check_exact=True)
+
+    week = ('2021-05-01', '2021-05-08')
+    pd.testing.assert_frame_equal(load_weather_data(weather_data_path, store_dir, week), load_weather_data(weather_data_path, time_range=week), check_exact=True)
+    assert len(load_gym_data(gym_data_path, store_dir, week)) == 7 * 24 * 6
+
+def test_ingest_skips_current_stores(store_dir, tmp_path):
+    gym_data_path = os.getenv('GYM_DATA_PATH')
+    store_path = ingest_pipeline(gym_data_path, os.getenv('WEATHER_DATA_PATH'), store_dir)[gym_data_path]
+    assert is_store_current(store_path, gym_data_path)
+    assert read_store_manifest(store_path)['num_rows'] > 50000
+
+    source = tmp_path / 'gym.csv'
+    source.write_text("time,19\n2020-04-24 00:00:00+00:00,2\n")
+    write_time_series_store(load_gym_data(str(source)), str(tmp_path / 'gym'), TIME_COL_NAME, str(source))
+    with open(source, 'a') as file:
+        file.write("2020-04-24 00:10:00+00:00,3\n")
+    assert not is_store_current(str(tmp_path / 'gym'), str(source))
+
+def test_sources_with_the_same_name_get_separate_stores(tmp_path):
+    sources = {}
+    for gym, count in [('a', 2), ('b', 3)]:
+        (tmp_path / gym).mkdir()
+        sources[gym] = tmp_path / gym / 'gym.csv'
+        sources[gym].write_text(f"time,19\n2020-04-24 00:00:00+00:00,{count}\n")
+        weather = tmp_path / gym / 'weather.csv'
+        weather.write_text("Year,Month,Day,Hour,Timezone,Precipitation (mm),Snow depth (cm),Temperature (degC)\n2020,4,24,00:00,UTC,0,0,5\n")
+        ingest_pipeline(str(sources[gym]), str(weather), str(tmp_path / 'store'))
+    assert load_gym_data(str(sources['a']), str(tmp_path / 'store'))['19'].tolist() == [2]
+    assert load_gym_data(str(sources['b']), str(tmp_path / 'store'))['19'].tolist() == [3]
+
+    # A store whose source changed is refused instead of returning its old rows
+    with open(sources['a'], 'a') as file:
+        file.write("2020-04-24 00:10:00+00:00,4\n")
+    with pytest.raises(ValueError):
+        load_gym_data(str(sources['a']), str(tmp_path / 'store'))
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from src.projects.hietaniemi_gym.pipelines.backtest_pipeline import BacktestConfig, make_folds, run_backtest, unfitted_estimator
+
+@pytest.fixture
+def hourly_data():
+    times = pd.date_range('2020-01-01', periods=24 * 40, freq='h').to_numpy()
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(len(times), 3))
+    target = features @ np.array([1.0, -2.0, 0.5]) + rng.normal(0, 0.1, len(times))
+    return features, target, times
+
+def test_rolling_and_expanding_folds(hourly_data):
+    _, _, times = hourly_data
+    rolling = make_folds(times, BacktestConfig(train_window='7D', test_window='2D', step='3D'))
+    assert len(rolling) == 11
+    assert all(fold.train_end - fold.train_start == 7 * 24 for fold in rolling)
+    assert [fold.test_start for fold in rolling[:2]] == [7 * 24, 10 * 24]
+    assert rolling[-1].test_end - rolling[-1].test_start == 2 * 24
+
+    expanding = make_folds(times, BacktestConfig(train_window='7D', test_window='2D', step='3D', expanding=True))
+    assert [fold.train_start for fold in expanding] == [0] * 11
+    assert [fold.test_end for fold in expanding] == [fold.test_end for fold in rolling]
+
+    with pytest.raises(ValueError):
+        make_folds(times[::-1], BacktestConfig())
+
+def test_parallel_backtest_matches_serial(hourly_data):
+    config = BacktestConfig(train_window='7D', test_window='1D', step='1D')
+    serial = run_backtest(*hourly_data, LinearRegression(), config, max_workers=1)
+    parallel = run_backtest(*hourly_data, LinearRegression(), config, max_workers=2)
+
+    assert len(serial['folds']) == 33 and serial['folds']['test_rows'].sum() == 33 * 24
+    pd.testing.assert_frame_equal(parallel['folds'], serial['folds'])
+    assert parallel['pooled'] == pytest.approx(serial['pooled'])
+    assert serial['pooled']['R^2 Score'] > 0.99
+
+def test_unfitted_estimator_keeps_parameters():
+    model = LinearRegression(fit_intercept=False).fit(np.eye(2), np.ones(2))
+    estimator = unfitted_estimator(model)
+    assert not estimator.fit_intercept and not hasattr(estimator, 'coef_')
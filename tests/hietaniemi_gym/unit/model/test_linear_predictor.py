@@ -0,0 +1,49 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from dotenv import load_dotenv
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import PredictorModelConfig, PredictorModel, extract_features
+from src.projects.hietaniemi_gym.model.model_predict.linear_predictor import LinearPredictorModel, export_linear_model
+from src.projects.hietaniemi_gym.pipelines.feature_pipeline import feature_pipeline
+
+@pytest.fixture(scope="module")
+def features():
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+    predictor_model = PredictorModel(PredictorModelConfig(model_path=os.getenv('MODEL_PATH')))
+    merged_data = feature_pipeline(os.getenv('GYM_DATA_PATH'), os.getenv('WEATHER_DATA_PATH'))
+    return predictor_model, predictor_model.extract_features(merged_data)
+
+def test_linear_predictor_matches_sklearn(tmp_path, features):
+    predictor_model, features_df = features
+    output_path = str(tmp_path / 'linear_model.npz')
+    export_linear_model(predictor_model.model, output_path)
+    linear_model = LinearPredictorModel(PredictorModelConfig(model_path=output_path))
+
+    expected = predictor_model.predict(features_df)
+    np.testing.assert_allclose(linear_model.predict(features_df), expected, rtol=1e-12, atol=1e-9)
+
+    # Raw arrays are taken in feature order, shuffled DataFrame columns by name
+    np.testing.assert_allclose(linear_model.predict(features_df.to_numpy(dtype=float)), expected, rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(linear_model.predict(features_df[features_df.columns[::-1]]), expected, rtol=1e-12, atol=1e-9)
+
+    # The loaded coefficients are exposed as the model, as PredictorModel does
+    assert linear_model.model.feature_names == list(features_df.columns)
+    assert linear_model.extract_features(features_df).equals(features_df)
+
+def test_extract_features_keeps_the_input_dtypes():
+    merged_data = pd.DataFrame({
+        'weekday': np.array([0, 6], dtype=np.int8),
+        'hour': np.array([7, 23], dtype=np.int8),
+        'Precipitation (mm)': np.array([0.0, 1.5], dtype=np.float32),
+        'Snow depth (cm)': np.array([-1.0, 3.0], dtype=np.float32),
+        'Temperature (degC)': np.array([4.5, -2.0], dtype=np.float32),
+    })
+    dtypes = merged_data.dtypes.copy()
+    features_df = extract_features(merged_data)
+    assert features_df.dtypes.tolist() == [np.int64, np.int64, np.float64, np.float64, np.float64]
+    pd.testing.assert_series_equal(merged_data.dtypes, dtypes)
+    assert extract_features(merged_data.drop(columns='hour')) is None
@@ -0,0 +1,61 @@
+import json
+import logging
+from contextlib import contextmanager
+from src.lib.logging.logger import LoggingConfig, RateLimitFilter, setup_logging, shutdown_logging, get_log_file_path
+
+@contextmanager
+def unconfigured_root_logger():
+    # pytest attaches its capture handlers to the root logger while a test runs
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    for handler in handlers:
+        root.removeHandler(handler)
+    try:
+        yield root
+    finally:
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+            handler.close()
+        for handler in handlers:
+            root.addHandler(handler)
+        root.setLevel(level)
+
+def test_async_json_logging_flushes_on_shutdown(tmp_path):
+    with unconfigured_root_logger():
+        _log_async_json(tmp_path)
+
+def _log_async_json(tmp_path):
+    config = LoggingConfig(asynchronous=True, json_format=True, module_levels={'test_logger': logging.WARNING, 'serving': logging.DEBUG})
+    setup_logging(str(tmp_path), 'run.log', config)
+    assert get_log_file_path() == str(tmp_path / 'run.log')
+
+    logging.info("dropped below the module level")
+    logging.warning("kept at the module level")
+    for request in range(100):
+        logging.getLogger('serving.requests').debug("request %d", request)
+    logging.getLogger('other').debug("dropped below the default level")
+    shutdown_logging()
+
+    records = [json.loads(line) for line in (tmp_path / 'run.log').read_text().splitlines()]
+    assert [record['message'] for record in records] == ["kept at the module level"] + [f"request {request}" for request in range(100)]
+    assert records[1]['logger'] == 'serving.requests' and records[1]['level'] == 'DEBUG'
+
+    # Records after the shutdown are written synchronously
+    logging.warning("after shutdown")
+    assert json.loads((tmp_path / 'run.log').read_text().splitlines()[-1])['message'] == "after shutdown"
+
+def test_rate_limit_reports_suppressed_records():
+    rate_limit = RateLimitFilter(rate=2, seconds=3600)
+    def record(level=logging.INFO, lineno=1):
+        return logging.LogRecord('serving', level, 'server.py', lineno, "Prediction made", None, None)
+
+    assert [rate_limit.filter(record()) for _ in range(5)] == [True, True, False, False, False]
+    assert rate_limit.filter(record(lineno=2))
+    assert rate_limit.filter(record(logging.WARNING))
+
+    # The next window reports the records dropped in the previous one
+    rate_limit.seconds = 0
+    passed = record()
+    assert rate_limit.filter(passed)
+    assert passed.suppressed == 3
+    assert passed.getMessage() == "Prediction made (3 similar messages suppressed)"
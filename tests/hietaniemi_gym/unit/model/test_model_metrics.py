@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+from src.projects.hietaniemi_gym.model.model_predict.model_metrics import MetricsAccumulator, calculate_metrics
+
+@pytest.fixture
+def scored():
+    rng = np.random.default_rng(0)
+    hour = rng.integers(0, 24, 5000)
+    y_true = 1000 + 20 * hour + rng.normal(0, 5, 5000)
+    y_pred = y_true + rng.normal(1, 3, 5000)
+    return y_true, y_pred, hour
+
+def expected_metrics(y_true, y_pred):
+    return [np.mean(y_true), np.mean(y_pred), mean_squared_error(y_true, y_pred), np.sqrt(mean_squared_error(y_true, y_pred)),
+            mean_absolute_error(y_true, y_pred), r2_score(y_true, y_pred)]
+
+def test_calculate_metrics_matches_sklearn(scored):
+    y_true, y_pred, _ = scored
+    np.testing.assert_allclose(list(calculate_metrics(y_true, y_pred).values()), expected_metrics(y_true, y_pred), rtol=1e-10)
+    assert calculate_metrics(list(y_true), y_pred) == {}
+
+def test_chunks_and_shards_merge_into_the_full_metrics(scored):
+    y_true, y_pred, hour = scored
+    full = MetricsAccumulator().update(y_true, y_pred, {'hour': hour})
+
+    shards = []
+    for shard in np.array_split(np.arange(len(y_true)), 3):
+        accumulator = MetricsAccumulator()
+        for chunk in np.array_split(shard, 7):
+            accumulator.update(y_true[chunk], y_pred[chunk], {'hour': hour[chunk]})
+        shards.append(accumulator)
+    merged = shards[0].merge(shards[1]).merge(shards[2])
+
+    assert merged.count == len(y_true)
+    np.testing.assert_allclose(list(merged.metrics().values()), list(full.metrics().values()), rtol=1e-10)
+    pd.testing.assert_frame_equal(merged.segment_metrics('hour'), full.segment_metrics('hour'), rtol=1e-10)
+
+def test_segment_metrics(scored):
+    y_true, y_pred, hour = scored
+    by_hour = MetricsAccumulator().update(y_true, y_pred, {'hour': hour}).segment_metrics('hour')
+    assert by_hour.index.tolist() == list(range(24))
+    for code in [0, 13]:
+        in_segment = hour == code
+        assert by_hour.loc[code, 'count'] == in_segment.sum()
+        np.testing.assert_allclose(by_hour.loc[code].iloc[1:].to_numpy(dtype=float), expected_metrics(y_true[in_segment], y_pred[in_segment]), rtol=1e-10)
+
+    # Codes that were never seen are left out, constant targets score as in scikit-learn
+    sparse = MetricsAccumulator().update(np.array([2.0, 2.0, 1.0]), np.array([2.0, 2.0, 3.0]), {'device': np.array([5, 5, 1])})
+    assert sparse.segment_metrics('device')['R^2 Score'].to_dict() == {1: 0.0, 5: 1.0}
+    with pytest.raises(ValueError):
+        sparse.update(np.ones(2), np.ones(2), {'device': np.array([-1, 0])})
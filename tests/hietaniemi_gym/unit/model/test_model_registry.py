@@ -0,0 +1,49 @@
+import shutil
+import pytest
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import PredictorModel, FEATURE_COLUMNS
+from src.projects.hietaniemi_gym.model.model_predict.linear_predictor import LinearPredictorModel
+from src.projects.hietaniemi_gym.model.model_registry.model_registry import (
+    ModelRegistryConfig,
+    ModelRegistry,
+    read_metadata,
+    write_metadata
+)
+
+SHIPPED_MODEL_DIR = 'artifacts/hietaniemi_gym/0.0.1/models/20240211_Linear_Regressor'
+
+@pytest.fixture
+def registry_path(tmp_path):
+    # Two artifact versions of the shipped model, the newer one served from the NumPy export
+    for artifact_version in ['0.0.2', '0.0.10']:
+        model_dir = tmp_path / artifact_version / 'models' / '20240211_Linear_Regressor'
+        shutil.copytree(SHIPPED_MODEL_DIR, model_dir)
+    metadata = read_metadata(str(model_dir))
+    metadata.update({'version': '20240301', 'model_file': 'linear_model.npz'})
+    write_metadata(str(model_dir), metadata)
+    return str(tmp_path)
+
+def test_shipped_metadata_is_readable():
+    registry = ModelRegistry(ModelRegistryConfig())
+    info = registry.resolve('Linear_Regressor')
+    assert info.features == FEATURE_COLUMNS
+    assert info.version == '20240211'
+
+def test_resolve_by_name_and_version(registry_path):
+    registry = ModelRegistry(ModelRegistryConfig(base_path=registry_path))
+    assert [info.artifact_version for info in registry.models] == ['0.0.2', '0.0.10']
+    assert registry.resolve().artifact_version == '0.0.10'
+    assert registry.resolve('Linear_Regressor', '20240211').artifact_version == '0.0.2'
+    assert registry.resolve(version='0.0.2').version == '20240211'
+    with pytest.raises(KeyError):
+        registry.resolve('Unknown')
+
+def test_predictors_are_cached(registry_path):
+    registry = ModelRegistry(ModelRegistryConfig(base_path=registry_path, cache_size=1))
+    latest = registry.get_predictor()
+    assert isinstance(latest, LinearPredictorModel)
+    assert registry.get_predictor() is latest
+
+    older = registry.get_predictor(version='0.0.2')
+    assert isinstance(older, PredictorModel)
+    # The cache holds one predictor, so the latest one was evicted and is loaded again
+    assert registry.get_predictor() is not latest
@@ -0,0 +1,53 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from dotenv import load_dotenv
+from src.projects.hietaniemi_gym.pipelines.backtest_pipeline import BacktestConfig
+from src.projects.hietaniemi_gym.pipelines.model_selection_pipeline import (
+    Candidate, ModelSelectionConfig, expand_candidates, model_selection_pipeline, rank_candidates,
+)
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import FEATURE_COLUMNS
+from src.projects.hietaniemi_gym.model.model_registry.model_registry import ModelRegistryConfig, ModelRegistry
+
+@pytest.fixture
+def hourly_data():
+    times = pd.date_range('2020-01-01', periods=24 * 40, freq='h').to_numpy()
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(len(times), 3))
+    target = features @ np.array([1.0, -2.0, 0.5]) + rng.normal(0, 0.1, len(times))
+    return features, target, times
+
+def test_expand_candidates():
+    candidates = expand_candidates({'linear': {}, 'ridge': {'alpha': [1.0, 10.0]}})
+    assert candidates == [Candidate('linear', {}), Candidate('ridge', {'alpha': 1.0}), Candidate('ridge', {'alpha': 10.0})]
+    with pytest.raises(KeyError):
+        expand_candidates({'unknown': {}})
+
+def test_parallel_ranking_matches_serial(hourly_data):
+    candidates = expand_candidates({'linear': {}, 'ridge': {'alpha': [1000.0]}, 'random_forest': {'n_estimators': [5], 'random_state': [0]}})
+    validation = BacktestConfig(train_window='14D', test_window='7D', step='7D', expanding=True)
+    serial = rank_candidates(*hourly_data, candidates, validation, max_workers=1)
+    parallel = rank_candidates(*hourly_data, candidates, validation, max_workers=2)
+
+    pd.testing.assert_frame_equal(parallel, serial)
+    assert serial.loc[0, 'candidate'] == 'linear()'
+    assert set(serial['candidate']) == {'linear()', 'ridge(alpha=1000.0)', 'random_forest(n_estimators=5, random_state=0)'}
+    assert serial['Root Mean Squared Error (RMSE)'].is_monotonic_increasing
+
+def test_winner_is_registered(tmp_path):
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+
+    config = ModelSelectionConfig(search_grid={'linear': {}, 'ridge': {'alpha': [1e6]}}, max_workers=1)
+    ranking, model_dir = model_selection_pipeline(os.getenv('GYM_DATA_PATH'), os.getenv('WEATHER_DATA_PATH'), config,
+                                                  use_cache=False, base_path=str(tmp_path))
+    assert sorted(ranking['estimator']) == ['linear', 'ridge']
+
+    info = ModelRegistry(ModelRegistryConfig(base_path=str(tmp_path))).resolve('Selected_Regressor')
+    assert info.path == model_dir
+    assert info.features == FEATURE_COLUMNS and info.metadata['estimator'] == ranking.loc[0, 'estimator']
+    assert info.metadata['metrics']['Root Mean Squared Error (RMSE)'] == pytest.approx(ranking.loc[0, 'Root Mean Squared Error (RMSE)'])
+    assert len(info.metadata['ranking']) == 2
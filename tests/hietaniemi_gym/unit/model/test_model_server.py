@@ -0,0 +1,50 @@
+import os
+import asyncio
+import numpy as np
+import pandas as pd
+import pytest
+from dotenv import load_dotenv
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import PredictorModelConfig, PredictorModel, FEATURE_COLUMNS
+from src.projects.hietaniemi_gym.model.model_serve.model_server import (
+    PredictionServerConfig,
+    PredictionServer,
+    PredictionClient
+)
+
+@pytest.fixture(scope="module")
+def predictor_model():
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+    return PredictorModel(PredictorModelConfig(model_path=os.getenv('MODEL_PATH')))
+
+def test_concurrent_requests_are_batched(tmp_path, predictor_model):
+    rows = pd.DataFrame({
+        'weekday': np.arange(40) % 7,
+        'hour': np.arange(40) % 24,
+        'Precipitation (mm)': np.linspace(0, 2, 40),
+        'Snow depth (cm)': np.zeros(40),
+        'Temperature (degC)': np.linspace(-5, 25, 40),
+    })[FEATURE_COLUMNS]
+    expected = predictor_model.predict(rows)
+
+    async def run():
+        config = PredictionServerConfig(model_path='', socket_path=str(tmp_path / 'predict.sock'), max_latency_ms=50)
+        server = PredictionServer(config, predictor_model)
+        await server.start()
+        try:
+            client = PredictionClient(socket_path=config.socket_path)
+            predictions = await asyncio.gather(*[client.predict(row) for row in rows.to_dict('records')])
+            error = await client.request({'weekday': 1})
+            stats = await client.stats()
+        finally:
+            await server.stop()
+        return predictions, error, stats
+
+    predictions, error, stats = asyncio.run(run())
+    np.testing.assert_allclose(predictions, expected)
+    assert 'error' in error
+    assert stats['requests'] == 40
+    assert stats['batches'] < 40
+    assert stats['latency_p99_ms'] >= stats['latency_p50_ms']
@@ -0,0 +1,67 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import PredictorModelConfig, FEATURE_COLUMNS
+from src.projects.hietaniemi_gym.model.model_predict.linear_predictor import LinearPredictorModel
+from src.projects.hietaniemi_gym.model.model_predict import scenario_table
+from src.projects.hietaniemi_gym.model.model_predict.scenario_table import ScenarioGridConfig, ScenarioTableConfig, ScenarioTable
+
+SHIPPED_MODEL_PATH = 'artifacts/hietaniemi_gym/0.0.1/models/20240211_Linear_Regressor/linear_model.npz'
+
+@pytest.fixture
+def model_path(tmp_path):
+    model_path = str(tmp_path / 'linear_model.npz')
+    shutil.copy(SHIPPED_MODEL_PATH, model_path)
+    return model_path
+
+def test_lookup_matches_model(model_path, tmp_path):
+    table = ScenarioTable(ScenarioTableConfig(model_path, cache_dir=str(tmp_path / 'scenarios')))
+    assert table.values.shape == (7, 24, 8, 7, 22) and table.values.dtype == np.float32
+
+    rng = np.random.default_rng(0)
+    scenarios = pd.DataFrame({
+        'weekday': rng.integers(0, 7, 1000),
+        'hour': rng.integers(0, 24, 1000),
+        'Precipitation (mm)': rng.uniform(-1, 20, 1000),
+        'Snow depth (cm)': rng.uniform(-1, 80, 1000),
+        'Temperature (degC)': rng.uniform(-30, 33, 1000),
+    })
+    expected = LinearPredictorModel(PredictorModelConfig(model_path=model_path)).predict(scenarios)
+    # The interpolation of a linear model is exact up to the float32 table
+    np.testing.assert_allclose(table.lookup(*(scenarios[column].to_numpy() for column in FEATURE_COLUMNS)), expected, rtol=1e-5, atol=1e-4)
+    assert table.predict(*scenarios.iloc[0]) == pytest.approx(expected[0], rel=1e-5, abs=1e-4)
+
+    by_hour = table.query_range(0.0, 0.0, 15.0, weekdays=[5, 6], hours=range(8, 18))
+    assert by_hour.shape == (2, 10)
+    assert by_hour.loc[6, 12] == pytest.approx(table.predict(6, 12, 0.0, 0.0, 15.0))
+    # Weather outside the grid is clamped to its edges
+    assert table.predict(0, 12, 0.0, 0.0, 60.0) == pytest.approx(table.predict(0, 12, 0.0, 0.0, 33.0))
+    with pytest.raises(KeyError):
+        table.lookup(7, 12, 0.0, 0.0, 15.0)
+
+def test_table_is_rebuilt_when_the_model_changes(model_path, tmp_path, monkeypatch):
+    config = ScenarioTableConfig(model_path, ScenarioGridConfig(hours=[8, 12], temperature=[-10, 0, 10]), str(tmp_path / 'scenarios'))
+    table = ScenarioTable(config)
+    before = table.predict(0, 12, 0.0, 0.0, 5.0)
+
+    # A second table with the same model and grid is loaded instead of rebuilt
+    with monkeypatch.context() as patch:
+        patch.setattr(scenario_table, 'load_predictor', lambda path: pytest.fail("rebuilt"))
+        assert ScenarioTable(config).predict(0, 12, 0.0, 0.0, 5.0) == before
+
+    with np.load(model_path) as artifact:
+        coef, intercept, feature_names = artifact['coef'], artifact['intercept'], artifact['feature_names']
+    with open(model_path, 'wb') as file:
+        np.savez(file, coef=coef, intercept=intercept + 100, feature_names=feature_names)
+    stat = os.stat(model_path)
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    # A table of another grid is kept, the outdated one of this grid is removed
+    other = ScenarioTable(ScenarioTableConfig(model_path, ScenarioGridConfig(hours=[8]), str(tmp_path / 'scenarios')))
+    assert table.predict(0, 12, 0.0, 0.0, 5.0) == pytest.approx(before + 100, rel=1e-5)
+    assert sorted(os.listdir(tmp_path / 'scenarios')) == sorted([
+        f'{table.table_id()}-{table.key(table.model_hash)}.npy',
+        f'{other.table_id()}-{other.key(other.model_hash)}.npy',
+    ])
@@ -0,0 +1,95 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from dotenv import load_dotenv
+from sklearn.linear_model import LinearRegression
+from src.projects.hietaniemi_gym.pipelines.feature_pipeline import feature_pipeline, iter_feature_chunks
+from src.projects.hietaniemi_gym.pipelines.train_pipeline import TrainConfig, train_pipeline
+from src.projects.hietaniemi_gym.model.model_predict.model_predictor import FEATURE_COLUMNS
+from src.projects.hietaniemi_gym.model.model_registry.model_registry import ModelRegistryConfig, ModelRegistry
+from src.projects.hietaniemi_gym.model.model_train.incremental_trainer import NormalEquationRegressor
+
+@pytest.fixture(scope="module")
+def sources():
+    # load env
+    app_env = 'development'
+    env_file = f"config/.env.{app_env}"
+    load_dotenv(dotenv_path=env_file)
+    return os.getenv('GYM_DATA_PATH'), os.getenv('WEATHER_DATA_PATH')
+
+@pytest.fixture(scope="module")
+def merged_data(sources):
+    return feature_pipeline(*sources)
+
+def test_normal_equations_match_least_squares():
+    rng = np.random.default_rng(0)
+    X = rng.normal(1000, 5, size=(3000, 4))
+    X[:, 3] = 2 * X[:, 2]
+    y = X @ np.array([1.0, -2.0, 0.5, 0.25]) + rng.normal(0, 0.1, 3000)
+    expected = LinearRegression().fit(X, y)
+
+    chunked = NormalEquationRegressor()
+    for chunk in np.array_split(np.arange(3000), 7):
+        chunked.partial_fit(X[chunk], y[chunk])
+    np.testing.assert_allclose(chunked.coef_, expected.coef_, rtol=1e-8)
+    assert chunked.intercept_ == pytest.approx(expected.intercept_, rel=1e-8)
+
+    shards = [NormalEquationRegressor().partial_fit(X[:1000], y[:1000]), NormalEquationRegressor().partial_fit(X[1000:], y[1000:])]
+    merged = shards[0].merge(shards[1])
+    np.testing.assert_allclose(merged.predict(X), expected.predict(X), atol=1e-6)
+
+def test_feature_chunks_match_feature_pipeline(sources, merged_data, tmp_path):
+    train_pipeline(*sources, TrainConfig(base_path=str(tmp_path / 'registry')), store_dir=str(tmp_path / 'store'))
+    chunks = list(iter_feature_chunks(*sources, str(tmp_path / 'store'), months=2))
+    assert len(chunks) == 7
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), merged_data)
+
+def test_trained_model_is_registered(sources, merged_data, tmp_path):
+    config = TrainConfig(base_path=str(tmp_path / 'registry'))
+    model_dir = train_pipeline(*sources, config, store_dir=str(tmp_path / 'store'))
+
+    info = ModelRegistry(ModelRegistryConfig(base_path=config.base_path)).resolve('Linear_Regressor')
+    assert info.path == model_dir
+    assert info.features == FEATURE_COLUMNS and info.metadata['training_rows'] == len(merged_data)
+    assert info.training_start == merged_data['time'].iloc[0].isoformat()
+
+    features = merged_data[FEATURE_COLUMNS].astype(float)
+    expected = LinearRegression().fit(features, merged_data['sum_minutes'])
+    registry = ModelRegistry(ModelRegistryConfig(base_path=config.base_path))
+    np.testing.assert_allclose(registry.get_predictor('Linear_Regressor').predict(features), expected.predict(features), rtol=1e-8)
+    assert info.metadata['metrics']['R^2 Score'] == pytest.approx(expected.score(features, merged_data['sum_minutes']), rel=1e-8)
+
+def test_partial_fit_estimator(sources, tmp_path):
+    config = TrainConfig(estimator='sgd', params={'random_state': 0}, epochs=2, months_per_chunk=3, base_path=str(tmp_path))
+    model_dir = train_pipeline(*sources, config, store_dir=str(tmp_path / 'store'))
+    info = ModelRegistry(ModelRegistryConfig(base_path=str(tmp_path))).resolve('SGD_Regressor')
+    assert info.path == model_dir and info.metadata['epochs'] == 2
+    assert info.metadata['metrics']['R^2 Score'] > 0.05
+
+def test_gyms_with_the_same_file_names(sources, tmp_path):
+    gym_data_path, weather_data_path = sources
+    with open(gym_data_path) as file:
+        lines = file.readlines()
+    manifest = []
+    for name, rows in [('a', lines[1:20001]), ('b', lines[30001:])]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'gym.csv').write_text(lines[0] + ''.join(rows))
+        shutil.copy(weather_data_path, tmp_path / name / 'weather.csv')
+        manifest.append({'name': name, 'gym_data_path': str(tmp_path / name / 'gym.csv'), 'weather_data_path': str(tmp_path / name / 'weather.csv')})
+    manifest_path = tmp_path / 'manifest.json'
+    manifest_path.write_text(json.dumps(manifest))
+
+    config = TrainConfig(base_path=str(tmp_path / 'registry'))
+    train_pipeline(config=config, manifest_path=str(manifest_path), store_dir=str(tmp_path / 'store'))
+    # Every gym is trained on its own rows, neither store overwrites the other
+    merged = pd.concat([feature_pipeline(entry['gym_data_path'], entry['weather_data_path']) for entry in manifest], ignore_index=True)
+    info = ModelRegistry(ModelRegistryConfig(base_path=config.base_path)).resolve('Linear_Regressor')
+    assert info.metadata['training_rows'] == len(merged)
+
+    features = merged[FEATURE_COLUMNS].astype(float)
+    expected = LinearRegression().fit(features, merged['sum_minutes'])
+    registry = ModelRegistry(ModelRegistryConfig(base_path=config.base_path))
+    np.testing.assert_allclose(registry.get_predictor('Linear_Regressor').predict(features), expected.predict(features), rtol=1e-6, atol=1e-6)